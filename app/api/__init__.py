@@ -10,6 +10,15 @@ from .questions import questions_ns
 from .subjects import subject_ns
 from .users import users_ns
 from .examinations import examination_ns
+from .examinations.commands import exams_cli
+from .questions.commands import questions_cli
+from .users.commands import users_cli
+from .examinations.services import analytics_queue, autosave_buffer, exam_counters
+from .controllers.commands import auth_cli
+from .utils.blocklist import token_blocklist
+from .utils.passwords import passwords
+from .utils.mailer import outbox
+from .utils.ratelimit import rate_limiter
 from flask_cors import CORS
 
 def create_app(config=config_dict['dev']):
@@ -20,14 +29,24 @@ def create_app(config=config_dict['dev']):
     CORS(app,
         resources={r"/*": {"origins": "*"}},  # Adjust this for production environments
         allow_headers=["Content-Type", "Authorization"],
-        methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]  # Include OPTIONS here
+        # Response headers browser clients need to read: the next page's
+        # cursor, when a rate limit lifts, and an export's filename
+        expose_headers=["X-Next-Cursor", "Retry-After", "Content-Disposition"],
+        methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]  # Include OPTIONS here
     )
 
     app.config.from_object(config)
 
     db.init_app(app)
+    autosave_buffer.init_app(app)
+    analytics_queue.init_app(app)
+    exam_counters.init_app(app)
+    passwords.init_app(app)
+    outbox.init_app(app)
+    rate_limiter.init_app(app)
 
     jwt=JWTManager(app)
+    token_blocklist.init_app(app, jwt)
 
     migrate=Migrate(app, db)
 
@@ -46,4 +65,9 @@ def create_app(config=config_dict['dev']):
     api.add_namespace(examination_ns)
     api.add_namespace(users_ns)
 
+    app.cli.add_command(auth_cli)
+    app.cli.add_command(exams_cli)
+    app.cli.add_command(questions_cli)
+    app.cli.add_command(users_cli)
+
     return app
@@ -3,11 +3,74 @@ from decouple import config
 class Config:
     SECRET_KEY = config('SECRET_KEY', 'secret')
     MAIL_SERVER = config('MAIL_SERVER', 'smtp.example.com')
-    MAIL_PORT = config('MAIL_PORT', 587)
-    MAIL_USE_TLS = True
+    MAIL_PORT = config('MAIL_PORT', 587, cast=int)
+    MAIL_USE_TLS = config('MAIL_USE_TLS', True, cast=bool)
     MAIL_USERNAME = config('MAIL_USERNAME')
     MAIL_PASSWORD = config('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = config('MAIL_DEFAULT_SENDER', 'noreply@example.com')
+    # Email outbox: messages sent per batch over one SMTP connection, how
+    # often (seconds) the dispatcher polls, how long an idle connection is
+    # kept, the first retry delay (doubled per attempt) and attempts before
+    # giving up. Turn MAIL_OUTBOX_DISPATCHER off to send from
+    # `flask auth send-mail` instead. For local testing point MAIL_SERVER
+    # and MAIL_PORT at a stand-in such as `python -m aiosmtpd -n -l
+    # localhost:1025` with MAIL_USE_TLS=False.
+    MAIL_OUTBOX_BATCH_SIZE = config('MAIL_OUTBOX_BATCH_SIZE', 50, cast=int)
+    MAIL_OUTBOX_POLL_INTERVAL = config('MAIL_OUTBOX_POLL_INTERVAL', 10.0, cast=float)
+    MAIL_OUTBOX_IDLE_TIMEOUT = config('MAIL_OUTBOX_IDLE_TIMEOUT', 30.0, cast=float)
+    MAIL_OUTBOX_RETRY_DELAY = config('MAIL_OUTBOX_RETRY_DELAY', 30.0, cast=float)
+    MAIL_OUTBOX_MAX_ATTEMPTS = config('MAIL_OUTBOX_MAX_ATTEMPTS', 6, cast=int)
+    MAIL_OUTBOX_DISPATCHER = config('MAIL_OUTBOX_DISPATCHER', True, cast=bool)
+    # Short-answer grading: allowed typos per answer and the batch size above
+    # which matching is spread over a process pool
+    SHORT_ANSWER_MAX_EDITS = config('SHORT_ANSWER_MAX_EDITS', 2, cast=int)
+    SHORT_ANSWER_FUZZY_RATIO = config('SHORT_ANSWER_FUZZY_RATIO', 0.2, cast=float)
+    SHORT_ANSWER_POOL_THRESHOLD = config('SHORT_ANSWER_POOL_THRESHOLD', 20000, cast=int)
+    # Score submissions as they are handed in; turn off to store them
+    # ungraded and score them in bulk with POST /exams/<id>/grade
+    SCORE_ON_SUBMIT = config('SCORE_ON_SUBMIT', True, cast=bool)
+    PAGINATION_DEFAULT_LIMIT = config('PAGINATION_DEFAULT_LIMIT', 50, cast=int)
+    PAGINATION_MAX_LIMIT = config('PAGINATION_MAX_LIMIT', 200, cast=int)
+    # Autosaved answers are buffered and written at most this often (seconds)
+    AUTOSAVE_FLUSH_INTERVAL = config('AUTOSAVE_FLUSH_INTERVAL', 2.0, cast=float)
+    AUTOSAVE_MAX_PENDING = config('AUTOSAVE_MAX_PENDING', 5000, cast=int)
+    # Exam submission/graded counts are bumped in memory and written this
+    # often (seconds), instead of locking the exam row in every submit
+    EXAM_COUNTER_FLUSH_INTERVAL = config('EXAM_COUNTER_FLUSH_INTERVAL', 2.0, cast=float)
+    # Exams with newly graded submissions get their analytics refreshed this
+    # often (seconds); the analytics endpoint only reads
+    ANALYTICS_REFRESH_INTERVAL = config('ANALYTICS_REFRESH_INTERVAL', 5.0, cast=float)
+    QUESTION_IMPORT_CHUNK_SIZE = config('QUESTION_IMPORT_CHUNK_SIZE', 500, cast=int)
+    USER_IMPORT_CHUNK_SIZE = config('USER_IMPORT_CHUNK_SIZE', 500, cast=int)
+    # Subjects/exams with more questions/submissions than this are deleted in
+    # the background, in transactions of CASCADE_DELETE_CHUNK_SIZE rows
+    CASCADE_DELETE_SYNC_LIMIT = config('CASCADE_DELETE_SYNC_LIMIT', 5000, cast=int)
+    CASCADE_DELETE_CHUNK_SIZE = config('CASCADE_DELETE_CHUNK_SIZE', 1000, cast=int)
+    # Password hashing: werkzeug method/cost for new hashes (older ones are
+    # upgraded at login), pool threads (0 = one per CPU), how many more
+    # operations may queue, and how long (seconds) a request waits for a slot
+    PASSWORD_HASH_METHOD = config('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', 0, cast=int)
+    PASSWORD_HASH_MAX_QUEUED = config('PASSWORD_HASH_MAX_QUEUED', 32, cast=int)
+    PASSWORD_HASH_WAIT_TIMEOUT = config('PASSWORD_HASH_WAIT_TIMEOUT', 5.0, cast=float)
+    # Rate limits of the unauthenticated auth endpoints, per client IP and
+    # per email, as "<requests>/<period>" (e.g. "10/minute", "20/15 minutes";
+    # empty for none). Counters are per process unless RATELIMIT_STORAGE is
+    # "database"; behind a proxy, make sure request.remote_addr is the client.
+    RATELIMIT_ENABLED = config('RATELIMIT_ENABLED', True, cast=bool)
+    RATELIMIT_STORAGE = config('RATELIMIT_STORAGE', 'memory')
+    RATELIMIT_MAX_KEYS = config('RATELIMIT_MAX_KEYS', 100000, cast=int)
+    RATELIMIT_LOGIN = config('RATELIMIT_LOGIN', '10/minute')
+    RATELIMIT_SIGNUP = config('RATELIMIT_SIGNUP', '20/hour')
+    RATELIMIT_PASSWORD_RESET = config('RATELIMIT_PASSWORD_RESET', '5/hour')
+    # Revoked-token checks: how often (seconds) to pull new blocklist rows,
+    # purge rows of expired tokens, and how long table lookups are cached
+    BLOCKLIST_SYNC_INTERVAL = config('BLOCKLIST_SYNC_INTERVAL', 30.0, cast=float)
+    BLOCKLIST_PURGE_INTERVAL = config('BLOCKLIST_PURGE_INTERVAL', 3600.0, cast=float)
+    BLOCKLIST_CACHE_TTL = config('BLOCKLIST_CACHE_TTL', 300.0, cast=float)
+    BLOCKLIST_BLOOM_CAPACITY = config('BLOCKLIST_BLOOM_CAPACITY', 100000, cast=int)
+    # Jaccard similarity at which two questions count as near-duplicates
+    DUPLICATE_QUESTION_THRESHOLD = config('DUPLICATE_QUESTION_THRESHOLD', 0.8, cast=float)
 
 class DevConfig(Config):
     SQLALCHEMY_DATABASE_URI = config('DATABASE_URL')
@@ -1,13 +1,17 @@
 from flask_restx import Namespace,Resource,fields
 from ..models.users import User, TokenBlacklist
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask import request, current_app
+from flask import request
 from http import HTTPStatus
 from werkzeug.exceptions import Conflict, BadRequest
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required,get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required,get_jwt_identity, get_jwt, decode_token
 from ..utils.token import generate_reset_token, verify_reset_token
 from ..utils.db import db
-from flask_mail import Message, Mail
+from ..utils.blocklist import token_blocklist
+from ..utils.decorator import role_claims
+from ..utils.user_cache import user_cache
+from ..utils.passwords import passwords
+from ..utils.mailer import outbox
+from ..utils.ratelimit import rate_limiter
 from datetime import datetime, timedelta
 from decouple import config
 from ..users.models import UserProfile
@@ -64,6 +68,7 @@ class Signup(Resource):
 
     @auth_namespace.expect(SignUp_model)
     @auth_namespace.marshal_with(User_model)
+    @rate_limiter.limit('signup')
     def post(self):
         """
         Create a new user (admin or regular based on admin code)
@@ -90,7 +95,7 @@ class Signup(Resource):
         new_user = User(
             username=data.get('username'),
             email=data.get('email'),
-            password_hash=generate_password_hash(data.get('password')),
+            password_hash=passwords.hash(data.get('password')),
             is_admin=is_admin
         )
 
@@ -121,6 +126,7 @@ class Signup(Resource):
 class Login(Resource):
 
     @auth_namespace.expect(login_model)
+    @rate_limiter.limit('login')
     def post(self):
         """
             Login a user
@@ -133,8 +139,13 @@ class Login(Resource):
 
         user = User.query.filter_by(email=email).first()
 
-        if user is not None and check_password_hash(user.password_hash,password):
-            access_token=create_access_token(identity=user.id)
+        if user is not None and passwords.check(user.password_hash,password):
+            # Upgrade hashes made with an older method or cost while we have the password
+            if passwords.needs_rehash(user.password_hash):
+                user.password_hash = passwords.hash(password)
+                db.session.commit()
+
+            access_token=create_access_token(identity=user.id, additional_claims=role_claims(user))
             refresh_token=create_refresh_token(identity=user.id)
             response={
                 'access_token':access_token,
@@ -154,8 +165,11 @@ class Refresh(Resource):
     @jwt_required(refresh=True)
     def post(self):
         username=get_jwt_identity()
+        user = user_cache.get(username)
+        if user is None:
+            raise BadRequest("User does not exist")
 
-        access_token=create_access_token(identity=username)
+        access_token=create_access_token(identity=username, additional_claims=role_claims(user))
 
         return {'access_token': access_token}, HTTPStatus.OK
     
@@ -167,15 +181,18 @@ class Logout(Resource):
     @jwt_required()
     def post(self):
         # Get the 'jti' (JWT ID) of the access token
-        jti_access = get_jwt()['jti']
+        claims = get_jwt()
+        jti_access = claims['jti']
         current_user = get_jwt_identity()
+        revoked = [jti_access]
 
         # Blacklist the access token by adding its jti to the database
         access_token_blacklist = TokenBlacklist(
             jti=jti_access,
             token_type='access',  
             user_id=current_user,
-            blacklisted_at=datetime.utcnow()
+            blacklisted_at=datetime.utcnow(),
+            expires_at=datetime.utcfromtimestamp(claims['exp']) if 'exp' in claims else None
         )
         db.session.add(access_token_blacklist)
 
@@ -192,15 +209,20 @@ class Logout(Resource):
                     jti=jti_refresh,
                     token_type='refresh',  # Identify it as a refresh token
                     user_id=current_user,
-                    blacklisted_at=datetime.utcnow()
+                    blacklisted_at=datetime.utcnow(),
+                    expires_at=datetime.utcfromtimestamp(decoded_refresh_token['exp'])
+                    if 'exp' in decoded_refresh_token else None
                 )
                 db.session.add(refresh_token_blacklist)
+                revoked.append(jti_refresh)
 
             except Exception as e:
                 return {"msg": "Failed to blacklist refresh token", "error": str(e)}, 400
 
         # Commit all changes to the database
         db.session.commit()
+        for jti in revoked:
+            token_blocklist.revoke(jti)
 
         return {"msg": "Successfully logged out"},  HTTPStatus.OK
 
@@ -211,6 +233,7 @@ class Logout(Resource):
 class PasswordResetRequest(Resource):
 
     @auth_namespace.expect(password_reset_request_model)
+    @rate_limiter.limit('password_reset')
     def post(self):
         """
         Request password reset
@@ -228,15 +251,12 @@ class PasswordResetRequest(Resource):
         user.reset_token_expiration = datetime.utcnow() + timedelta(hours=1)
         user.save()
 
-        # Send reset email
-        mail = Mail(current_app)
-        msg = Message(
+        # Queue the reset email; the outbox dispatcher sends it
+        outbox.enqueue(
             subject='Password Reset Request',
-            sender=current_app.config['MAIL_DEFAULT_SENDER'],
             recipients=[user.email],
             body=f'Please use the following token to reset your password: {reset_token}'
         )
-        mail.send(msg)
 
         return {'message': 'Password reset link sent'}, HTTPStatus.OK
 
@@ -262,7 +282,7 @@ class PasswordResetConfirm(Resource):
             return {'message': 'User does not exist'}, HTTPStatus.NOT_FOUND
 
         # Update user password
-        user.password_hash = generate_password_hash(new_password)
+        user.password_hash = passwords.hash(new_password)
         user.reset_token = None
         user.reset_token_expiration = None
         user.save()
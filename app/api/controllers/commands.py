@@ -0,0 +1,28 @@
+import click
+from flask.cli import AppGroup
+from ..utils.blocklist import purge_expired_tokens
+from ..utils.mailer import outbox
+
+auth_cli = AppGroup('auth', help='Maintenance commands for authentication.')
+
+
+@auth_cli.command('purge-blocklist')
+def purge_blocklist_command():
+    """Delete blocklisted tokens that have expired."""
+    count = purge_expired_tokens()
+    click.echo(f'Purged {count} expired token(s) from the blocklist.')
+
+
+@auth_cli.command('send-mail')
+def send_mail_command():
+    """Send every email in the outbox that is due."""
+    count = 0
+    try:
+        while True:
+            sent = outbox.dispatch()
+            count += sent
+            if sent < outbox.batch_size:
+                break
+    finally:
+        outbox.close()
+    click.echo(f'Attempted {count} outbox email(s).')
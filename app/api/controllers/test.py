@@ -0,0 +1,190 @@
+import smtplib
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token, decode_token
+from sqlalchemy import event
+
+from ..models.outbox import OutboxEmail
+from ..models.users import TokenBlacklist, User
+from ..utils.blocklist import token_blocklist
+from ..utils.db import db
+from ..utils.mailer import outbox
+from ..utils.passwords import passwords
+from ..utils.ratelimit import rate_limiter
+from ..utils.user_cache import user_cache
+
+
+@pytest.fixture
+def login_limit(app, monkeypatch):
+    """Turn the rate limiter on with a limit of 3 logins a minute."""
+    monkeypatch.setattr(rate_limiter, 'enabled', True)
+    monkeypatch.setitem(app.config, 'RATELIMIT_LOGIN', '3/minute')
+
+
+def login(client, email, ip='10.0.0.1'):
+    return client.post('/auth/login', json={'email': email, 'password': 'wrong'},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def test_login_is_refused_with_429_once_the_limit_is_used_up(client, login_limit):
+    assert [login(client, 'someone@example.com').status_code for _ in range(3)] == [400, 400, 400]
+
+    response = login(client, 'someone@example.com')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_login_limit_counts_per_account_across_addresses(client, login_limit):
+    for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+        assert login(client, 'target@example.com', ip).status_code == 400
+
+    assert login(client, 'target@example.com', '10.0.0.4').status_code == 429
+    assert login(client, 'other@example.com', '10.0.0.4').status_code == 400
+
+
+def test_login_upgrades_a_hash_made_with_another_method(client, make_user, monkeypatch):
+    user_id, _ = make_user()
+    user = db.session.get(User, user_id)
+    assert user.password_hash.startswith('pbkdf2:sha256:1000$')
+    monkeypatch.setattr(passwords, 'method', 'pbkdf2:sha256:2000')
+    monkeypatch.setattr(passwords, '_method_prefix', None)
+
+    response = client.post('/auth/login', json={'email': user.email, 'password': 'secret'})
+
+    assert response.status_code == 200
+    db.session.refresh(user)
+    assert user.password_hash.startswith('pbkdf2:sha256:2000$')
+    assert client.post('/auth/login', json={'email': user.email, 'password': 'secret'}).status_code == 200
+
+
+def test_hashing_answers_503_once_every_slot_is_taken(client, make_user, monkeypatch):
+    user_id, _ = make_user()
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(passwords, '_slots', slots)
+    monkeypatch.setattr(passwords, 'wait_timeout', 0.01)
+
+    response = client.post('/auth/login', json={'email': db.session.get(User, user_id).email, 'password': 'secret'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_outbox_dispatcher_starts_with_the_app_when_enabled(app, monkeypatch):
+    started = []
+    monkeypatch.setattr(outbox, '_start', lambda: started.append(True))
+
+    outbox.init_app(app)
+    assert not started
+    monkeypatch.setitem(app.config, 'MAIL_OUTBOX_DISPATCHER', True)
+    outbox.init_app(app)
+    assert started == [True]
+
+
+def test_send_mail_sends_what_is_pending_and_retries_failures(app, monkeypatch):
+    db.session.add_all([
+        OutboxEmail(subject=subject, sender='noreply@example.com', recipients=[f'{subject}@example.com'], body='Hi')
+        for subject in ('welcome', 'reset', 'bounce')
+    ])
+    db.session.commit()
+    sent = []
+
+    def send(email):
+        if email.subject == 'bounce':
+            raise smtplib.SMTPRecipientsRefused({email.recipients[0]: (550, b'No such user')})
+        sent.append(email.subject)
+
+    monkeypatch.setattr(outbox, '_connect', lambda: None)
+    monkeypatch.setattr(outbox, '_send', send)
+
+    result = app.test_cli_runner().invoke(args=['auth', 'send-mail'])
+
+    assert 'Attempted 3 outbox email(s).' in result.output
+    assert sent == ['welcome', 'reset']
+    statuses = dict(db.session.execute(db.select(OutboxEmail.subject, OutboxEmail.status)).all())
+    assert statuses == {'welcome': 'sent', 'reset': 'sent', 'bounce': 'pending'}
+    assert app.test_cli_runner().invoke(args=['auth', 'send-mail']).output.startswith('Attempted 0 ')
+
+
+@pytest.fixture
+def queries(app):
+    """Returns the statements run so far that mention the given table."""
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield lambda table: [statement for statement in statements if table in statement]
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def test_logout_revokes_the_token_and_other_tokens_cost_no_query(client, make_user, queries):
+    _, headers = make_user()
+    _, other = make_user()
+    assert client.get('/subjects/', headers=headers).status_code == 200
+
+    assert client.post('/auth/logout', headers=headers).status_code == 200
+    assert client.get('/subjects/', headers=headers).status_code == 401
+
+    count = len(queries('token_blacklist'))
+    for _ in range(3):
+        assert client.get('/subjects/', headers=other).status_code == 200
+    assert len(queries('token_blacklist')) == count
+
+
+def test_tokens_revoked_by_another_worker_are_refused_after_the_next_sync(client, make_user, monkeypatch):
+    user_id, headers = make_user()
+    assert client.get('/subjects/', headers=headers).status_code == 200
+
+    jti = decode_token(headers['Authorization'].split()[1])['jti']
+    db.session.add(TokenBlacklist(jti=jti, token_type='access', user_id=user_id))
+    db.session.commit()
+    assert client.get('/subjects/', headers=headers).status_code == 200
+
+    monkeypatch.setattr(token_blocklist, 'sync_interval', 0)
+    assert client.get('/subjects/', headers=headers).status_code == 401
+
+
+def test_purge_blocklist_deletes_only_rows_of_expired_tokens(app, make_user):
+    user_id, _ = make_user()
+    now = datetime.utcnow()
+    db.session.add_all([
+        TokenBlacklist(jti='expired', token_type='access', user_id=user_id, expires_at=now - timedelta(minutes=1)),
+        TokenBlacklist(jti='live', token_type='access', user_id=user_id, expires_at=now + timedelta(minutes=1)),
+        TokenBlacklist(jti='old', token_type='refresh', user_id=user_id, blacklisted_at=now - timedelta(days=365)),
+        TokenBlacklist(jti='recent', token_type='refresh', user_id=user_id, blacklisted_at=now),
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['auth', 'purge-blocklist'])
+
+    assert 'Purged 2 expired token(s)' in result.output
+    assert sorted(db.session.scalars(db.select(TokenBlacklist.jti))) == ['live', 'recent']
+
+
+def test_admin_checks_read_the_role_claim_instead_of_the_users_table(client, make_user, queries):
+    _, admin = make_user(admin=True)
+    _, student = make_user()
+    token = admin['Authorization'].split()[1]
+    assert decode_token(token)['is_admin'] is True
+
+    count = len(queries('FROM users'))
+    assert client.get('/subjects/', headers=admin).status_code == 200
+    assert client.delete('/users/admin/users/999999', headers=student).status_code == 403
+    assert len(queries('FROM users')) == count
+
+
+def test_tokens_without_role_claims_fall_back_to_the_user_cache(client, make_user, queries):
+    admin_id, _ = make_user(admin=True)
+    user_id, _ = make_user()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=admin_id)}'}
+
+    assert client.get('/subjects/', headers=headers).status_code == 200
+    count = len(queries('FROM users'))
+    for _ in range(3):
+        assert client.get('/subjects/', headers=headers).status_code == 200
+    assert len(queries('FROM users')) == count
+
+    assert user_cache.get(user_id) is not None
+    assert client.delete(f'/users/admin/users/{user_id}', headers=headers).status_code == 204
+    assert user_cache.get(user_id) is None
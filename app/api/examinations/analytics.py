@@ -0,0 +1,71 @@
+import math
+
+
+def score_summary(score_counts):
+    """Count, mean, median, population stddev, min and max of the scores
+    described by a {score: count} histogram."""
+    scores = sorted((float(score), count) for score, count in score_counts.items() if count)
+    n = sum(count for _, count in scores)
+    if not n:
+        return {'submission_count': 0, 'mean': None, 'median': None, 'stddev': None, 'min': None, 'max': None}
+
+    total = sum(score * count for score, count in scores)
+    mean = total / n
+    variance = sum(count * (score - mean) ** 2 for score, count in scores) / n
+
+    return {
+        'submission_count': n,
+        'mean': mean,
+        'median': _median(scores, n),
+        'stddev': math.sqrt(variance),
+        'min': scores[0][0],
+        'max': scores[-1][0]
+    }
+
+
+def _median(scores, n):
+    lower_rank, upper_rank = (n - 1) // 2, n // 2
+    lower = upper = None
+    seen = 0
+    for score, count in scores:
+        if lower is None and seen + count > lower_rank:
+            lower = score
+        if seen + count > upper_rank:
+            upper = score
+            break
+        seen += count
+    return (lower + upper) / 2
+
+
+def histogram(score_counts, bins):
+    """Group a {score: count} histogram into `bins` equal-width buckets."""
+    scores = {float(score): count for score, count in score_counts.items() if count}
+    if not scores:
+        return []
+    low, high = min(scores), max(scores)
+    width = (high - low) / bins or 1
+    buckets = [0] * bins
+    for score, count in scores.items():
+        buckets[min(int((score - low) / width), bins - 1)] += count
+    return [
+        {'lower': low + i * width, 'upper': low + (i + 1) * width, 'count': count}
+        for i, count in enumerate(buckets)
+    ]
+
+
+def item_statistics(correct_count, correct_score_sum, summary, score_total):
+    """p-value and point-biserial discrimination of one question.
+
+    Examinees who did not answer the question count as incorrect. The
+    discrimination is left as None when it is undefined (everyone or no one
+    answered correctly, or all scores are equal).
+    """
+    n = summary['submission_count']
+    p_value = correct_count / n if n else None
+    if not n or correct_count in (0, n) or not summary['stddev']:
+        return p_value, None
+
+    mean_correct = correct_score_sum / correct_count
+    mean_incorrect = (score_total - correct_score_sum) / (n - correct_count)
+    discrimination = (mean_correct - mean_incorrect) / summary['stddev'] * math.sqrt(p_value * (1 - p_value))
+    return p_value, discrimination
@@ -0,0 +1,78 @@
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AutosaveBuffer:
+    """Write-behind buffer for in-progress answer saves.
+
+    Saves are keyed by answer id, so repeated saves of the same answer
+    within one flush interval collapse into a single write of the latest
+    value. A background thread hands everything pending to `writer` every
+    AUTOSAVE_FLUSH_INTERVAL seconds, or sooner once AUTOSAVE_MAX_PENDING
+    answers are waiting. The buffer is per process: a worker only flushes
+    the saves it received itself.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.app = None
+        self.flush_interval = 2.0
+        self.max_pending = 5000
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config['AUTOSAVE_FLUSH_INTERVAL']
+        self.max_pending = app.config['AUTOSAVE_MAX_PENDING']
+        atexit.register(self.flush)
+
+    def add(self, submission_id, updates):
+        with self._lock:
+            for answer_id, answer in updates:
+                self._pending[answer_id] = (submission_id, answer)
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='autosave-flush', daemon=True)
+                self._thread.start()
+        if full:
+            self.flush()
+
+    def flush(self, submission_id=None):
+        with self._lock:
+            if submission_id is None:
+                pending, self._pending = self._pending, {}
+            else:
+                pending = {
+                    answer_id: value for answer_id, value in self._pending.items()
+                    if value[0] == submission_id
+                }
+                for answer_id in pending:
+                    del self._pending[answer_id]
+        if not pending:
+            return 0
+
+        rows = [{'id': answer_id, 'answer': answer} for answer_id, (_, answer) in pending.items()]
+        try:
+            with self.app.app_context():
+                self.writer(rows)
+        except Exception:
+            # Put the saves back unless a newer value arrived in the meantime
+            with self._lock:
+                for answer_id, value in pending.items():
+                    self._pending.setdefault(answer_id, value)
+            raise
+        return len(rows)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush autosaved answers')
@@ -0,0 +1,29 @@
+import click
+from flask.cli import AppGroup
+from .services import rebuild_leaderboard, refresh_analytics, repair_exam_counters
+
+exams_cli = AppGroup('exams', help='Maintenance commands for exams and submissions.')
+
+
+@exams_cli.command('rebuild-leaderboard')
+@click.option('--exam-id', type=int, default=None, help='Only rebuild this exam (default: all exams).')
+def rebuild_leaderboard_command(exam_id):
+    """Rebuild exam leaderboards from graded submissions."""
+    count = rebuild_leaderboard(exam_id)
+    click.echo(f'Rebuilt the leaderboard of {count} exam(s).')
+
+
+@exams_cli.command('repair-counters')
+@click.option('--exam-id', type=int, default=None, help='Only repair this exam (default: all exams).')
+def repair_counters_command(exam_id):
+    """Recompute the denormalized question/marks/submission counters of exams."""
+    count = repair_exam_counters(exam_id)
+    click.echo(f'Repaired the counters of {count} exam(s).')
+
+
+@exams_cli.command('refresh-analytics')
+@click.option('--exam-id', type=int, default=None, help='Only refresh this exam (default: every exam with new results).')
+def refresh_analytics_command(exam_id):
+    """Fold newly graded submissions into the exams' materialized analytics."""
+    count = refresh_analytics(exam_id)
+    click.echo(f'Folded {count} submission(s) into exam analytics.')
@@ -1,19 +1,41 @@
-from flask_restx import Resource, fields
+from flask import Response, stream_with_context
+from flask_restx import Resource, fields, inputs
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from .export import csv_chunks, gzip_chunks, ndjson_chunks
+from ..utils.decorator import current_user_is_admin
+from ..utils.pagination import pagination_parser, page_headers
+from ..utils.fieldsets import parse_fieldset, marshal_fieldset
 from .services import ( create_exam, get_all_exams, get_exam_by_id, update_exam, delete_exam,
     get_exam_questions, add_question_to_exam, remove_question_from_exam,
     get_all_submissions, get_submission_by_id, create_submission,
-    get_submission_answers, grade_submission, update_submission_answer
+    get_submission_answers, grade_submission, update_submission_answer,
+    auto_grade_exam, iter_exam_results, get_exam_analytics, get_leaderboard, get_leaderboard_rank,
+    autosave_submission_answers, set_exam_rules, get_exam_rules, get_exam_paper, set_exam_questions,
+    submit_submission, SubmissionClosed
 )
 
 
 def register_routes(api):
+    def require_exam_owner(exam_id):
+        """Abort with 404 unless the exam exists, and 403 unless the current
+        user created it or is an admin."""
+        exam = get_exam_by_id(exam_id)
+        if not exam:
+            api.abort(404, f"Exam {exam_id} not found")
+        if not current_user_is_admin() and exam.user_id != get_jwt_identity():
+            api.abort(403, "You do not have permission to manage this exam.")
+        return exam
+
     exam_model = api.model('Exam', {
         'id': fields.Integer(readOnly=True, description='The unique identifier of an exam'),
         'title': fields.String(required=True, description='The title of the exam'),
         'description': fields.String(description='A brief description of the exam'),
         'total_marks': fields.Integer(required=True, description='Total marks for the exam'),
         'duration': fields.Integer(required=True, description='Duration of the exam in minutes'),
+        'question_count': fields.Integer(readOnly=True, description='Number of questions in the exam'),
+        'marks_sum': fields.Integer(readOnly=True, description='Sum of the marks of the questions'),
+        'submission_count': fields.Integer(readOnly=True, description='Number of submissions'),
+        'graded_count': fields.Integer(readOnly=True, description='Number of graded submissions'),
         'created_at': fields.DateTime(readOnly=True),
         'updated_at': fields.DateTime(readOnly=True),
     })
@@ -23,10 +45,44 @@ def register_routes(api):
         'id': fields.Integer(readOnly=True, description='The unique identifier of an exam question'),
         'exam_id': fields.Integer(required=True, description='The exam ID'),
         'question_id': fields.Integer(required=True, description='The question ID'),
+        'question_version_id': fields.Integer(readOnly=True, description='The question version the exam uses'),
         'marks': fields.Integer(required=True, description='Marks assigned to the question'),
+        'position': fields.Integer(readOnly=True, description='Order of the question within the exam'),
         'created_at': fields.DateTime(readOnly=True),
     })
 
+    exam_question_list_model = api.model('ExamQuestionList', {
+        'questions': fields.List(fields.Nested(api.model('ExamQuestionItem', {
+            'question_id': fields.Integer(required=True, description='The question ID'),
+            'marks': fields.Integer(required=True, description='Marks assigned to the question'),
+        })), required=True, description='The complete, ordered list of questions in the exam')
+    })
+
+
+    exam_rule_model = api.model('ExamRule', {
+        'subject_id': fields.Integer(required=True, description='Subject to draw questions from'),
+        'question_type': fields.String(required=True, enum=['short_answer', 'multiple_choice', 'true_false']),
+        'count': fields.Integer(required=True, description='Number of questions to draw'),
+        'marks': fields.Integer(required=True, description='Marks per question'),
+    })
+
+    exam_rule_set_model = api.model('ExamRuleSet', {
+        'exam_id': fields.Integer(readOnly=True),
+        'version': fields.Integer(readOnly=True),
+        'total_marks': fields.Integer(description='Optional check: the marks the rules must add up to'),
+        'rules': fields.List(fields.Nested(exam_rule_model), required=True),
+        'created_at': fields.DateTime(readOnly=True),
+    })
+
+    exam_paper_model = api.model('ExamPaper', {
+        'exam_id': fields.Integer,
+        'rule_version': fields.Integer,
+        'seed': fields.Integer,
+        'questions': fields.List(fields.Nested(api.model('PaperQuestion', {
+            'question_id': fields.Integer,
+            'marks': fields.Integer
+        })))
+    })
 
     # Submission model for API representation
     submission_model = api.model('Submission', {
@@ -35,7 +91,43 @@ def register_routes(api):
         'user_id': fields.Integer,
         'submitted_at': fields.DateTime,
         'score': fields.Float,
-        'graded': fields.Boolean
+        'graded': fields.Boolean,
+        'draft': fields.Boolean(description='Still being answered; handed in with POST /exams/submissions/<id>/submit')
+    })
+
+    grading_result_model = api.model('GradingResult', {
+        'exam_id': fields.Integer,
+        'graded': fields.Integer(description='Number of submissions graded in this run')
+    })
+
+    exam_analytics_model = api.model('ExamAnalytics', {
+        'exam_id': fields.Integer,
+        'submission_count': fields.Integer(description='Number of graded submissions'),
+        'mean': fields.Float,
+        'median': fields.Float,
+        'stddev': fields.Float(description='Population standard deviation of the scores'),
+        'min': fields.Float,
+        'max': fields.Float,
+        'histogram': fields.List(fields.Nested(api.model('ScoreBucket', {
+            'lower': fields.Float,
+            'upper': fields.Float,
+            'count': fields.Integer
+        }))),
+        'questions': fields.List(fields.Nested(api.model('QuestionAnalytics', {
+            'question_id': fields.Integer,
+            'answered_count': fields.Integer,
+            'correct_count': fields.Integer,
+            'p_value': fields.Float(description='Fraction of submissions that answered correctly'),
+            'discrimination': fields.Float(description='Point-biserial correlation with the total score')
+        })))
+    })
+
+    leaderboard_entry_model = api.model('LeaderboardEntry', {
+        'rank': fields.Integer(description='1-based rank; equal scores share a rank'),
+        'user_id': fields.Integer,
+        'submission_id': fields.Integer(description='The submission that achieved the score'),
+        'score': fields.Float(description="The user's best score"),
+        'achieved_at': fields.DateTime
     })
 
     # Submission answer model
@@ -43,12 +135,36 @@ def register_routes(api):
         'id': fields.Integer,
         'submission_id': fields.Integer,
         'question_id': fields.Integer,
+        'question_version_id': fields.Integer,
         'answer': fields.String,
         'is_correct': fields.Boolean
     })
 
 
 
+    exam_list_parser = pagination_parser.copy()
+    exam_list_parser.add_argument('user_id', type=int, location='args', help='Only exams created by this user')
+
+    submission_list_parser = pagination_parser.copy()
+    submission_list_parser.add_argument('graded', type=inputs.boolean, location='args', help='Filter by grading status')
+    submission_list_parser.add_argument('user_id', type=int, location='args', help='Only submissions by this user')
+    submission_list_parser.add_argument('draft', type=inputs.boolean, location='args',
+                                        help='Only drafts, or only handed-in submissions')
+
+    export_parser = api.parser()
+    export_parser.add_argument('format', type=str, location='args', choices=('ndjson', 'csv'), default='ndjson',
+                               help='Output format')
+    export_parser.add_argument('gzip', type=inputs.boolean, location='args', default=False,
+                               help='Gzip-compress the response body')
+
+    analytics_parser = api.parser()
+    analytics_parser.add_argument('bins', type=inputs.int_range(1, 100), location='args', default=10,
+                                  help='Number of score histogram buckets')
+
+    leaderboard_parser = api.parser()
+    leaderboard_parser.add_argument('limit', type=inputs.int_range(1, 100), location='args', default=10,
+                                    help='Number of top entries to return')
+
     @api.route('/')
     class ExamList(Resource):
 
@@ -61,11 +177,19 @@ def register_routes(api):
         #     }
 
 
-        @api.marshal_list_with(exam_model)
+        @api.expect(exam_list_parser)
+        @api.response(200, 'Success', [exam_model])
         @jwt_required()
         def get(self):
-            """List all exams"""
-            return get_all_exams()
+            """List exams, one page at a time"""
+            args = exam_list_parser.parse_args()
+            filters = {'user_id': args['user_id']}
+            try:
+                fields = parse_fieldset(args['fields'], exam_model)
+                exams, next_cursor = get_all_exams(filters, args['cursor'], args['limit'], fields)
+            except ValueError as e:
+                api.abort(400, str(e))
+            return marshal_fieldset(exams, exam_model, fields), 200, page_headers(next_cursor)
         
         @api.expect(exam_model)
         @api.marshal_with(exam_model, code=201)
@@ -104,12 +228,18 @@ def register_routes(api):
 
         @jwt_required()
         @api.response(204, 'Exam deleted')
+        @api.response(202, 'Exam queued for deletion in the background')
         def delete(self, id):
-            """Delete an exam given its ID"""
+            """Delete an exam given its ID, with its questions, submissions and results"""
             current_user_id = get_jwt_identity()
-            exam = delete_exam(id, current_user_id)
+            try:
+                exam, queued = delete_exam(id, current_user_id)
+            except PermissionError as e:
+                api.abort(403, str(e))
             if not exam:
                 api.abort(404, f"Exam {id} not found")
+            if queued:
+                return {'message': f"Exam {id} is being deleted"}, 202
             return '', 204
 
 
@@ -128,8 +258,64 @@ def register_routes(api):
             """Add a question to an exam"""
             data = api.payload
             return add_question_to_exam(exam_id, data)
+
+        @api.expect(exam_question_list_model, validate=True)
+        @api.marshal_list_with(exam_question_model)
+        @jwt_required()
+        def put(self, exam_id):
+            """Replace all questions of an exam: adds, removes, re-marks and reorders in one go"""
+            current_user_id = get_jwt_identity()
+            try:
+                exam_questions = set_exam_questions(exam_id, api.payload['questions'], current_user_id)
+            except PermissionError as e:
+                api.abort(403, str(e))
+            except ValueError as e:
+                api.abort(400, str(e))
+            if exam_questions is None:
+                api.abort(404, f"Exam {exam_id} not found")
+            return exam_questions
         
 
+    @api.route('/<int:exam_id>/rules')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamRules(Resource):
+        @api.marshal_with(exam_rule_set_model)
+        @jwt_required()
+        def get(self, exam_id):
+            """Get the current question-drawing rules of an exam"""
+            rule_set = get_exam_rules(exam_id)
+            if not rule_set:
+                api.abort(404, f"Exam {exam_id} has no rules")
+            return rule_set
+
+        @api.expect(exam_rule_set_model, validate=True)
+        @api.marshal_with(exam_rule_set_model)
+        @jwt_required()
+        def put(self, exam_id):
+            """Replace the rules of an exam, creating a new rule set version"""
+            current_user_id = get_jwt_identity()
+            try:
+                rule_set = set_exam_rules(exam_id, api.payload, current_user_id)
+            except PermissionError as e:
+                api.abort(403, str(e))
+            except ValueError as e:
+                api.abort(400, str(e))
+            if not rule_set:
+                api.abort(404, f"Exam {exam_id} not found")
+            return rule_set
+
+    @api.route('/<int:exam_id>/paper')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamPaper(Resource):
+        @api.marshal_with(exam_paper_model)
+        @jwt_required()
+        def get(self, exam_id):
+            """Get the authenticated user's randomized paper for a rule-based exam"""
+            paper = get_exam_paper(exam_id, get_jwt_identity())
+            if not paper:
+                api.abort(404, f"Exam {exam_id} has no rules")
+            return paper
+
     @api.route('/<int:exam_id>/questions/<int:question_id>')
     @api.param('exam_id', 'The exam identifier')
     @api.param('question_id', 'The question identifier')
@@ -147,26 +333,38 @@ def register_routes(api):
     # Exam Submission Endpoints
     @api.route('/<int:exam_id>/submissions')
     class ExamSubmissionList(Resource):
-        @api.marshal_list_with(submission_model)
+        @api.expect(submission_list_parser)
+        @api.response(200, 'Success', [submission_model])
         @jwt_required()
         def get(self, exam_id):
-            """View all submissions for a particular exam"""
-            return get_all_submissions(exam_id)
+            """View the submissions for a particular exam, one page at a time"""
+            args = submission_list_parser.parse_args()
+            filters = {'graded': args['graded'], 'user_id': args['user_id'], 'draft': args['draft']}
+            try:
+                fields = parse_fieldset(args['fields'], submission_model)
+                submissions, next_cursor = get_all_submissions(exam_id, filters, args['cursor'], args['limit'], fields)
+            except ValueError as e:
+                api.abort(400, str(e))
+            return marshal_fieldset(submissions, submission_model, fields), 200, page_headers(next_cursor)
 
         @api.expect(api.model('SubmissionCreate', {
             'answers': fields.List(fields.Nested(api.model('Answer', {
                 'question_id': fields.Integer(required=True),
                 'answer': fields.String(required=True)
-            })))
+            }))),
+            'draft': fields.Boolean(default=False, description='Start a draft to autosave into instead of submitting')
         }))
         @api.marshal_with(submission_model, code=201)
         @jwt_required()
         def post(self, exam_id):
-            """Submit an exam"""
+            """Submit an exam, or start a draft submission"""
             current_user_id = get_jwt_identity()
             payload = api.payload
             answers = payload['answers']
-            return create_submission(exam_id, current_user_id, answers), 201
+            try:
+                return create_submission(exam_id, current_user_id, answers, bool(payload.get('draft'))), 201
+            except ValueError as e:
+                api.abort(400, str(e))
 
     @api.route('/<int:exam_id>/submissions/<int:submission_id>')
     class ExamSubmission(Resource):
@@ -182,15 +380,89 @@ def register_routes(api):
         @api.expect(api.model('Grade', {
             'score': fields.Float(required=True)
         }))
+        @api.marshal_with(submission_model)
         @jwt_required()
         def put(self, exam_id, submission_id):
-            """Grade an exam submission"""
+            """Grade an exam submission, or override its score"""
+            require_exam_owner(exam_id)
             score = api.payload['score']
-            submission = grade_submission(submission_id, score)
+            try:
+                submission = grade_submission(exam_id, submission_id, score)
+            except ValueError as e:
+                api.abort(400, str(e))
             if not submission:
-                api.abort(404, f"Submission {submission_id} not found or already graded")
+                api.abort(404, f"Submission {submission_id} not found")
             return submission, 200
 
+    @api.route('/<int:exam_id>/export')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamExport(Resource):
+        @api.expect(export_parser)
+        @jwt_required()
+        def get(self, exam_id):
+            """Stream all submissions and answers of an exam as NDJSON or CSV"""
+            args = export_parser.parse_args()
+            require_exam_owner(exam_id)
+
+            if args['format'] == 'csv':
+                chunks, mimetype, extension = csv_chunks(iter_exam_results(exam_id)), 'text/csv', 'csv'
+            else:
+                chunks, mimetype, extension = ndjson_chunks(iter_exam_results(exam_id)), 'application/x-ndjson', 'ndjson'
+
+            filename = f'exam-{exam_id}-results.{extension}'
+            if args['gzip']:
+                chunks = gzip_chunks(chunks)
+                mimetype = 'application/gzip'
+                filename += '.gz'
+
+            headers = {'Content-Disposition': f'attachment; filename={filename}'}
+            return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+    @api.route('/<int:exam_id>/analytics')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamAnalytics(Resource):
+        @api.expect(analytics_parser)
+        @api.marshal_with(exam_analytics_model)
+        @jwt_required()
+        def get(self, exam_id):
+            """Score distribution and per-question statistics for an exam"""
+            args = analytics_parser.parse_args()
+            require_exam_owner(exam_id)
+            return get_exam_analytics(exam_id, args['bins'])
+
+    @api.route('/<int:exam_id>/leaderboard')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamLeaderboard(Resource):
+        @api.expect(leaderboard_parser)
+        @api.marshal_list_with(leaderboard_entry_model)
+        @jwt_required()
+        def get(self, exam_id):
+            """Top scores of an exam"""
+            args = leaderboard_parser.parse_args()
+            return get_leaderboard(exam_id, args['limit'])
+
+    @api.route('/<int:exam_id>/leaderboard/me')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamLeaderboardRank(Resource):
+        @api.marshal_with(leaderboard_entry_model)
+        @jwt_required()
+        def get(self, exam_id):
+            """The authenticated user's rank on an exam"""
+            entry = get_leaderboard_rank(exam_id, get_jwt_identity())
+            if not entry:
+                api.abort(404, f"No graded submission for exam {exam_id}")
+            return entry
+
+    @api.route('/<int:exam_id>/grade')
+    @api.param('exam_id', 'The exam identifier')
+    class ExamAutoGrade(Resource):
+        @api.marshal_with(grading_result_model)
+        @jwt_required()
+        def post(self, exam_id):
+            """Auto-grade all ungraded submissions of an exam"""
+            require_exam_owner(exam_id)
+            return auto_grade_exam(exam_id), 200
+
     # Submission Answers Endpoints
     @api.route('/submissions/<int:submission_id>/answers')
     class SubmissionAnswerList(Resource):
@@ -200,17 +472,61 @@ def register_routes(api):
             """View all answers provided in a particular submission"""
             return get_submission_answers(submission_id)
 
+        @api.expect(api.model('AutosaveAnswers', {
+            'answers': fields.List(fields.Nested(api.model('AutosaveAnswer', {
+                'id': fields.Integer(required=True, description='The answer identifier'),
+                'answer': fields.String(required=True)
+            })), required=True)
+        }), validate=True)
+        @api.response(409, 'The submission has been submitted')
+        @jwt_required()
+        def patch(self, submission_id):
+            """Autosave many answers of a draft submission; writes are batched in the background"""
+            try:
+                queued = autosave_submission_answers(submission_id, api.payload['answers'], get_jwt_identity())
+            except PermissionError as e:
+                api.abort(403, str(e))
+            except SubmissionClosed as e:
+                api.abort(409, str(e))
+            except ValueError as e:
+                api.abort(404, str(e))
+            return {'queued': queued}, 202
+
+    @api.route('/submissions/<int:submission_id>/submit')
+    @api.param('submission_id', 'The submission identifier')
+    class SubmissionSubmit(Resource):
+        @api.marshal_with(submission_model)
+        @api.response(409, 'The submission has already been submitted')
+        @jwt_required()
+        def post(self, submission_id):
+            """Hand in a draft submission and score it"""
+            try:
+                submission = submit_submission(submission_id, get_jwt_identity())
+            except PermissionError as e:
+                api.abort(403, str(e))
+            except SubmissionClosed as e:
+                api.abort(409, str(e))
+            if not submission:
+                api.abort(404, f"Submission {submission_id} not found")
+            return submission
+
     @api.route('/submissions/<int:submission_id>/answers/<int:answer_id>')
     class SubmissionAnswerUpdate(Resource):
         @api.expect(api.model('UpdateAnswer', {
             'answer': fields.String(required=True)
         }))
         @api.marshal_with(submission_answer_model)
+        @api.response(409, 'The submission has been submitted')
         @jwt_required()
         def put(self, submission_id, answer_id):
-            """Update an answer in a submission"""
+            """Update an answer in a draft submission"""
             updated_answer = api.payload
-            answer = update_submission_answer(submission_id, answer_id, updated_answer)
+            try:
+                answer = update_submission_answer(submission_id, answer_id, updated_answer, get_jwt_identity())
+            except PermissionError as e:
+                api.abort(403, str(e))
+            except SubmissionClosed as e:
+                api.abort(409, str(e))
             if not answer:
                 api.abort(404, f"Answer {answer_id} not found for submission {submission_id}")
             return answer, 200
\ No newline at end of file
@@ -0,0 +1,70 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Write-behind buffer for the denormalized exam counters.
+
+    Handing in a submission bumps its exam's submission and graded counts;
+    doing that in the submit transaction would make every submission to an
+    exam queue on the exam's row lock. Deltas are summed here instead, per
+    exam, and a background thread hands them to `writer` every
+    EXAM_COUNTER_FLUSH_INTERVAL seconds in one short transaction. The
+    buffer is per process: deltas a worker had not written when it died
+    are lost, and `flask exams repair-counters` recomputes the counters.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.app = None
+        self.flush_interval = 2.0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config['EXAM_COUNTER_FLUSH_INTERVAL']
+        atexit.register(self.flush)
+
+    def add(self, exam_id, **deltas):
+        with self._lock:
+            self._pending.setdefault(exam_id, Counter()).update(deltas)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='exam-counters-flush', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        deltas = {
+            exam_id: {name: delta for name, delta in counter.items() if delta}
+            for exam_id, counter in pending.items()
+        }
+        deltas = {exam_id: counter for exam_id, counter in deltas.items() if counter}
+        if not deltas:
+            return 0
+
+        try:
+            with self.app.app_context():
+                self.writer(deltas)
+        except Exception:
+            # Put the deltas back, on top of any that arrived in the meantime
+            with self._lock:
+                for exam_id, counter in deltas.items():
+                    self._pending.setdefault(exam_id, Counter()).update(counter)
+            raise
+        return len(deltas)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write exam counters')
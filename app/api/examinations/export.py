@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+import zlib
+
+EXPORT_COLUMNS = [
+    'submission_id', 'user_id', 'submitted_at', 'score', 'graded',
+    'answer_id', 'question_id', 'answer', 'is_correct', 'marks'
+]
+
+# Encoded rows are buffered up to this many bytes before being handed to the
+# WSGI server, so a large export is not written one tiny chunk per row.
+CHUNK_SIZE = 64 * 1024
+
+
+def _serialize(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def ndjson_chunks(rows):
+    buffer = []
+    size = 0
+    for row in rows:
+        line = json.dumps({column: _serialize(row[column]) for column in EXPORT_COLUMNS}) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def csv_chunks(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        writer.writerow([_serialize(row[column]) for column in EXPORT_COLUMNS])
+        if output.tell() >= CHUNK_SIZE:
+            yield output.getvalue().encode()
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue().encode()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 selects the gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
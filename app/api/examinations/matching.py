@@ -0,0 +1,118 @@
+import atexit
+import os
+import re
+import string
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+_PUNCTUATION = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+_DIGITS = re.compile(r'\d')
+
+_POOL_WORKERS = os.cpu_count() or 1
+_pool = None
+
+
+def normalize_short_answer(text):
+    """Case-fold, strip punctuation and collapse whitespace."""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ' '.join(text.translate(_PUNCTUATION).split())
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """Levenshtein distance between a and b, or max_distance + 1 as soon as
+    it is known to exceed max_distance."""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        # Only cells within max_distance of the diagonal can stay in bounds.
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [max_distance + 1] * (len(b) + 1)
+        if low == 1:
+            current[0] = i
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if current[j] < row_min:
+                row_min = current[j]
+        if row_min > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[len(b)], max_distance + 1)
+
+
+class ShortAnswerMatcher:
+    """Grades free-text answers against a correct answer and its alternates.
+
+    An answer matches when its normalized form equals an accepted answer, or
+    is within the allowed edit distance of one. The allowed distance is
+    max_edits capped at fuzzy_ratio of the accepted answer's length; accepted
+    answers containing digits are only matched exactly.
+    """
+
+    def __init__(self, correct_answer, alternate_answers=None, max_edits=2, fuzzy_ratio=0.2,
+                 pool_threshold=20000):
+        accepted = [correct_answer] + list(alternate_answers or [])
+        self.accepted = {normalize_short_answer(answer) for answer in accepted} - {''}
+        self.fuzzy = [
+            (answer, min(max_edits, int(len(answer) * fuzzy_ratio)))
+            for answer in self.accepted
+            if not _DIGITS.search(answer)
+        ]
+        self.fuzzy = [(answer, limit) for answer, limit in self.fuzzy if limit > 0]
+        self.pool_threshold = pool_threshold
+
+    def matches(self, answer):
+        return self._matches_normalized(normalize_short_answer(answer))
+
+    def grade(self, answers):
+        """Grade a batch of raw answers, returning one bool per answer.
+
+        Each distinct normalized answer is graded once; large batches are
+        spread over a process pool.
+        """
+        normalized = [normalize_short_answer(answer) for answer in answers]
+        distinct = list(set(normalized))
+
+        if len(distinct) >= self.pool_threshold:
+            verdicts = _grade_in_pool(self, distinct)
+        else:
+            verdicts = [self._matches_normalized(answer) for answer in distinct]
+
+        results = dict(zip(distinct, verdicts))
+        return [results[answer] for answer in normalized]
+
+    def _matches_normalized(self, answer):
+        if not answer:
+            return False
+        if answer in self.accepted:
+            return True
+        for accepted, limit in self.fuzzy:
+            if bounded_edit_distance(answer, accepted, limit) <= limit:
+                return True
+        return False
+
+
+def _grade_chunk(matcher, answers):
+    return [matcher._matches_normalized(answer) for answer in answers]
+
+
+def _grade_in_pool(matcher, answers):
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=_POOL_WORKERS)
+        atexit.register(_pool.shutdown)
+    workers = _POOL_WORKERS
+    size = -(-len(answers) // workers)
+    chunks = [answers[i:i + size] for i in range(0, len(answers), size)]
+    verdicts = []
+    for chunk_verdicts in _pool.map(_grade_chunk, [matcher] * len(chunks), chunks):
+        verdicts.extend(chunk_verdicts)
+    return verdicts
@@ -3,6 +3,9 @@ from ..utils.db import db
 
 class Exam(db.Model):
     __tablename__ = 'exams'
+    __table_args__ = (
+        db.Index('ix_exams_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -10,6 +13,14 @@ class Exam(db.Model):
     total_marks = db.Column(db.Integer, nullable=False)
     duration = db.Column(db.Integer, nullable=False)  # Duration in minutes
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Denormalized counters, kept in step by the exam services
+    question_count = db.Column(db.Integer, nullable=False, default=0)
+    marks_sum = db.Column(db.Integer, nullable=False, default=0)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped whenever the exam's questions, marks or pinned versions change,
+    # so every worker can tell its cached answer key is stale
+    answer_key_version = db.Column(db.Integer, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
@@ -24,7 +35,12 @@ class ExamQuestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    # The question version this exam uses; pinned once the exam has submissions
+    question_version_id = db.Column(
+        db.Integer, db.ForeignKey('question_versions.id', name='fk_exam_questions_question_version_id'), nullable=True
+    )
     marks = db.Column(db.Integer, nullable=False)  # Marks assigned to this question
+    position = db.Column(db.Integer, nullable=True)  # Order within the exam; unordered questions come last
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     exam = db.relationship('Exam', backref='exam_questions', lazy=True)
@@ -37,6 +53,9 @@ class ExamQuestion(db.Model):
 
 class ExamSubmission(db.Model):
     __tablename__ = 'exam_submissions'
+    __table_args__ = (
+        db.Index('ix_exam_submissions_exam_id_created_at_id', 'exam_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
@@ -44,6 +63,8 @@ class ExamSubmission(db.Model):
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     score = db.Column(db.Float, nullable=True)
     graded = db.Column(db.Boolean, default=False)
+    draft = db.Column(db.Boolean, nullable=False, default=False)  # Still being answered; not handed in yet
+    analyzed = db.Column(db.Boolean, nullable=False, default=False)  # Folded into ExamAnalytics
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -59,6 +80,9 @@ class SubmissionAnswer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey('exam_submissions.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    question_version_id = db.Column(  # The version answered
+        db.Integer, db.ForeignKey('question_versions.id', name='fk_submission_answers_question_version_id'), nullable=True
+    )
     answer = db.Column(db.String(255), nullable=False)
     is_correct = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -68,4 +92,83 @@ class SubmissionAnswer(db.Model):
     question = db.relationship('Question', backref='answers', lazy=True)
 
     def __repr__(self):
-        return f'<SubmissionAnswer {self.id} - Submission {self.submission_id}>'
\ No newline at end of file
+        return f'<SubmissionAnswer {self.id} - Submission {self.submission_id}>'
+
+
+class ExamAnalytics(db.Model):
+    __tablename__ = 'exam_analytics'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), primary_key=True)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    score_counts = db.Column(db.JSON, nullable=False, default=dict)  # {score: number of submissions}
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ExamAnalytics exam_id={self.exam_id}>'
+
+
+class ExamQuestionAnalytics(db.Model):
+    __tablename__ = 'exam_question_analytics'
+
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), primary_key=True)
+    answered_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+    correct_score_sum = db.Column(db.Float, nullable=False, default=0)  # Sum of total scores of those who got it right
+
+    def __repr__(self):
+        return f'<ExamQuestionAnalytics exam_id={self.exam_id} question_id={self.question_id}>'
+
+
+class LeaderboardEntry(db.Model):
+    __tablename__ = 'exam_leaderboard'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'user_id', name='uq_exam_leaderboard_exam_id_user_id'),
+        db.Index('ix_exam_leaderboard_exam_id_score_achieved_at', 'exam_id', 'score', 'achieved_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('exam_submissions.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)  # The user's best score on the exam
+    achieved_at = db.Column(db.DateTime, nullable=False)  # When that score was submitted; breaks ties
+
+    def __repr__(self):
+        return f'<LeaderboardEntry exam_id={self.exam_id} user_id={self.user_id} score={self.score}>'
+
+
+class ExamRuleSet(db.Model):
+    __tablename__ = 'exam_rule_sets'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'version', name='uq_exam_rule_sets_exam_id_version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    # [{subject_id, question_type, count, marks, pool: [question ids]}]; the
+    # pools are frozen when the version is created so papers can be regenerated
+    rules = db.Column(db.JSON, nullable=False)
+    total_marks = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ExamRuleSet exam_id={self.exam_id} version={self.version}>'
+
+
+class ExamPaper(db.Model):
+    __tablename__ = 'exam_papers'
+    __table_args__ = (
+        db.UniqueConstraint('exam_id', 'user_id', name='uq_exam_papers_exam_id_user_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    exam_id = db.Column(db.Integer, db.ForeignKey('exams.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    rule_version = db.Column(db.Integer, nullable=False)
+    seed = db.Column(db.Integer, nullable=False)  # The paper is regenerated from the rule set and this seed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ExamPaper exam_id={self.exam_id} user_id={self.user_id}>'
@@ -0,0 +1,57 @@
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshQueue:
+    """Coalescing queue of exams whose materialized analytics are behind.
+
+    Write paths mark an exam once its graded submissions are committed; a
+    background thread hands each marked exam to `refresher` every
+    ANALYTICS_REFRESH_INTERVAL seconds, so a burst of submissions to one
+    exam costs one refresh rather than one each, and reads never write.
+    The queue is per process: a worker only refreshes the exams it marked
+    itself, and `flask exams refresh-analytics` catches up on the rest.
+    """
+
+    def __init__(self, refresher):
+        self.refresher = refresher
+        self.app = None
+        self.interval = 5.0
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['ANALYTICS_REFRESH_INTERVAL']
+        atexit.register(self.flush)
+
+    def mark(self, exam_id):
+        with self._lock:
+            self._pending.add(exam_id)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='analytics-refresh', daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        refreshed = 0
+        for exam_id in sorted(pending):
+            try:
+                with self.app.app_context():
+                    self.refresher(exam_id)
+                refreshed += 1
+            except Exception:
+                # Its submissions stay unanalyzed, so the next refresh picks them up
+                logger.exception('Failed to refresh the analytics of exam %s', exam_id)
+        return refreshed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
@@ -1,9 +1,32 @@
-from .models import ExamQuestion, Exam, ExamSubmission, SubmissionAnswer
-from ..questions.models import Question
+import secrets
+from collections import Counter, defaultdict
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, case, delete, exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from .analytics import histogram, item_statistics, score_summary
+from .autosave import AutosaveBuffer
+from .counters import CounterBuffer
+from .refresh import RefreshQueue
+from .models import (
+    ExamQuestion, Exam, ExamSubmission, SubmissionAnswer, ExamAnalytics, ExamQuestionAnalytics,
+    LeaderboardEntry, ExamRuleSet, ExamPaper
+)
+from ..questions.models import Question, QuestionVersion
+from ..questions.pools import question_pools
+from ..utils.background import run_in_background
 from ..utils.db import db
+from ..utils.pagination import keyset_paginate
+from .utils import answer_keys, paper_questions, short_answer_matcher
 
-def get_all_exams():
-    return Exam.query.all()
+
+class SubmissionClosed(Exception):
+    """Raised on an attempt to change the answers of a submission that has
+    been handed in."""
+
+
+def get_all_exams(filters=None, cursor=None, limit=None, fields=None):
+    return keyset_paginate(Exam.query, Exam, cursor, limit, filters, fields)
 
 def get_exam_by_id(exam_id):
     return Exam.query.get(exam_id)
@@ -36,28 +59,156 @@ def update_exam(exam_id, data, user_id):
     db.session.commit()
     return exam
 
+# Service to delete an exam with everything that belongs to it. Returns
+# (exam, queued): exams with more than CASCADE_DELETE_SYNC_LIMIT submissions
+# are queued for deletion in the background instead of in this request.
 def delete_exam(exam_id, user_id):
     exam = Exam.query.get(exam_id)
     if not exam:
-        return None
+        return None, False
     
     # Ensure that only the creator of the exam can delete it
     if exam.user_id != user_id:
         raise PermissionError("You do not have permission to delete this exam.")
     
-    db.session.delete(exam)
+    app_config = current_app.config
+    if exam.submission_count > app_config['CASCADE_DELETE_SYNC_LIMIT']:
+        run_in_background(purge_exam, exam_id, app_config['CASCADE_DELETE_CHUNK_SIZE'])
+        return exam, True
+    purge_exam(exam_id)
+    return exam, False
+
+# Service to delete an exam and every row referencing it with set-based
+# DELETEs in dependency order. Without chunk_size it is one transaction;
+# with it, submissions and their answers (the bulk of the rows) are deleted
+# chunk_size submissions per transaction first, so locks are held briefly.
+def purge_exam(exam_id, chunk_size=None):
+    options = {'synchronize_session': False}
+    while chunk_size:
+        submission_ids = db.session.scalars(
+            select(ExamSubmission.id).where(ExamSubmission.exam_id == exam_id).limit(chunk_size)
+        ).all()
+        if not submission_ids:
+            break
+        db.session.execute(delete(SubmissionAnswer).where(SubmissionAnswer.submission_id.in_(submission_ids)),
+                           execution_options=options)
+        db.session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.submission_id.in_(submission_ids)),
+                           execution_options=options)
+        db.session.execute(delete(ExamSubmission).where(ExamSubmission.id.in_(submission_ids)),
+                           execution_options=options)
+        db.session.commit()
+
+    submission_ids = select(ExamSubmission.id).where(ExamSubmission.exam_id == exam_id)
+    db.session.execute(delete(SubmissionAnswer).where(SubmissionAnswer.submission_id.in_(submission_ids)),
+                       execution_options=options)
+    for model in (LeaderboardEntry, ExamSubmission, ExamQuestion, ExamQuestionAnalytics, ExamAnalytics,
+                  ExamPaper, ExamRuleSet):
+        db.session.execute(delete(model).where(model.exam_id == exam_id), execution_options=options)
+    db.session.execute(delete(Exam).where(Exam.id == exam_id), execution_options=options)
     db.session.commit()
-    return exam
+    answer_keys.invalidate_exam(exam_id)
+
+
+
+
+# Adjust an exam's denormalized counters in the caller's transaction, e.g.
+# bump_exam_counters(exam_id, submission_count=1). The increment is done in
+# SQL so concurrent requests don't overwrite each other. updated_at is kept
+# as is: counters changing is not an edit of the exam.
+def bump_exam_counters(exam_id, **deltas):
+    values = {getattr(Exam, name): getattr(Exam, name) + delta for name, delta in deltas.items()}
+    values[Exam.updated_at] = Exam.updated_at
+    db.session.execute(
+        update(Exam).where(Exam.id == exam_id).values(values),
+        execution_options={'synchronize_session': False},
+    )
+
+# Write buffered counter deltas ({exam_id: {counter: delta}}) in one short
+# transaction, one UPDATE per exam in id order; see CounterBuffer.
+def apply_counter_deltas(deltas):
+    for exam_id in sorted(deltas):
+        bump_exam_counters(exam_id, **deltas[exam_id])
+    db.session.commit()
+
+exam_counters = CounterBuffer(apply_counter_deltas)
+
+# Mark the answer keys of the given exams stale in every worker, in the
+# caller's transaction (see AnswerKeyCache).
+def bump_answer_keys(exam_ids):
+    if exam_ids:
+        db.session.execute(
+            update(Exam)
+            .where(Exam.id.in_(list(exam_ids)))
+            .values(answer_key_version=Exam.answer_key_version + 1, updated_at=Exam.updated_at),
+            execution_options={'synchronize_session': False},
+        )
 
+# Service to recompute the denormalized counters of one or all exams from the
+# underlying tables, to repair any drift. Rule-based exams count the
+# questions and marks of their current rule set. This process's buffered
+# counter deltas are written first, so they are not counted twice.
+def repair_exam_counters(exam_id=None):
+    exam_counters.flush()
+    question_count = select(func.count(ExamQuestion.id)).where(ExamQuestion.exam_id == Exam.id).scalar_subquery()
+    marks_sum = (
+        select(func.coalesce(func.sum(ExamQuestion.marks), 0))
+        .where(ExamQuestion.exam_id == Exam.id)
+        .scalar_subquery()
+    )
+    submission_count = (
+        select(func.count(ExamSubmission.id))
+        .where(ExamSubmission.exam_id == Exam.id, ExamSubmission.draft.is_(False))
+        .scalar_subquery()
+    )
+    graded_count = (
+        select(func.count(ExamSubmission.id))
+        .where(ExamSubmission.exam_id == Exam.id, ExamSubmission.graded.is_(True))
+        .scalar_subquery()
+    )
+    statement = update(Exam).values(
+        question_count=question_count,
+        marks_sum=marks_sum,
+        submission_count=submission_count,
+        graded_count=graded_count,
+        updated_at=Exam.updated_at
+    )
+    if exam_id is not None:
+        statement = statement.where(Exam.id == exam_id)
+    result = db.session.execute(statement, execution_options={'synchronize_session': False})
 
+    latest_versions = (
+        select(ExamRuleSet.exam_id, func.max(ExamRuleSet.version).label('version'))
+        .group_by(ExamRuleSet.exam_id)
+    )
+    if exam_id is not None:
+        latest_versions = latest_versions.where(ExamRuleSet.exam_id == exam_id)
+    latest_versions = latest_versions.subquery()
+    for rule_set in ExamRuleSet.query.join(latest_versions, and_(
+        ExamRuleSet.exam_id == latest_versions.c.exam_id,
+        ExamRuleSet.version == latest_versions.c.version
+    )):
+        db.session.execute(
+            update(Exam)
+            .where(Exam.id == rule_set.exam_id)
+            .values(
+                question_count=sum(rule['count'] for rule in rule_set.rules),
+                marks_sum=rule_set.total_marks,
+                updated_at=Exam.updated_at
+            ),
+            execution_options={'synchronize_session': False},
+        )
 
+    db.session.commit()
+    return result.rowcount
 
 def get_exam_questions(exam_id):
     exam = Exam.query.get(exam_id)
     if not exam:
         raise ValueError(f"Exam with ID {exam_id} not found")
     
-    return ExamQuestion.query.filter_by(exam_id=exam_id).all()
+    return ExamQuestion.query.filter_by(exam_id=exam_id).order_by(
+        ExamQuestion.position.is_(None), ExamQuestion.position, ExamQuestion.id
+    ).all()
 
 def add_question_to_exam(exam_id, data):
     exam = Exam.query.get(exam_id)
@@ -76,66 +227,934 @@ def add_question_to_exam(exam_id, data):
     exam_question = ExamQuestion(
         exam_id=exam_id,
         question_id=question_id,
+        question_version_id=question.current_version_id,
         marks=marks
     )
 
     db.session.add(exam_question)
+    bump_exam_counters(exam_id, question_count=1, marks_sum=marks, answer_key_version=1)
     db.session.commit()
+    answer_keys.invalidate_exam(exam_id)
     return exam_question
 
+# Service to replace an exam's questions in one request. `items` is the full,
+# ordered list of {question_id, marks}; the difference with the current
+# questions is applied as one bulk DELETE, INSERT and UPDATE in a single
+# transaction, and total_marks is recomputed once at the end.
+def set_exam_questions(exam_id, items, user_id):
+    exam = Exam.query.get(exam_id)
+    if not exam:
+        return None
+
+    if exam.user_id != user_id:
+        raise PermissionError("You do not have permission to update this exam.")
+
+    desired = {}
+    for position, item in enumerate(items):
+        question_id, marks = item['question_id'], item['marks']
+        if marks <= 0:
+            raise ValueError("Marks must be greater than 0")
+        if question_id in desired:
+            raise ValueError(f"Question with ID {question_id} is listed more than once")
+        desired[question_id] = (marks, position)
+
+    current_versions = {}
+    if desired:
+        current_versions = dict(db.session.execute(
+            select(Question.id, Question.current_version_id).where(Question.id.in_(desired))
+        ).all())
+        missing = sorted(desired.keys() - current_versions.keys())
+        if missing:
+            raise ValueError(f"Questions {missing} not found")
+
+    # Kept questions move to their latest version only while nobody has
+    # submitted the exam; after that their pinned versions stay.
+    repin = not db.session.scalar(select(exam_has_submissions(exam_id)))
+    removed_ids = []
+    changed = []
+    for exam_question in ExamQuestion.query.filter_by(exam_id=exam_id):
+        if exam_question.question_id not in desired:
+            removed_ids.append(exam_question.id)
+            continue
+        marks, position = desired.pop(exam_question.question_id)
+        version_id = current_versions[exam_question.question_id] if repin else exam_question.question_version_id
+        if (exam_question.marks, exam_question.position, exam_question.question_version_id) != (marks, position, version_id):
+            changed.append({'id': exam_question.id, 'marks': marks, 'position': position,
+                            'question_version_id': version_id})
+
+    if removed_ids:
+        db.session.execute(
+            ExamQuestion.__table__.delete().where(ExamQuestion.id.in_(removed_ids))
+        )
+    if changed:
+        db.session.execute(update(ExamQuestion), changed)
+    if desired:
+        db.session.execute(insert(ExamQuestion), [
+            {'exam_id': exam_id, 'question_id': question_id, 'question_version_id': current_versions[question_id],
+             'marks': marks, 'position': position}
+            for question_id, (marks, position) in desired.items()
+        ])
+
+    exam.total_marks = exam.marks_sum = sum(item['marks'] for item in items)
+    exam.question_count = len(items)
+    bump_answer_keys([exam_id])
+    db.session.commit()
+    answer_keys.invalidate_exam(exam_id)
+    return get_exam_questions(exam_id)
+
 def remove_question_from_exam(exam_id, question_id):
     exam_question = ExamQuestion.query.filter_by(exam_id=exam_id, question_id=question_id).first()
     if not exam_question:
         raise ValueError(f"Question with ID {question_id} not found in exam with ID {exam_id}")
     
     db.session.delete(exam_question)
+    bump_exam_counters(exam_id, question_count=-1, marks_sum=-exam_question.marks, answer_key_version=1)
     db.session.commit()
+    answer_keys.invalidate_exam(exam_id)
 
+# Whether an exam has handed-in submissions, as an EXISTS clause. Checked
+# on the submissions themselves: the submission_count counter is written
+# behind, so it can trail submissions that are already committed.
+def exam_has_submissions(exam_id):
+    return exists().where(ExamSubmission.exam_id == exam_id, ExamSubmission.draft.is_(False))
 
+# Service to move the exams that use a question, but have no submissions
+# yet, on to a new version of it. Returns the ids of the exams moved; the
+# caller commits and invalidates their answer keys.
+def repin_question_version(question_id, question_version_id):
+    exam_ids = db.session.scalars(
+        select(ExamQuestion.exam_id)
+        .join(Exam, Exam.id == ExamQuestion.exam_id)
+        .where(ExamQuestion.question_id == question_id, ~exam_has_submissions(Exam.id))
+    ).all()
+    if exam_ids:
+        db.session.execute(
+            update(ExamQuestion)
+            .where(ExamQuestion.question_id == question_id, ExamQuestion.exam_id.in_(exam_ids))
+            .values(question_version_id=question_version_id),
+            execution_options={'synchronize_session': False},
+        )
+        bump_answer_keys(exam_ids)
+    return exam_ids
 
-# Service to create an exam submission
-def create_submission(exam_id, user_id, answers):
-    submission = ExamSubmission(exam_id=exam_id, user_id=user_id)
-    db.session.add(submission)
+# Service to drop deleted questions from the rule sets whose pools hold
+# them. Rule set versions are never rewritten, since papers are regenerated
+# from their version's pools and seed: existing papers keep their draw and
+# only lose the deleted questions, which drop out of the answer key. If an
+# exam's current version draws from them, a new version without them is
+# written for the papers generated from now on; its rules draw at most what
+# is left and rules left with an empty pool go. Returns the ids of the exams
+# whose rule sets use the questions; the caller commits, repairs their
+# counters and invalidates their answer keys.
+def prune_rule_sets(question_ids):
+    question_ids = set(question_ids)
+    if not question_ids:
+        return []
+
+    def draws_from_deleted(rule_set):
+        return any(question_id in question_ids for rule in rule_set.rules for question_id in rule['pool'])
+
+    exam_ids = set()
+    current = {}
+    for rule_set in ExamRuleSet.query.order_by(ExamRuleSet.exam_id, ExamRuleSet.version):
+        if draws_from_deleted(rule_set):
+            exam_ids.add(rule_set.exam_id)
+        current[rule_set.exam_id] = rule_set
+
+    for exam_id in sorted(exam_ids):
+        rule_set = current[exam_id]
+        if not draws_from_deleted(rule_set):
+            continue
+        rules = []
+        for rule in rule_set.rules:
+            versions = rule.get('versions') or [None] * len(rule['pool'])
+            kept = [(question_id, version_id) for question_id, version_id in zip(rule['pool'], versions)
+                    if question_id not in question_ids]
+            if not kept:
+                continue
+            rules.append(dict(
+                rule,
+                count=min(rule['count'], len(kept)),
+                pool=[question_id for question_id, _ in kept],
+                versions=[version_id for _, version_id in kept]
+            ))
+        db.session.add(ExamRuleSet(
+            exam_id=exam_id,
+            version=rule_set.version + 1,
+            rules=rules,
+            total_marks=sum(rule['count'] * rule['marks'] for rule in rules)
+        ))
+    bump_answer_keys(exam_ids)
+    return sorted(exam_ids)
+
+# Service to delete the submission answers matching `condition` (a clause
+# on SubmissionAnswer, e.g. answers to questions being deleted) in the
+# caller's transaction. The graded submissions losing answers are taken out
+# of the analytics, re-scored from the answers they have left and
+# re-ranked, so no score, leaderboard entry or statistic still counts the
+# deleted answers. Returns the ids of the exams whose submissions changed;
+# the caller commits, then marks them in analytics_queue.
+def remove_submission_answers(condition):
+    affected = db.session.execute(
+        select(ExamSubmission.id, ExamSubmission.exam_id, ExamSubmission.user_id, ExamPaper.rule_version)
+        .outerjoin(ExamPaper, and_(
+            ExamPaper.exam_id == ExamSubmission.exam_id,
+            ExamPaper.user_id == ExamSubmission.user_id,
+        ))
+        .where(
+            ExamSubmission.graded.is_(True),
+            ExamSubmission.id.in_(select(SubmissionAnswer.submission_id).where(condition))
+        )
+    ).all()
+    by_exam = defaultdict(list)
+    by_rule_version = defaultdict(list)
+    for submission_id, exam_id, _, rule_version in affected:
+        by_exam[exam_id].append(submission_id)
+        by_rule_version[exam_id, rule_version].append(submission_id)
+
+    for exam_id, submission_ids in by_exam.items():
+        unfold_exam_analytics(exam_id, submission_ids)
+    db.session.execute(delete(SubmissionAnswer).where(condition), execution_options={'synchronize_session': False})
+    for (exam_id, rule_version), submission_ids in by_rule_version.items():
+        for start in range(0, len(submission_ids), 1000):
+            db.session.execute(
+                update(ExamSubmission)
+                .where(ExamSubmission.id.in_(submission_ids[start:start + 1000]))
+                .values(score=earned_marks(exam_id, rule_version)),
+                execution_options={'synchronize_session': False},
+            )
+    for exam_id in by_exam:
+        rerank_leaderboard_users(exam_id, {
+            user_id for _, submission_exam_id, user_id, _ in affected if submission_exam_id == exam_id
+        })
+    return sorted(by_exam)
+
+
+# Service to define an exam by rules instead of fixed questions. Each rule
+# draws `count` questions of a type from a subject; every call stores a new
+# immutable rule set version with the eligible question pools, and the
+# question versions they are graded against, frozen in it.
+def set_exam_rules(exam_id, data, user_id):
+    exam = Exam.query.get(exam_id)
+    if not exam:
+        return None
+
+    if exam.user_id != user_id:
+        raise PermissionError("You do not have permission to update this exam.")
+
+    rules = []
+    seen = set()
+    for rule in data['rules']:
+        subject_id, question_type = rule['subject_id'], rule['question_type']
+        count, marks = rule['count'], rule['marks']
+        if question_type not in ('short_answer', 'multiple_choice', 'true_false'):
+            raise ValueError(f"Invalid question_type: {question_type}")
+        if count <= 0 or marks <= 0:
+            raise ValueError("Count and marks must be greater than 0")
+        if (subject_id, question_type) in seen:
+            raise ValueError(f"Duplicate rule for subject {subject_id} and type {question_type}")
+        seen.add((subject_id, question_type))
+
+        pool = question_pools.pool(subject_id, question_type)
+        if len(pool) < count:
+            raise ValueError(
+                f"Subject {subject_id} has only {len(pool)} {question_type} questions, {count} requested"
+            )
+        versions = dict(db.session.execute(
+            select(Question.id, Question.current_version_id).where(Question.id.in_(pool))
+        ).all())
+        rules.append({
+            'subject_id': subject_id,
+            'question_type': question_type,
+            'count': count,
+            'marks': marks,
+            'pool': pool,
+            'versions': [versions[question_id] for question_id in pool]
+        })
+
+    total_marks = sum(rule['count'] * rule['marks'] for rule in rules)
+    if data.get('total_marks') is not None and data['total_marks'] != total_marks:
+        raise ValueError(f"Rules add up to {total_marks} marks, not {data['total_marks']}")
+
+    latest = db.session.scalar(select(func.max(ExamRuleSet.version)).where(ExamRuleSet.exam_id == exam_id))
+    rule_set = ExamRuleSet(exam_id=exam_id, version=(latest or 0) + 1, rules=rules, total_marks=total_marks)
+    db.session.add(rule_set)
+    exam.total_marks = exam.marks_sum = total_marks
+    exam.question_count = sum(rule['count'] for rule in rules)
     db.session.commit()
+    return rule_set
+
+# Service to get the current rule set of an exam
+def get_exam_rules(exam_id):
+    return ExamRuleSet.query.filter_by(exam_id=exam_id).order_by(ExamRuleSet.version.desc()).first()
+
+# Service to load one rule set version as the plain dict papers and answer
+# keys are built from
+def load_rule_set(exam_id, version):
+    rule_set = ExamRuleSet.query.filter_by(exam_id=exam_id, version=version).first()
+    return {'version': rule_set.version, 'rules': rule_set.rules}
+
+# Service to get (generating it on first access) a student's randomized paper
+# for a rule-based exam. Only the rule set version and a seed are stored.
+# Questions deleted since the paper was drawn are left out of it.
+def get_exam_paper(exam_id, user_id):
+    paper = ExamPaper.query.filter_by(exam_id=exam_id, user_id=user_id).first()
+    if not paper:
+        current = get_exam_rules(exam_id)
+        if not current:
+            return None
+        paper = ExamPaper(exam_id=exam_id, user_id=user_id, rule_version=current.version, seed=secrets.randbits(31))
+        db.session.add(paper)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent request generated the paper first
+            db.session.rollback()
+            paper = ExamPaper.query.filter_by(exam_id=exam_id, user_id=user_id).first()
+
+    rule_set = load_rule_set(exam_id, paper.rule_version)
+    answer_key = answer_keys.get(exam_id, rule_set)
+    return {
+        'exam_id': exam_id,
+        'rule_version': paper.rule_version,
+        'seed': paper.seed,
+        'questions': [
+            {'question_id': question_id, 'marks': marks}
+            for question_id, marks in paper_questions(rule_set, paper.seed) if question_id in answer_key
+        ]
+    }
 
-    # Saving each answer for the submission
+# Service to get the answer key a student's answers are checked against:
+# the exam's, or for a rule-based exam the one of the student's paper.
+# Returns (answer key, ids of the questions the student may answer).
+def submission_answer_key(exam_id, user_id):
+    paper = ExamPaper.query.filter_by(exam_id=exam_id, user_id=user_id).first()
+    if paper:
+        rule_set = load_rule_set(exam_id, paper.rule_version)
+        answer_key = answer_keys.get(exam_id, rule_set)
+        return answer_key, {question_id for question_id, _ in paper_questions(rule_set, paper.seed)} & answer_key.keys()
+    answer_key = answer_keys.get(exam_id)
+    return answer_key, answer_key.keys()
+
+# Score answers ({'question_id', 'answer'} dicts) against an answer key.
+# Returns (score, [(answer, is_correct)]).
+def score_answers(answer_key, answers):
+    graded_answers = []
+    score = 0
     for answer in answers:
-        submission_answer = SubmissionAnswer(
-            submission_id=submission.id,
-            question_id=answer['question_id'],
-            answer=answer['answer']
-        )
-        db.session.add(submission_answer)
+        entry = answer_key[answer['question_id']]
+        is_correct = entry.is_correct(answer['answer'])
+        if is_correct:
+            score += entry.marks
+        graded_answers.append((answer, is_correct))
+    return score, graded_answers
+
+# Service to create an exam submission.
+# The submission and all of its answers are written in one transaction, with
+# the answers sent as a single multi-row INSERT. Answers are scored on the way
+# in against the exam's cached answer key, so no SELECT against questions is
+# needed and the student gets a score straight away. Each question may be
+# answered once. A draft is stored unscored: its answers can be autosaved
+# until submit_submission hands it in. With SCORE_ON_SUBMIT off, submissions
+# are stored ungraded for auto_grade_exam to score in bulk.
+def create_submission(exam_id, user_id, answers, draft=False):
+    answer_counts = Counter(answer['question_id'] for answer in answers)
+    duplicates = sorted(question_id for question_id, count in answer_counts.items() if count > 1)
+    if duplicates:
+        raise ValueError(f"Questions {duplicates} are answered more than once")
+
+    answer_key, allowed = submission_answer_key(exam_id, user_id)
+    unknown = sorted({answer['question_id'] for answer in answers} - allowed)
+    if unknown:
+        raise ValueError(f"Questions {unknown} are not part of exam with ID {exam_id}")
+
+    graded = not draft and current_app.config['SCORE_ON_SUBMIT']
+    if graded:
+        score, graded_answers = score_answers(answer_key, answers)
+    else:
+        score, graded_answers = None, [(answer, False) for answer in answers]
+
+    submission = ExamSubmission(exam_id=exam_id, user_id=user_id, score=score, graded=graded, draft=draft)
+    db.session.add(submission)
+    db.session.flush()
+
+    if graded:
+        record_leaderboard_scores(exam_id, [(user_id, submission.id, score, submission.submitted_at)])
+
+    if graded_answers:
+        db.session.execute(insert(SubmissionAnswer), [
+            {
+                'submission_id': submission.id,
+                'question_id': answer['question_id'],
+                'question_version_id': answer_key[answer['question_id']].version_id,
+                'answer': answer['answer'],
+                'is_correct': is_correct
+            } for answer, is_correct in graded_answers
+        ])
 
     db.session.commit()
+    if not draft:
+        exam_counters.add(exam_id, submission_count=1, graded_count=int(graded))
+    if graded:
+        analytics_queue.mark(exam_id)
+    return submission
+
+# Service to hand in a draft submission: pending autosaves are written, the
+# answers are scored against the current answer key (answers to questions
+# no longer in the exam are dropped) and the submission is graded, all in
+# one transaction. The draft row is locked so a double submit scores once.
+# With SCORE_ON_SUBMIT off the answers are only pinned to their question
+# versions and the submission is left for auto_grade_exam.
+def submit_submission(submission_id, user_id):
+    autosave_buffer.flush(submission_id)
+    submission = ExamSubmission.query.filter_by(id=submission_id).with_for_update().first()
+    if not submission:
+        return None
+    if submission.user_id != user_id:
+        raise PermissionError("You do not have permission to submit this submission.")
+    if not submission.draft:
+        raise SubmissionClosed(f"Submission {submission_id} has already been submitted")
+
+    exam_id = submission.exam_id
+    answer_key, allowed = submission_answer_key(exam_id, user_id)
+    rows = db.session.execute(
+        select(SubmissionAnswer.id, SubmissionAnswer.question_id, SubmissionAnswer.answer)
+        .where(SubmissionAnswer.submission_id == submission_id)
+    ).all()
+    dropped_ids = [answer_id for answer_id, question_id, _ in rows if question_id not in allowed]
+    answers = [
+        {'id': answer_id, 'question_id': question_id, 'answer': answer}
+        for answer_id, question_id, answer in rows if question_id in allowed
+    ]
+    graded = current_app.config['SCORE_ON_SUBMIT']
+    if graded:
+        score, graded_answers = score_answers(answer_key, answers)
+    else:
+        score, graded_answers = None, [(answer, False) for answer in answers]
+
+    if dropped_ids:
+        db.session.execute(delete(SubmissionAnswer).where(SubmissionAnswer.id.in_(dropped_ids)),
+                           execution_options={'synchronize_session': False})
+    if graded_answers:
+        db.session.execute(update(SubmissionAnswer), [
+            {
+                'id': answer['id'],
+                'question_version_id': answer_key[answer['question_id']].version_id,
+                'is_correct': is_correct
+            } for answer, is_correct in graded_answers
+        ])
+
+    submission.draft = False
+    submission.graded = graded
+    submission.score = score
+    submission.submitted_at = datetime.utcnow()
+    if graded:
+        record_leaderboard_scores(exam_id, [(user_id, submission.id, score, submission.submitted_at)])
+    db.session.commit()
+    exam_counters.add(exam_id, submission_count=1, graded_count=int(graded))
+    if graded:
+        analytics_queue.mark(exam_id)
     return submission
 
 # Service to get all submissions for an exam
-def get_all_submissions(exam_id):
-    return ExamSubmission.query.filter_by(exam_id=exam_id).all()
+def get_all_submissions(exam_id, filters=None, cursor=None, limit=None, fields=None):
+    query = ExamSubmission.query.filter_by(exam_id=exam_id)
+    return keyset_paginate(query, ExamSubmission, cursor, limit, filters, fields)
 
 # Service to get a single submission
 def get_submission_by_id(exam_id, submission_id):
     return ExamSubmission.query.filter_by(id=submission_id, exam_id=exam_id).first()
 
-# Service to grade a submission
-def grade_submission(submission_id, score):
-    submission = ExamSubmission.query.get(submission_id)
-    if submission and not submission.graded:
-        submission.score = score
-        submission.graded = True
-        db.session.commit()
+# Service to grade a submission by hand, or to override the score it got at
+# submit time or from auto-grading (e.g. a short answer the fuzzy matcher
+# missed). An overridden submission is taken out of the analytics and put
+# back with its new score, and its student's leaderboard entry is recomputed.
+def grade_submission(exam_id, submission_id, score):
+    submission = ExamSubmission.query.filter_by(id=submission_id, exam_id=exam_id).with_for_update().first()
+    if not submission:
+        return None
+    if submission.draft:
+        raise ValueError(f"Submission {submission_id} has not been submitted yet")
+
+    newly_graded = not submission.graded
+    if not newly_graded:
+        unfold_exam_analytics(exam_id, [submission_id])
+    submission.score = score
+    submission.graded = True
+    rerank_leaderboard_users(exam_id, [submission.user_id])
+    db.session.commit()
+    if newly_graded:
+        exam_counters.add(exam_id, graded_count=1)
+    analytics_queue.mark(exam_id)
     return submission
 
+# Service to auto-grade every ungraded submission of an exam.
+# Grading is done with set-based UPDATEs instead of loading one ORM object
+# per answer: the first marks each answer against the correct answer of the
+# question version it was given for, short answers that missed are then
+# re-checked in one fuzzy batch per question version, and a final UPDATE per
+# group of submissions sums the marks of their correct answers into the
+# score. Marks come from ExamQuestion, or for students with a paper from the
+# rule set version the paper was drawn from, as in create_submission.
+def auto_grade_exam(exam_id):
+    exam = Exam.query.get(exam_id)
+    if not exam:
+        return None
+
+    pending_rows = db.session.execute(
+        select(ExamSubmission.id, ExamPaper.rule_version)
+        .outerjoin(ExamPaper, and_(
+            ExamPaper.exam_id == ExamSubmission.exam_id,
+            ExamPaper.user_id == ExamSubmission.user_id,
+        ))
+        .where(
+            ExamSubmission.exam_id == exam_id,
+            ExamSubmission.graded.isnot(True),
+            ExamSubmission.draft.is_(False)
+        )
+    ).all()
+    by_rule_version = defaultdict(list)
+    for submission_id, rule_version in pending_rows:
+        by_rule_version[rule_version].append(submission_id)
+
+    graded = 0
+    for rule_version, pending_ids in by_rule_version.items():
+        for start in range(0, len(pending_ids), 1000):
+            chunk = pending_ids[start:start + 1000]
+            grade_answers(chunk)
+            result = db.session.execute(
+                update(ExamSubmission)
+                .where(ExamSubmission.id.in_(chunk))
+                .values(score=earned_marks(exam_id, rule_version), graded=True),
+                execution_options={'synchronize_session': False},
+            )
+            graded += result.rowcount
+            record_leaderboard_scores(exam_id, db.session.execute(
+                select(ExamSubmission.user_id, ExamSubmission.id, ExamSubmission.score, ExamSubmission.submitted_at)
+                .where(ExamSubmission.id.in_(chunk))
+            ).all())
+    bump_exam_counters(exam_id, graded_count=graded)
+    db.session.commit()
+    if graded:
+        analytics_queue.mark(exam_id)
+    return {'exam_id': exam_id, 'graded': graded}
+
+# Mark every answer of the given submissions against the question version
+# it was given for (submissions only take answers to questions of their
+# exam or paper, pinned to the version they are graded against), then
+# fuzzy-match the short answers that missed.
+def grade_answers(submission_ids):
+    answer_is_correct = exists().where(
+        QuestionVersion.id == SubmissionAnswer.question_version_id,
+        func.lower(func.trim(QuestionVersion.correct_answer)) == func.lower(func.trim(SubmissionAnswer.answer)),
+    )
+    db.session.execute(
+        update(SubmissionAnswer)
+        .where(SubmissionAnswer.submission_id.in_(submission_ids))
+        .values(is_correct=answer_is_correct),
+        execution_options={'synchronize_session': False},
+    )
+    grade_short_answers(submission_ids)
+
+# The score of an ExamSubmission as a correlated subquery: the marks of its
+# correct answers, from ExamQuestion or from a rule set version. The first
+# rule whose pool holds a question gives its marks, as in the answer key.
+def earned_marks(exam_id, rule_version=None):
+    if rule_version is None:
+        marks = ExamQuestion.marks
+    else:
+        rules = load_rule_set(exam_id, rule_version)['rules']
+        marks = case(*[(SubmissionAnswer.question_id.in_(rule['pool']), rule['marks']) for rule in rules], else_=0)
+    query = select(func.coalesce(func.sum(marks), 0)).select_from(SubmissionAnswer)
+    if rule_version is None:
+        query = query.join(ExamQuestion, and_(
+            ExamQuestion.exam_id == ExamSubmission.exam_id,
+            ExamQuestion.question_id == SubmissionAnswer.question_id,
+        ))
+    return (
+        query.where(SubmissionAnswer.submission_id == ExamSubmission.id, SubmissionAnswer.is_correct.is_(True))
+        .correlate(ExamSubmission)
+        .scalar_subquery()
+    )
+
+# Service to fuzzy-match the still-incorrect short answers of the given
+# submissions. All answers to a question version are graded as one batch.
+def grade_short_answers(submission_ids):
+    short_answer_versions = db.session.execute(
+        select(QuestionVersion.id, QuestionVersion.correct_answer, QuestionVersion.alternate_answers)
+        .where(
+            QuestionVersion.question_type == 'short_answer',
+            QuestionVersion.id.in_(
+                select(SubmissionAnswer.question_version_id)
+                .where(SubmissionAnswer.submission_id.in_(submission_ids))
+            )
+        )
+    ).all()
+
+    for version_id, correct_answer, alternate_answers in short_answer_versions:
+        rows = db.session.execute(
+            select(SubmissionAnswer.id, SubmissionAnswer.answer)
+            .where(
+                SubmissionAnswer.question_version_id == version_id,
+                SubmissionAnswer.submission_id.in_(submission_ids),
+                SubmissionAnswer.is_correct.isnot(True)
+            )
+        ).all()
+        if not rows:
+            continue
+
+        verdicts = short_answer_matcher(correct_answer, alternate_answers).grade([answer for _, answer in rows])
+        matched_ids = [answer_id for (answer_id, _), is_correct in zip(rows, verdicts) if is_correct]
+        for start in range(0, len(matched_ids), 1000):
+            db.session.execute(
+                update(SubmissionAnswer)
+                .where(SubmissionAnswer.id.in_(matched_ids[start:start + 1000]))
+                .values(is_correct=True),
+                execution_options={'synchronize_session': False},
+            )
+
+# Service to stream every submission of an exam with its answers and the
+# marks of each question: from ExamQuestion, or for students with a paper
+# from the rule set version it was drawn from. Rows are fetched through a
+# server-side cursor in batches, so memory stays flat however large the
+# exam is.
+def iter_exam_results(exam_id, batch_size=1000):
+    rule_marks = [
+        (and_(ExamPaper.rule_version == rule_set.version, SubmissionAnswer.question_id.in_(rule['pool'])),
+         rule['marks'])
+        for rule_set in ExamRuleSet.query.filter_by(exam_id=exam_id).order_by(ExamRuleSet.version)
+        for rule in rule_set.rules
+    ]
+    marks = case(*rule_marks, else_=ExamQuestion.marks) if rule_marks else ExamQuestion.marks
+    query = (
+        select(
+            ExamSubmission.id.label('submission_id'),
+            ExamSubmission.user_id,
+            ExamSubmission.submitted_at,
+            ExamSubmission.score,
+            ExamSubmission.graded,
+            SubmissionAnswer.id.label('answer_id'),
+            SubmissionAnswer.question_id,
+            SubmissionAnswer.answer,
+            SubmissionAnswer.is_correct,
+            marks.label('marks')
+        )
+        .outerjoin(SubmissionAnswer, SubmissionAnswer.submission_id == ExamSubmission.id)
+        .outerjoin(ExamQuestion, and_(
+            ExamQuestion.exam_id == ExamSubmission.exam_id,
+            ExamQuestion.question_id == SubmissionAnswer.question_id
+        ))
+        .outerjoin(ExamPaper, and_(
+            ExamPaper.exam_id == ExamSubmission.exam_id,
+            ExamPaper.user_id == ExamSubmission.user_id
+        ))
+        .where(ExamSubmission.exam_id == exam_id, ExamSubmission.draft.is_(False))
+        .order_by(ExamSubmission.id, SubmissionAnswer.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(query):
+        yield row._mapping
+
+# Service to fold newly graded submissions into the exam's materialized
+# analytics. Only submissions not yet analyzed are aggregated, in chunks,
+# and the analytics row is locked so concurrent refreshes don't double count.
+# Run by analytics_queue after grading writes and by `flask exams
+# refresh-analytics`, never by reads.
+def refresh_exam_analytics(exam_id, chunk_size=1000):
+    analytics = ExamAnalytics.query.filter_by(exam_id=exam_id).with_for_update().first()
+    if not analytics:
+        # The first refresh of an exam creates its row. Workers racing to
+        # do so both insert; the loser waits for the winner's row and locks it.
+        try:
+            with db.session.begin_nested():
+                db.session.add(ExamAnalytics(exam_id=exam_id, submission_count=0, score_counts={}))
+        except IntegrityError:
+            pass
+        analytics = ExamAnalytics.query.filter_by(exam_id=exam_id).with_for_update().one()
+
+    new_ids = db.session.scalars(
+        select(ExamSubmission.id)
+        .where(ExamSubmission.exam_id == exam_id, ExamSubmission.graded.is_(True),
+               ExamSubmission.analyzed.is_(False))
+    ).all()
+
+    fold_analytics(analytics, new_ids, 1, chunk_size)
+    db.session.commit()
+    return len(new_ids)
+
+# Service to take analyzed submissions back out of their exam's analytics,
+# before their score or answers change; the next refresh folds them in
+# again. The caller commits.
+def unfold_exam_analytics(exam_id, submission_ids, chunk_size=1000):
+    analytics = ExamAnalytics.query.filter_by(exam_id=exam_id).with_for_update().first()
+    if not analytics:
+        return
+    analyzed_ids = db.session.scalars(
+        select(ExamSubmission.id)
+        .where(ExamSubmission.id.in_(submission_ids), ExamSubmission.analyzed.is_(True))
+    ).all()
+    fold_analytics(analytics, analyzed_ids, -1, chunk_size)
+
+# Add (sign 1) or remove (sign -1) submissions' scores and answers to or
+# from an exam's locked analytics row and its per-question rows, a chunk of
+# submissions per aggregate query, and flag them analyzed or not.
+def fold_analytics(analytics, submission_ids, sign, chunk_size):
+    exam_id = analytics.exam_id
+    score_counts = dict(analytics.score_counts or {})
+    items = {item.question_id: item for item in ExamQuestionAnalytics.query.filter_by(exam_id=exam_id)}
+
+    for start in range(0, len(submission_ids), chunk_size):
+        chunk = submission_ids[start:start + chunk_size]
+
+        for score, count in db.session.execute(
+            select(func.coalesce(ExamSubmission.score, 0), func.count())
+            .where(ExamSubmission.id.in_(chunk))
+            .group_by(func.coalesce(ExamSubmission.score, 0))
+        ):
+            key = repr(float(score))
+            score_counts[key] = score_counts.get(key, 0) + sign * count
+            if not score_counts[key]:
+                del score_counts[key]
+            analytics.submission_count += sign * count
+
+        for question_id, answered, correct, correct_score_sum in db.session.execute(
+            select(
+                SubmissionAnswer.question_id,
+                func.count(),
+                func.sum(case((SubmissionAnswer.is_correct.is_(True), 1), else_=0)),
+                func.sum(case((SubmissionAnswer.is_correct.is_(True), func.coalesce(ExamSubmission.score, 0)), else_=0))
+            )
+            .join(ExamSubmission, ExamSubmission.id == SubmissionAnswer.submission_id)
+            .where(SubmissionAnswer.submission_id.in_(chunk))
+            .group_by(SubmissionAnswer.question_id)
+        ):
+            item = items.get(question_id)
+            if not item:
+                item = ExamQuestionAnalytics(exam_id=exam_id, question_id=question_id,
+                                             answered_count=0, correct_count=0, correct_score_sum=0)
+                db.session.add(item)
+                items[question_id] = item
+            item.answered_count += sign * answered
+            item.correct_count += sign * (correct or 0)
+            item.correct_score_sum += sign * (correct_score_sum or 0)
+
+        db.session.execute(
+            update(ExamSubmission).where(ExamSubmission.id.in_(chunk)).values(analyzed=sign > 0),
+            execution_options={'synchronize_session': False},
+        )
+
+    analytics.score_counts = score_counts
+
+analytics_queue = RefreshQueue(refresh_exam_analytics)
+
+# Service to refresh the analytics of one or all exams, for submissions no
+# worker's queue got to (e.g. graded before a restart). Returns the number of
+# submissions folded in.
+def refresh_analytics(exam_id=None):
+    exam_ids = [exam_id] if exam_id is not None else db.session.scalars(
+        select(ExamSubmission.exam_id)
+        .where(ExamSubmission.graded.is_(True), ExamSubmission.analyzed.is_(False))
+        .distinct()
+    ).all()
+    return sum(refresh_exam_analytics(current_exam_id) for current_exam_id in exam_ids)
+
+# Service to get an exam's analytics: score distribution plus per-question
+# difficulty (p-value) and point-biserial discrimination. Read-only: it
+# reports the materialized analytics, which trail grading by at most
+# ANALYTICS_REFRESH_INTERVAL seconds.
+def get_exam_analytics(exam_id, bins=10):
+    if not Exam.query.get(exam_id):
+        return None
+
+    analytics = db.session.get(ExamAnalytics, exam_id)
+    score_counts = analytics.score_counts if analytics else {}
+    items = ExamQuestionAnalytics.query.filter_by(exam_id=exam_id).all()
+    summary = score_summary(score_counts)
+    score_total = sum(float(score) * count for score, count in score_counts.items())
+
+    questions = []
+    for item in sorted(items, key=lambda item: item.question_id):
+        p_value, discrimination = item_statistics(item.correct_count, item.correct_score_sum, summary, score_total)
+        questions.append({
+            'question_id': item.question_id,
+            'answered_count': item.answered_count,
+            'correct_count': item.correct_count,
+            'p_value': p_value,
+            'discrimination': discrimination
+        })
+
+    return dict(summary, exam_id=exam_id, histogram=histogram(score_counts, bins), questions=questions)
+
+# Service to fold newly graded scores into an exam's leaderboard, which keeps
+# one row per user holding their best score. results is a list of
+# (user_id, submission_id, score, submitted_at); the caller commits.
+def record_leaderboard_scores(exam_id, results):
+    best = {}
+    for user_id, submission_id, score, submitted_at in results:
+        if score is None:
+            continue
+        current = best.get(user_id)
+        if current is None or score > current[1] or (score == current[1] and submitted_at < current[2]):
+            best[user_id] = (submission_id, score, submitted_at)
+    if not best:
+        return
+
+    entries = LeaderboardEntry.query.filter(
+        LeaderboardEntry.exam_id == exam_id,
+        LeaderboardEntry.user_id.in_(best.keys())
+    )
+    for entry in entries:
+        submission_id, score, submitted_at = best.pop(entry.user_id)
+        if score > entry.score:
+            entry.submission_id = submission_id
+            entry.score = score
+            entry.achieved_at = submitted_at
+
+    if best:
+        db.session.execute(insert(LeaderboardEntry), [
+            {
+                'exam_id': exam_id,
+                'user_id': user_id,
+                'submission_id': submission_id,
+                'score': score,
+                'achieved_at': submitted_at
+            } for user_id, (submission_id, score, submitted_at) in best.items()
+        ])
+
+# Service to rebuild leaderboards from the graded submissions, for when they
+# have drifted (e.g. after scores were edited directly in the database).
+def rebuild_leaderboard(exam_id=None):
+    exam_ids = [exam_id] if exam_id is not None else db.session.scalars(select(Exam.id)).all()
+    for current_exam_id in exam_ids:
+        db.session.execute(
+            LeaderboardEntry.__table__.delete().where(LeaderboardEntry.exam_id == current_exam_id)
+        )
+        record_leaderboard_scores(current_exam_id, db.session.execute(
+            select(ExamSubmission.user_id, ExamSubmission.id, ExamSubmission.score, ExamSubmission.submitted_at)
+            .where(ExamSubmission.exam_id == current_exam_id, ExamSubmission.graded.is_(True))
+            .execution_options(yield_per=1000)
+        ))
+        db.session.commit()
+    return len(exam_ids)
+
+# Recompute users' leaderboard entries from their graded submissions, for
+# when scores went down; the caller commits.
+def rerank_leaderboard_users(exam_id, user_ids):
+    user_ids = list(user_ids)
+    for start in range(0, len(user_ids), 1000):
+        chunk = user_ids[start:start + 1000]
+        db.session.execute(
+            delete(LeaderboardEntry).where(LeaderboardEntry.exam_id == exam_id, LeaderboardEntry.user_id.in_(chunk)),
+            execution_options={'synchronize_session': False},
+        )
+        record_leaderboard_scores(exam_id, db.session.execute(
+            select(ExamSubmission.user_id, ExamSubmission.id, ExamSubmission.score, ExamSubmission.submitted_at)
+            .where(ExamSubmission.exam_id == exam_id, ExamSubmission.user_id.in_(chunk),
+                   ExamSubmission.graded.is_(True))
+        ).all())
+
+# Service to get the top entries of an exam's leaderboard. Users with equal
+# scores share a rank.
+def get_leaderboard(exam_id, limit=10):
+    entries = (
+        LeaderboardEntry.query
+        .filter_by(exam_id=exam_id)
+        .order_by(LeaderboardEntry.score.desc(), LeaderboardEntry.achieved_at)
+        .limit(limit)
+        .all()
+    )
+    leaderboard = []
+    for position, entry in enumerate(entries, 1):
+        rank = leaderboard[-1]['rank'] if leaderboard and leaderboard[-1]['score'] == entry.score else position
+        leaderboard.append({
+            'rank': rank,
+            'user_id': entry.user_id,
+            'submission_id': entry.submission_id,
+            'score': entry.score,
+            'achieved_at': entry.achieved_at
+        })
+    return leaderboard
+
+# Service to get a user's rank on an exam's leaderboard: one more than the
+# number of users with a better score. The count is answered from the
+# (exam_id, score, achieved_at) index without touching the table, but it
+# still walks every better entry, so it costs O(rank) index reads. An
+# order-statistic structure (a count per score kept on write) would make it
+# O(distinct scores), at the price of a shared row updated inside every
+# submit transaction; submissions with equal scores would queue on it.
+def get_leaderboard_rank(exam_id, user_id):
+    entry = LeaderboardEntry.query.filter_by(exam_id=exam_id, user_id=user_id).first()
+    if not entry:
+        return None
+    better = db.session.scalar(
+        select(func.count())
+        .select_from(LeaderboardEntry)
+        .where(LeaderboardEntry.exam_id == exam_id, LeaderboardEntry.score > entry.score)
+    )
+    return {
+        'rank': better + 1,
+        'user_id': entry.user_id,
+        'submission_id': entry.submission_id,
+        'score': entry.score,
+        'achieved_at': entry.achieved_at
+    }
+
+# Service to write a batch of answer updates ({'id', 'answer'} dicts) as one
+# executemany UPDATE by primary key. Saves queued before their submission was
+# handed in are dropped rather than changing answers the score was based on.
+def apply_answer_updates(rows):
+    open_ids = set(db.session.scalars(
+        select(SubmissionAnswer.id)
+        .join(ExamSubmission, ExamSubmission.id == SubmissionAnswer.submission_id)
+        .where(SubmissionAnswer.id.in_([row['id'] for row in rows]), ExamSubmission.draft.is_(True))
+    ))
+    rows = [row for row in rows if row['id'] in open_ids]
+    if rows:
+        db.session.execute(update(SubmissionAnswer), rows)
+    db.session.commit()
+
+autosave_buffer = AutosaveBuffer(apply_answer_updates)
+
+# Service to autosave many answers of a draft submission at once. The answer
+# ids are checked against the submission with one query, then the new values
+# are queued in the write-behind buffer. Only the student's own drafts take
+# saves; handed-in submissions are closed to them.
+def autosave_submission_answers(submission_id, updates, user_id):
+    submission = ExamSubmission.query.get(submission_id)
+    if not submission:
+        raise ValueError(f"Submission {submission_id} not found")
+    if submission.user_id != user_id:
+        raise PermissionError("You do not have permission to change this submission.")
+    if not submission.draft:
+        raise SubmissionClosed(f"Submission {submission_id} has been submitted; its answers can no longer change")
+
+    answer_ids = {item['id'] for item in updates}
+    known_ids = set(db.session.scalars(
+        select(SubmissionAnswer.id)
+        .where(SubmissionAnswer.submission_id == submission_id, SubmissionAnswer.id.in_(answer_ids))
+    ))
+    unknown = sorted(answer_ids - known_ids)
+    if unknown:
+        raise ValueError(f"Answers {unknown} not found for submission {submission_id}")
+
+    autosave_buffer.add(submission_id, [(item['id'], item['answer']) for item in updates])
+    return len(answer_ids)
+
 # Service to get all answers for a submission
 def get_submission_answers(submission_id):
+    autosave_buffer.flush(submission_id)
     return SubmissionAnswer.query.filter_by(submission_id=submission_id).all()
 
-# Service to update a specific answer in a submission (optional)
-def update_submission_answer(submission_id, answer_id, new_answer):
+# Service to update a specific answer in a draft submission (optional)
+def update_submission_answer(submission_id, answer_id, new_answer, user_id):
+    autosave_buffer.flush(submission_id)
     submission_answer = SubmissionAnswer.query.filter_by(id=answer_id, submission_id=submission_id).first()
     if submission_answer:
+        submission = submission_answer.submission
+        if submission.user_id != user_id:
+            raise PermissionError("You do not have permission to change this submission.")
+        if not submission.draft:
+            raise SubmissionClosed(f"Submission {submission_id} has been submitted; its answers can no longer change")
         submission_answer.answer = new_answer['answer']
         db.session.commit()
     return submission_answer
\ No newline at end of file
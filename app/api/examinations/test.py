@@ -0,0 +1,424 @@
+import json
+
+import pytest
+
+from ..utils.db import db
+from .matching import ShortAnswerMatcher, bounded_edit_distance
+from .models import ExamQuestion, ExamSubmission, SubmissionAnswer
+from .services import exam_counters
+
+
+@pytest.fixture
+def exam(client, make_user):
+    """An exam owned by a new user with a 2-mark true/false question and a
+    3-mark multiple-choice question; returns (exam, questions, headers)."""
+    _, headers = make_user()
+    subject = client.post('/subjects/', json={'name': 'Geography'}, headers=headers).get_json()
+    questions = [
+        client.post('/questions/', json={
+            'subject_id': subject['id'], 'question_text': text, 'question_type': question_type,
+            'correct_answer': correct_answer, 'options': options
+        }, headers=headers).get_json()
+        for text, question_type, correct_answer, options in [
+            ('Paris is the capital of France', 'true_false', 'True', None),
+            ('Capital of Italy?', 'multiple_choice', 'Rome', ['Rome', 'Milan']),
+        ]
+    ]
+    exam = client.post('/exams/', json={'title': 'Capitals', 'total_marks': 5, 'duration': 30},
+                       headers=headers).get_json()
+    for question, marks in zip(questions, (2, 3)):
+        client.post(f"/exams/{exam['id']}/questions", json={'question_id': question['id'], 'marks': marks},
+                    headers=headers)
+    return exam, questions, headers
+
+
+def add_ungraded_submission(exam_id, user_id, answers):
+    submission = ExamSubmission(exam_id=exam_id, user_id=user_id)
+    db.session.add(submission)
+    db.session.flush()
+    db.session.add_all([
+        SubmissionAnswer(submission_id=submission.id, question_id=question['id'],
+                         question_version_id=question['current_version_id'], answer=answer)
+        for question, answer in answers
+    ])
+    db.session.commit()
+    return submission.id
+
+
+def test_auto_grade_grades_every_pending_submission(client, make_user, exam):
+    exam, (true_false, choice), headers = exam
+    submission_ids = [
+        add_ungraded_submission(exam['id'], make_user()[0], [(true_false, 'true'), (choice, answer)])
+        for answer in ('Rome', 'Milan', 'rome', 'Milan', 'Rome')
+    ]
+
+    response = client.post(f"/exams/{exam['id']}/grade", headers=headers)
+
+    assert response.status_code == 200
+    assert response.get_json()['graded'] == 5
+    scores = dict(db.session.execute(
+        db.select(ExamSubmission.id, ExamSubmission.score).where(ExamSubmission.id.in_(submission_ids))
+    ).all())
+    assert [scores[submission_id] for submission_id in submission_ids] == [5, 2, 5, 2, 5]
+    leaderboard = client.get(f"/exams/{exam['id']}/leaderboard?limit=10", headers=headers).get_json()
+    assert sorted(entry['score'] for entry in leaderboard) == [2, 2, 5, 5, 5]
+
+
+def test_autosave_is_refused_once_a_submission_is_submitted(client, make_user, exam):
+    exam, (true_false, choice), headers = exam
+    _, student = make_user()
+    submission = client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}, {'question_id': choice['id'], 'answer': 'Milan'}
+    ]}, headers=student).get_json()
+    assert submission['score'] == 2
+    answers = client.get(f"/exams/submissions/{submission['id']}/answers", headers=student).get_json()
+    wrong_answer = next(answer for answer in answers if answer['answer'] == 'Milan')
+
+    response = client.patch(f"/exams/submissions/{submission['id']}/answers", json={'answers': [
+        {'id': wrong_answer['id'], 'answer': 'Rome'}
+    ]}, headers=student)
+    assert response.status_code == 409
+    response = client.put(f"/exams/submissions/{submission['id']}/answers/{wrong_answer['id']}",
+                          json={'answer': 'Rome'}, headers=student)
+    assert response.status_code == 409
+
+    stored = db.session.get(SubmissionAnswer, wrong_answer['id'])
+    assert (stored.answer, stored.is_correct) == ('Milan', False)
+    assert db.session.get(ExamSubmission, submission['id']).score == 2
+
+
+def start_draft(client, exam, headers, answers):
+    submission = client.post(f"/exams/{exam['id']}/submissions", json={'draft': True, 'answers': [
+        {'question_id': question['id'], 'answer': answer} for question, answer in answers
+    ]}, headers=headers).get_json()
+    answers = client.get(f"/exams/submissions/{submission['id']}/answers", headers=headers).get_json()
+    return submission, sorted(answers, key=lambda answer: answer['id'])
+
+
+def test_draft_is_autosaved_then_scored_on_submit(client, make_user, exam):
+    from .services import autosave_buffer
+    exam, (true_false, choice), _ = exam
+    _, student = make_user()
+    submission, answers = start_draft(client, exam, student, [(true_false, ''), (choice, 'Milan')])
+    assert (submission['draft'], submission['graded'], submission['score']) == (True, False, None)
+
+    response = client.patch(f"/exams/submissions/{submission['id']}/answers", json={'answers': [
+        {'id': answers[0]['id'], 'answer': 'True'}, {'id': answers[1]['id'], 'answer': 'Rome'}
+    ]}, headers=student)
+    assert response.status_code == 202
+    autosave_buffer.flush(submission['id'])
+    db.session.expire_all()
+    assert db.session.get(SubmissionAnswer, answers[1]['id']).answer == 'Rome'
+
+    response = client.put(f"/exams/submissions/{submission['id']}/answers/{answers[1]['id']}",
+                          json={'answer': 'Milan'}, headers=student)
+    assert response.status_code == 200
+
+    response = client.post(f"/exams/submissions/{submission['id']}/submit", headers=student)
+    assert response.status_code == 200
+    submitted = response.get_json()
+    assert (submitted['draft'], submitted['graded'], submitted['score']) == (False, True, 2)
+    assert client.post(f"/exams/submissions/{submission['id']}/submit", headers=student).status_code == 409
+    exam_counters.flush()
+    assert client.get(f"/exams/{exam['id']}", headers=student).get_json()['submission_count'] == 1
+
+
+def test_pending_autosaves_are_written_before_submit_scores(client, make_user, exam):
+    exam, (true_false, choice), _ = exam
+    _, student = make_user()
+    submission, answers = start_draft(client, exam, student, [(true_false, 'False'), (choice, 'Milan')])
+
+    client.patch(f"/exams/submissions/{submission['id']}/answers", json={'answers': [
+        {'id': answers[0]['id'], 'answer': 'True'}, {'id': answers[1]['id'], 'answer': 'Rome'}
+    ]}, headers=student)
+
+    submitted = client.post(f"/exams/submissions/{submission['id']}/submit", headers=student).get_json()
+    assert submitted['score'] == 5
+
+
+def test_only_the_student_can_change_or_submit_their_draft(client, make_user, exam):
+    exam, (true_false, _), _ = exam
+    _, student = make_user()
+    _, someone_else = make_user()
+    submission, answers = start_draft(client, exam, student, [(true_false, 'True')])
+
+    response = client.patch(f"/exams/submissions/{submission['id']}/answers", json={'answers': [
+        {'id': answers[0]['id'], 'answer': 'False'}
+    ]}, headers=someone_else)
+    assert response.status_code == 403
+    response = client.put(f"/exams/submissions/{submission['id']}/answers/{answers[0]['id']}",
+                          json={'answer': 'False'}, headers=someone_else)
+    assert response.status_code == 403
+    assert client.post(f"/exams/submissions/{submission['id']}/submit", headers=someone_else).status_code == 403
+
+
+def test_submission_answering_a_question_twice_is_rejected(client, make_user, exam):
+    exam, (true_false, _), _ = exam
+    _, student = make_user()
+
+    response = client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'} for _ in range(5)
+    ]}, headers=student)
+
+    assert response.status_code == 400
+    assert str(true_false['id']) in response.get_json()['message']
+    assert not db.session.scalars(db.select(ExamSubmission.id)).all()
+    assert not db.session.scalars(db.select(SubmissionAnswer.id)).all()
+
+
+@pytest.fixture
+def other_worker(monkeypatch):
+    """Drop invalidate_exam calls, as if every change were made by another
+    worker whose in-process invalidation never reaches this one."""
+    from .utils import answer_keys
+    monkeypatch.setattr(answer_keys, 'invalidate_exam', lambda exam_id: None)
+    return answer_keys
+
+
+def test_answer_key_is_rebuilt_after_another_worker_edits_a_question(client, make_user, exam, other_worker):
+    exam, (true_false, choice), headers = exam
+    assert other_worker.get(exam['id'])[true_false['id']].correct_answer == 'true'
+
+    response = client.put(f"/questions/{true_false['id']}", json={
+        'subject_id': true_false['subject_id'], 'question_text': 'Paris is the capital of Italy',
+        'question_type': 'true_false', 'correct_answer': 'False'
+    }, headers=headers)
+    assert response.status_code == 200
+
+    _, student = make_user()
+    submission = client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'False'}, {'question_id': choice['id'], 'answer': 'Rome'}
+    ]}, headers=student).get_json()
+    assert submission['score'] == 5
+
+
+def test_answer_key_is_rebuilt_after_another_worker_removes_a_question(client, make_user, exam, other_worker):
+    exam, (true_false, choice), headers = exam
+    assert set(other_worker.get(exam['id'])) == {true_false['id'], choice['id']}
+
+    response = client.delete(f"/exams/{exam['id']}/questions/{choice['id']}", headers=headers)
+    assert response.status_code == 204
+
+    _, student = make_user()
+    response = client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}, {'question_id': choice['id'], 'answer': 'Rome'}
+    ]}, headers=student)
+    assert response.status_code == 400
+    assert str(choice['id']) in response.get_json()['message']
+
+
+def test_analytics_are_refreshed_by_grading_not_by_reads(client, make_user, exam):
+    from .services import analytics_queue
+    exam, (true_false, choice), headers = exam
+    for answer in ('Rome', 'Milan'):
+        client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+            {'question_id': true_false['id'], 'answer': 'True'}, {'question_id': choice['id'], 'answer': answer}
+        ]}, headers=make_user()[1])
+
+    analytics = client.get(f"/exams/{exam['id']}/analytics", headers=headers).get_json()
+    assert analytics['submission_count'] == 0
+    assert db.session.scalars(db.select(ExamSubmission.analyzed)).all() == [False, False]
+
+    assert analytics_queue.flush() == 1
+    analytics = client.get(f"/exams/{exam['id']}/analytics", headers=headers).get_json()
+    assert (analytics['submission_count'], analytics['min'], analytics['max']) == (2, 2, 5)
+    assert {item['question_id']: item['correct_count'] for item in analytics['questions']} == {
+        true_false['id']: 2, choice['id']: 1
+    }
+
+
+def test_teacher_can_override_a_score_given_at_submit(client, make_user, exam):
+    from .services import analytics_queue
+    exam, (true_false, choice), headers = exam
+    _, student = make_user()
+    submission = client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}, {'question_id': choice['id'], 'answer': 'Milan'}
+    ]}, headers=student).get_json()
+    analytics_queue.flush()
+    url = f"/exams/{exam['id']}/submissions/{submission['id']}"
+
+    assert client.put(url, json={'score': 4}, headers=student).status_code == 403
+    response = client.put(url, json={'score': 4}, headers=headers)
+    assert response.status_code == 200
+    assert (response.get_json()['score'], response.get_json()['graded']) == (4, True)
+    assert client.get(f"/exams/{exam['id']}/leaderboard/me", headers=student).get_json()['score'] == 4
+
+    assert client.put(url, json={'score': 1}, headers=headers).get_json()['score'] == 1
+    assert client.get(f"/exams/{exam['id']}/leaderboard/me", headers=student).get_json()['score'] == 1
+    analytics_queue.flush()
+    analytics = client.get(f"/exams/{exam['id']}/analytics", headers=headers).get_json()
+    assert (analytics['submission_count'], analytics['mean']) == (1, 1)
+    exam_counters.flush()
+    assert client.get(f"/exams/{exam['id']}", headers=headers).get_json()['graded_count'] == 1
+
+
+def test_a_draft_cannot_be_graded(client, make_user, exam):
+    exam, (true_false, _), headers = exam
+    _, student = make_user()
+    draft = client.post(f"/exams/{exam['id']}/submissions", json={'draft': True, 'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}
+    ]}, headers=student).get_json()
+
+    response = client.put(f"/exams/{exam['id']}/submissions/{draft['id']}", json={'score': 2}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_submissions_wait_for_auto_grade_when_not_scored_on_submit(app, client, make_user, exam):
+    app.config['SCORE_ON_SUBMIT'] = False
+    exam, (true_false, choice), headers = exam
+    _, student = make_user()
+    submission = client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}, {'question_id': choice['id'], 'answer': 'Rome'}
+    ]}, headers=student).get_json()
+    assert submission['graded'] is False and submission['score'] is None
+    draft, _ = start_draft(client, exam, student, [(true_false, 'False'), (choice, 'Rome')])
+    assert client.post(f"/exams/submissions/{draft['id']}/submit", headers=student).get_json()['graded'] is False
+
+    response = client.post(f"/exams/{exam['id']}/grade", headers=headers)
+
+    assert response.get_json()['graded'] == 2
+    submissions = client.get(f"/exams/{exam['id']}/submissions", headers=headers).get_json()
+    assert sorted(submission['score'] for submission in submissions) == [3, 5]
+
+
+def test_auto_grade_scores_rule_based_exams_from_the_students_paper(app, client, make_user, exam):
+    app.config['SCORE_ON_SUBMIT'] = False
+    exam, (true_false, _), headers = exam
+    rules = client.put(f"/exams/{exam['id']}/rules", json={'rules': [
+        {'subject_id': true_false['subject_id'], 'question_type': 'true_false', 'count': 1, 'marks': 4}
+    ]}, headers=headers)
+    assert rules.status_code == 200
+    _, student = make_user()
+    paper = client.get(f"/exams/{exam['id']}/paper", headers=student).get_json()
+    assert [question['question_id'] for question in paper['questions']] == [true_false['id']]
+    client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'true'}
+    ]}, headers=student)
+
+    assert client.post(f"/exams/{exam['id']}/grade", headers=headers).get_json()['graded'] == 1
+    submissions = client.get(f"/exams/{exam['id']}/submissions", headers=headers).get_json()
+    assert [submission['score'] for submission in submissions] == [4]
+
+
+def test_only_the_exam_owner_or_an_admin_can_export_results(client, make_user, exam):
+    exam, (true_false, choice), headers = exam
+    _, student = make_user()
+    client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}, {'question_id': choice['id'], 'answer': 'Milan'}
+    ]}, headers=student)
+
+    assert client.get(f"/exams/{exam['id']}/export", headers=student).status_code == 403
+    for user in (headers, make_user(admin=True)[1]):
+        response = client.get(f"/exams/{exam['id']}/export?format=csv", headers=user)
+        assert response.status_code == 200
+        assert response.headers['Content-Disposition'] == f"attachment; filename=exam-{exam['id']}-results.csv"
+        assert len(response.get_data(as_text=True).splitlines()) == 3
+
+
+def test_export_gives_the_marks_of_a_rule_based_paper(client, make_user, exam):
+    exam, (true_false, _), headers = exam
+    client.put(f"/exams/{exam['id']}/rules", json={'rules': [
+        {'subject_id': true_false['subject_id'], 'question_type': 'true_false', 'count': 1, 'marks': 4}
+    ]}, headers=headers)
+    _, student = make_user()
+    client.get(f"/exams/{exam['id']}/paper", headers=student)
+    client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+        {'question_id': true_false['id'], 'answer': 'True'}
+    ]}, headers=student)
+
+    response = client.get(f"/exams/{exam['id']}/export", headers=headers)
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [(row['question_id'], row['is_correct'], row['marks'], row['score']) for row in rows] == [
+        (true_false['id'], True, 4, 4)
+    ]
+
+
+def test_only_the_exam_owner_or_an_admin_can_see_analytics_or_grade(client, make_user, exam):
+    exam, _, headers = exam
+    _, student = make_user()
+    _, admin = make_user(admin=True)
+
+    for method, path in (('get', 'analytics'), ('post', 'grade')):
+        url = f"/exams/{exam['id']}/{path}"
+        assert getattr(client, method)(url, headers=student).status_code == 403
+        assert getattr(client, method)(url, headers=headers).status_code == 200
+        assert getattr(client, method)(url, headers=admin).status_code == 200
+        assert getattr(client, method)(f"/exams/{exam['id'] + 1}/{path}", headers=headers).status_code == 404
+
+
+def test_submissions_bump_exam_counters_behind_the_submit(client, make_user, exam):
+    exam, (true_false, choice), headers = exam
+    for _ in range(3):
+        _, student = make_user()
+        client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+            {'question_id': true_false['id'], 'answer': 'True'}
+        ]}, headers=student)
+    start_draft(client, exam, student, [(choice, 'Rome')])
+
+    # Written behind: questions are no longer repinned once the exam has submissions
+    response = client.put(f"/questions/{true_false['id']}", json=dict(true_false, question_text='Paris is in France'),
+                          headers=headers)
+    assert response.status_code == 200
+    pinned = db.session.scalar(db.select(ExamQuestion.question_version_id).where(
+        ExamQuestion.exam_id == exam['id'], ExamQuestion.question_id == true_false['id']))
+    assert pinned == true_false['current_version_id']
+    assert client.get(f"/exams/{exam['id']}", headers=headers).get_json()['submission_count'] == 0
+
+    assert exam_counters.flush() == 1
+    counters = client.get(f"/exams/{exam['id']}", headers=headers).get_json()
+    assert (counters['submission_count'], counters['graded_count']) == (3, 3)
+
+
+@pytest.mark.parametrize('a, b, max_distance, expected', [
+    ('paris', 'paris', 2, 0),
+    ('paris', 'pariss', 2, 1),
+    ('paris', 'prais', 2, 2),
+    ('paris', 'london', 2, 3),
+    ('ab', 'abcdef', 2, 3),
+    ('', 'ab', 2, 2),
+])
+def test_bounded_edit_distance_stops_past_the_bound(a, b, max_distance, expected):
+    assert bounded_edit_distance(a, b, max_distance) == expected
+
+
+def test_short_answer_matcher_normalizes_and_tolerates_typos():
+    matcher = ShortAnswerMatcher('Photosynthesis', ['light reaction'], max_edits=2, fuzzy_ratio=0.2)
+
+    assert matcher.matches('  PHOTOSYNTHESIS! ')
+    assert matcher.matches('photosynthesys')
+    assert matcher.matches('Light-reaction')
+    assert not matcher.matches('photo')
+    assert not matcher.matches('')
+
+
+def test_short_answer_matcher_only_matches_numbers_exactly():
+    matcher = ShortAnswerMatcher('1945')
+
+    assert matcher.matches(' 1945.')
+    assert not matcher.matches('1946')
+
+
+def test_short_answer_grading_is_the_same_in_the_process_pool():
+    answers = ['Paris', 'paris!', 'Pariss', 'Lyon', 'Pari', 'Marseille', 'PARIS']
+    expected = [True, True, True, False, True, False, True]
+
+    assert ShortAnswerMatcher('Paris').grade(answers) == expected
+    assert ShortAnswerMatcher('Paris', pool_threshold=1).grade(answers) == expected
+
+
+def test_short_answers_are_scored_with_the_fuzzy_matcher_at_submit(client, make_user, exam):
+    exam, _, headers = exam
+    question = client.post('/questions/', json={
+        'subject_id': 1, 'question_text': 'Largest planet?', 'question_type': 'short_answer',
+        'correct_answer': 'Jupiter', 'alternate_answers': ['Jove']
+    }, headers=headers).get_json()
+    client.post(f"/exams/{exam['id']}/questions", json={'question_id': question['id'], 'marks': 4}, headers=headers)
+
+    scores = []
+    for answer in ('jupyter', 'JOVE', 'Saturn'):
+        _, student = make_user()
+        scores.append(client.post(f"/exams/{exam['id']}/submissions", json={'answers': [
+            {'question_id': question['id'], 'answer': answer}
+        ]}, headers=student).get_json()['score'])
+    assert scores == [4, 4, 0]
@@ -0,0 +1,147 @@
+import random
+import threading
+from collections import OrderedDict, namedtuple
+from flask import current_app
+from sqlalchemy import select
+from .matching import ShortAnswerMatcher
+from .models import Exam, ExamQuestion
+from ..questions.models import Question, QuestionVersion
+from ..utils.db import db
+
+def normalize_answer(answer):
+    return (answer or '').strip().lower()
+
+
+def short_answer_matcher(correct_answer, alternate_answers=None):
+    app_config = current_app.config
+    return ShortAnswerMatcher(
+        correct_answer,
+        alternate_answers,
+        max_edits=app_config['SHORT_ANSWER_MAX_EDITS'],
+        fuzzy_ratio=app_config['SHORT_ANSWER_FUZZY_RATIO'],
+        pool_threshold=app_config['SHORT_ANSWER_POOL_THRESHOLD']
+    )
+
+
+def paper_questions(rule_set, seed):
+    """Regenerate a paper: [(question_id, marks)] sampled from each rule's
+    frozen pool with a generator seeded by the paper's seed."""
+    rng = random.Random(seed)
+    questions = []
+    for rule in rule_set['rules']:
+        for question_id in rng.sample(rule['pool'], rule['count']):
+            questions.append((question_id, rule['marks']))
+    return questions
+
+
+class AnswerKeyEntry(namedtuple('AnswerKeyEntry', ['version_id', 'correct_answer', 'marks', 'question_type', 'matcher'])):
+    __slots__ = ()
+
+    def is_correct(self, answer):
+        if self.matcher is not None:
+            return self.matcher.matches(answer)
+        return normalize_answer(answer) == self.correct_answer
+
+
+class AnswerKeyCache:
+    """In-process LRU cache of compiled exam answer keys.
+
+    A key maps question_id -> AnswerKeyEntry for every question of an exam:
+    its ExamQuestion rows, or for a rule-based exam the question pools of
+    one rule set version. Entries are built from the question versions the
+    exam pins, which never change, so editing a question doesn't touch the
+    cache. Each worker process holds its own cache, so every entry records
+    the exam's answer_key_version it was built at; services bump that
+    column whenever the exam's questions, marks, pins or rule pools change,
+    and a lookup that finds a newer version rebuilds the key. That costs
+    one primary-key read per lookup.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, exam_id, rule_set=None):
+        cache_key = (exam_id, rule_set['version'] if rule_set else None)
+        version = db.session.scalar(select(Exam.answer_key_version).where(Exam.id == exam_id))
+        with self._lock:
+            entry = self._keys.get(cache_key)
+            if entry is not None and entry[0] == version:
+                self._keys.move_to_end(cache_key)
+                return entry[1]
+
+        key = self._build_from_rules(rule_set) if rule_set else self._build(exam_id)
+
+        with self._lock:
+            self._store(cache_key, (version, key))
+        return key
+
+    def invalidate_exam(self, exam_id):
+        """Drop this process's keys of an exam now rather than at their next lookup."""
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._keys if cache_key[0] == exam_id]:
+                self._discard(cache_key)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def _build(self, exam_id):
+        rows = db.session.execute(
+            select(ExamQuestion.question_id, QuestionVersion.id, QuestionVersion.correct_answer, ExamQuestion.marks,
+                   QuestionVersion.question_type, QuestionVersion.alternate_answers)
+            .join(QuestionVersion, QuestionVersion.id == ExamQuestion.question_version_id)
+            .where(ExamQuestion.exam_id == exam_id)
+        )
+        return self._compile(rows)
+
+    def _build_from_rules(self, rule_set):
+        marks = {}
+        versions = {}
+        for rule in rule_set['rules']:
+            for question_id, version_id in zip(rule['pool'], rule.get('versions') or [None] * len(rule['pool'])):
+                marks.setdefault(question_id, rule['marks'])
+                versions.setdefault(question_id, version_id)
+        if not marks:
+            return {}
+        # Rule sets written before versions were frozen in them grade
+        # against each question's current version.
+        unpinned = [question_id for question_id, version_id in versions.items() if version_id is None]
+        if unpinned:
+            versions.update(db.session.execute(
+                select(Question.id, Question.current_version_id).where(Question.id.in_(unpinned))
+            ).all())
+        rows = db.session.execute(
+            select(QuestionVersion.question_id, QuestionVersion.id, QuestionVersion.correct_answer,
+                   QuestionVersion.question_type, QuestionVersion.alternate_answers)
+            .where(QuestionVersion.id.in_(versions.values()))
+        )
+        return self._compile(
+            (question_id, version_id, correct_answer, marks[question_id], question_type, alternate_answers)
+            for question_id, version_id, correct_answer, question_type, alternate_answers in rows
+        )
+
+    def _compile(self, rows):
+        return {
+            question_id: AnswerKeyEntry(
+                version_id,
+                normalize_answer(correct_answer),
+                marks,
+                question_type,
+                short_answer_matcher(correct_answer, alternate_answers) if question_type == 'short_answer' else None
+            )
+            for question_id, version_id, correct_answer, marks, question_type, alternate_answers in rows
+        }
+
+    def _store(self, cache_key, key):
+        self._discard(cache_key)
+        self._keys[cache_key] = key
+        while len(self._keys) > self.maxsize:
+            self._discard(next(iter(self._keys)))
+
+    def _discard(self, cache_key):
+        self._keys.pop(cache_key, None)
+
+
+answer_keys = AnswerKeyCache()
@@ -0,0 +1,12 @@
+from ..utils.db import db
+
+class RateLimitCounter(db.Model):
+    __tablename__ = 'rate_limit_counters'
+
+    key = db.Column(db.String(191), primary_key=True)  # e.g. 'login:ip:203.0.113.7'
+    window = db.Column(db.BigInteger, primary_key=True, autoincrement=False)  # time // window length
+    count = db.Column(db.Integer, nullable=False, default=0)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # When the row stops mattering
+
+    def __repr__(self):
+        return f'<RateLimitCounter {self.key} {self.window}: {self.count}>'
@@ -3,6 +3,9 @@ from datetime import datetime, timedelta
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(45), unique=True, nullable=False)
@@ -36,6 +39,7 @@ class TokenBlacklist(db.Model):
     token_type = db.Column(db.String(10), nullable=False)  # e.g., 'access' or 'refresh'
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     blacklisted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)  # When the token expires; the row can go then
 
     def __repr__(self):
         return f'<TokenBlacklist {self.jti}>'
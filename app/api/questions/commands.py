@@ -0,0 +1,28 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .importer import iter_csv_rows, iter_ndjson_rows
+from .services import import_questions
+
+questions_cli = AppGroup('questions', help='Maintenance commands for the question bank.')
+
+
+@questions_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, required=True, help='Author of the imported questions.')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']), default=None,
+              help='File format (default: from the file extension).')
+@click.option('--chunk-size', type=click.IntRange(1), default=None, help='Rows inserted per transaction.')
+def import_command(path, user_id, file_format, chunk_size):
+    """Import questions from a CSV or NDJSON file."""
+    if not file_format:
+        file_format = 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+    chunk_size = chunk_size or current_app.config['QUESTION_IMPORT_CHUNK_SIZE']
+
+    with open(path, 'rb') as stream:
+        rows = iter_csv_rows(stream) if file_format == 'csv' else iter_ndjson_rows(stream)
+        report = import_questions(rows, user_id, chunk_size)
+
+    click.echo(f"Imported {report['imported']} question(s), rejected {report['failed']}.")
+    for error in report['errors']:
+        click.echo(f"  line {error['line']}: {'; '.join(error['errors'])}")
@@ -1,7 +1,15 @@
-from flask_restx import Resource, fields
-from .services import get_all_questions, get_question_by_id, create_question, update_question, delete_question
+from flask import current_app, request
+from flask_restx import Resource, fields, inputs
+from werkzeug.datastructures import FileStorage
+from .importer import iter_csv_rows, iter_ndjson_rows
+from .services import (
+    get_all_questions, get_question_by_id, create_question, update_question, delete_question, import_questions,
+    search_questions, find_similar_questions, get_duplicate_report, get_question_versions
+)
 from flask_jwt_extended import jwt_required,get_jwt_identity
 from ..models.users import User
+from ..utils.pagination import pagination_parser, page_headers
+from ..utils.fieldsets import parse_fieldset, marshal_fieldset
 
 def register_routes(api):
     question_model = api.model('Question', {
@@ -15,28 +23,169 @@ def register_routes(api):
         ),
         'options': fields.List(fields.String, description='The possible options for a multiple-choice question'),
         'correct_answer': fields.String(required=True, description='The correct answer to the question'),
+        'alternate_answers': fields.List(fields.String, description='Other accepted answers for a short-answer question'),
+        'current_version_id': fields.Integer(readOnly=True, description='The latest version of the question'),
         'created_at': fields.DateTime(readOnly=True),
         'updated_at': fields.DateTime(readOnly=True),
     })
 
+    question_version_model = api.model('QuestionVersion', {
+        'id': fields.Integer(readOnly=True),
+        'question_id': fields.Integer,
+        'version': fields.Integer(description='1 for the original question, counting up with each edit'),
+        'question_text': fields.String,
+        'question_type': fields.String,
+        'options': fields.List(fields.String),
+        'correct_answer': fields.String,
+        'alternate_answers': fields.List(fields.String),
+        'created_at': fields.DateTime,
+    })
+
+    question_list_parser = pagination_parser.copy()
+    question_list_parser.add_argument('subject_id', type=int, location='args', help='Only questions of this subject')
+    question_list_parser.add_argument('question_type', type=str, location='args',
+                                      choices=('short_answer', 'multiple_choice', 'true_false'),
+                                      help='Only questions of this type')
+    question_list_parser.add_argument('user_id', type=int, location='args', help='Only questions created by this user')
+
+    search_parser = api.parser()
+    search_parser.add_argument('q', type=str, required=True, location='args', help='Words to search for')
+    search_parser.add_argument('subject_id', type=int, location='args', help='Only questions of this subject')
+    search_parser.add_argument('question_type', type=str, location='args',
+                               choices=('short_answer', 'multiple_choice', 'true_false'),
+                               help='Only questions of this type')
+    search_parser.add_argument('limit', type=inputs.int_range(1, 100), location='args', default=20,
+                               help='Maximum number of results')
+
+    search_result_model = api.model('QuestionSearchResult', {
+        'relevance': fields.Float(description='How well the question matches; higher is better'),
+        'question': fields.Nested(question_model)
+    })
+
+    create_parser = api.parser()
+    create_parser.add_argument('check_duplicates', type=inputs.boolean, location='args', default=False,
+                               help='Refuse with 409 if the subject already has a near-duplicate question')
+
+    threshold_parser = api.parser()
+    threshold_parser.add_argument('threshold', type=float, location='args',
+                                  help='Minimum similarity between 0 and 1 (default: from configuration)')
+
+    report_parser = threshold_parser.copy()
+    report_parser.add_argument('subject_id', type=int, required=True, location='args',
+                               help='The subject to check')
+
+    similar_question_model = api.model('SimilarQuestion', {
+        'similarity': fields.Float(description='Jaccard similarity of the two questions, from 0 to 1'),
+        'question': fields.Nested(question_model)
+    })
+
+    duplicate_group_model = api.model('DuplicateQuestionGroup', {
+        'question_ids': fields.List(fields.Integer, description='Questions that are near-duplicates of each other'),
+        'similarity': fields.Float(description='Similarity of the closest pair in the group')
+    })
+
+    import_parser = api.parser()
+    import_parser.add_argument('file', type=FileStorage, location='files',
+                               help='The CSV or NDJSON file; alternatively send it as the raw request body')
+    import_parser.add_argument('format', type=str, location='args', choices=('csv', 'ndjson'),
+                               help='File format (default: from the file name, else csv)')
+    import_parser.add_argument('chunk_size', type=inputs.int_range(1, 10000), location='args',
+                               help='Rows inserted per transaction')
+
+    import_report_model = api.model('QuestionImportReport', {
+        'imported': fields.Integer(description='Number of questions created'),
+        'failed': fields.Integer(description='Number of rejected rows'),
+        'errors': fields.List(fields.Nested(api.model('QuestionImportError', {
+            'line': fields.Integer(description='Line number in the file'),
+            'errors': fields.List(fields.String)
+        })))
+    })
+
     @api.route('/')
     class QuestionList(Resource):
-        @api.marshal_list_with(question_model)
+        @api.expect(question_list_parser)
+        @api.response(200, 'Success', [question_model])
         @jwt_required() 
         def get(self):
-            """List all questions"""
-            return get_all_questions()
+            """List questions, one page at a time"""
+            args = question_list_parser.parse_args()
+            filters = {
+                'subject_id': args['subject_id'],
+                'question_type': args['question_type'],
+                'user_id': args['user_id']
+            }
+            try:
+                fields = parse_fieldset(args['fields'], question_model)
+                questions, next_cursor = get_all_questions(filters, args['cursor'], args['limit'], fields)
+            except ValueError as e:
+                api.abort(400, str(e))
+            return marshal_fieldset(questions, question_model, fields), 200, page_headers(next_cursor)
         
-        @api.expect(question_model)
+        @api.expect(question_model, create_parser)
         @api.marshal_with(question_model, code=201)
+        @api.response(409, 'A near-duplicate question already exists')
         @jwt_required()
         def post(self):
             """Create a new question"""
             current_user_id = get_jwt_identity()
             payload = api.payload
             payload['user_id'] = current_user_id            
+            if create_parser.parse_args()['check_duplicates']:
+                duplicates = find_similar_questions(payload)
+                if duplicates:
+                    api.abort(409, 'Near-duplicate questions already exist',
+                              duplicates=[match['question'].id for match in duplicates])
             return create_question(payload), 201
 
+    @api.route('/similar')
+    class SimilarQuestions(Resource):
+        @api.expect(question_model, threshold_parser)
+        @api.marshal_list_with(similar_question_model)
+        @jwt_required()
+        def post(self):
+            """List existing questions that are near-duplicates of the given one"""
+            threshold = threshold_parser.parse_args()['threshold']
+            return find_similar_questions(api.payload, threshold, exclude_id=api.payload.get('id'))
+
+    @api.route('/duplicates')
+    class DuplicateReport(Resource):
+        @api.expect(report_parser)
+        @api.marshal_list_with(duplicate_group_model)
+        @jwt_required()
+        def get(self):
+            """Report the groups of near-duplicate questions in a subject"""
+            args = report_parser.parse_args()
+            return get_duplicate_report(args['subject_id'], args['threshold'])
+
+    @api.route('/search')
+    class QuestionSearch(Resource):
+        @api.expect(search_parser)
+        @api.marshal_list_with(search_result_model)
+        @jwt_required()
+        def get(self):
+            """Search questions by text, best matches first"""
+            args = search_parser.parse_args()
+            filters = {'subject_id': args['subject_id'], 'question_type': args['question_type']}
+            return search_questions(args['q'], filters, args['limit'])
+
+    @api.route('/import')
+    class QuestionImport(Resource):
+        @api.expect(import_parser)
+        @api.marshal_with(import_report_model)
+        @jwt_required()
+        def post(self):
+            """Bulk-import questions from a CSV or NDJSON file"""
+            args = import_parser.parse_args()
+            upload = args['file']
+            stream = upload.stream if upload else request.stream
+            file_format = args['format']
+            if not file_format:
+                file_format = 'ndjson' if upload and upload.filename.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+            rows = iter_csv_rows(stream) if file_format == 'csv' else iter_ndjson_rows(stream)
+            chunk_size = args['chunk_size'] or current_app.config['QUESTION_IMPORT_CHUNK_SIZE']
+            return import_questions(rows, get_jwt_identity(), chunk_size)
+
     @api.route('/<int:id>')
     @api.response(404, 'Question not found')
     @api.param('id', 'The question identifier')
@@ -70,3 +219,16 @@ def register_routes(api):
             if not question:
                 api.abort(404, f"Question {id} not found")
             return '', 204
+
+    @api.route('/<int:id>/versions')
+    @api.response(404, 'Question not found')
+    @api.param('id', 'The question identifier')
+    class QuestionVersionList(Resource):
+        @jwt_required()
+        @api.marshal_list_with(question_version_model)
+        def get(self, id):
+            """List every version of a question, oldest first"""
+            versions = get_question_versions(id)
+            if versions is None:
+                api.abort(404, f"Question {id} not found")
+            return versions
@@ -0,0 +1,142 @@
+import hashlib
+import random
+from .models import Question
+from .pools import QuestionIndex
+from ..examinations.matching import normalize_short_answer
+
+# MinHash with NUM_PERM hash functions, split into BANDS bands of ROWS rows
+# for LSH. Two questions share a bucket in some band with probability
+# 1 - (1 - J**ROWS)**BANDS for Jaccard similarity J: about 0.98 at J = 0.8
+# and 0.15 at J = 0.3, so candidates are cheap to find and then checked
+# exactly against their shingle sets.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(0x5EED)  # fixed, so every process draws the same functions
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(_MERSENNE)) for _ in range(NUM_PERM)]
+
+
+def _hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'big')
+
+
+def shingles(question_text, options=None):
+    """Word bigrams of the normalized text plus one shingle per option."""
+    words = normalize_short_answer(question_text).split()
+    grams = [' '.join(words[i:i + 2]) for i in range(max(len(words) - 1, 1))] if words else []
+    grams += ['option:' + normalize_short_answer(str(option)) for option in options or ()]
+    return frozenset(_hash(gram) for gram in grams)
+
+
+def band_keys(hashes):
+    """The LSH bucket keys of a shingle set's MinHash signature."""
+    if not hashes:
+        return ()
+    signature = [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+    return tuple((band, tuple(signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+class QuestionDuplicateIndex(QuestionIndex):
+    """MinHash/LSH index for finding near-duplicate questions of a subject."""
+
+    columns = (Question.id, Question.subject_id, Question.question_text, Question.options)
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def similar(self, question_text, options, subject_id, threshold, exclude_id=None):
+        """Return (question_id, similarity) pairs of questions in the subject
+        at least `threshold` similar to the given text and options, best first."""
+        hashes = shingles(question_text, options)
+        keys = band_keys(hashes)
+        self.refresh()
+        with self._lock:
+            matches = []
+            for question_id in self._candidates(keys):
+                doc_subject_id, doc_hashes, _ = self._docs[question_id]
+                if question_id == exclude_id or doc_subject_id != subject_id:
+                    continue
+                similarity = jaccard(hashes, doc_hashes)
+                if similarity >= threshold:
+                    matches.append((question_id, similarity))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+    def groups(self, subject_id, threshold):
+        """Cluster a subject's near-duplicate questions.
+
+        Returns {'question_ids', 'similarity'} for each cluster of two or
+        more questions, largest first; similarity is the closest pair's.
+        """
+        parent = {}
+
+        def find(question_id):
+            parent.setdefault(question_id, question_id)
+            while parent[question_id] != question_id:
+                parent[question_id] = parent[parent[question_id]]
+                question_id = parent[question_id]
+            return question_id
+
+        self.refresh()
+        pairs = []
+        with self._lock:
+            for question_id in self._by_subject.get(subject_id, ()):
+                _, hashes, keys = self._docs[question_id]
+                for other_id in self._candidates(keys):
+                    other_subject_id, other_hashes, _ = self._docs[other_id]
+                    if other_id <= question_id or other_subject_id != subject_id:
+                        continue
+                    similarity = jaccard(hashes, other_hashes)
+                    if similarity >= threshold:
+                        pairs.append((question_id, other_id, similarity))
+                        parent[find(other_id)] = find(question_id)
+
+        clusters = {}
+        for question_id, other_id, similarity in pairs:
+            cluster = clusters.setdefault(find(question_id), {'question_ids': set(), 'similarity': 0.0})
+            cluster['question_ids'].update((question_id, other_id))
+            cluster['similarity'] = max(cluster['similarity'], similarity)
+        for cluster in clusters.values():
+            cluster['question_ids'] = sorted(cluster['question_ids'])
+        return sorted(clusters.values(), key=lambda cluster: (-len(cluster['question_ids']), cluster['question_ids'][0]))
+
+    def _candidates(self, keys):
+        candidates = set()
+        for key in keys:
+            candidates.update(self._buckets.get(key, ()))
+        return candidates
+
+    def _clear(self):
+        self._buckets = {}
+        self._docs = {}
+        self._by_subject = {}
+
+    def _add(self, row):
+        question_id, subject_id, question_text, options = row
+        hashes = shingles(question_text, options)
+        keys = band_keys(hashes)
+        for key in keys:
+            self._buckets.setdefault(key, set()).add(question_id)
+        self._docs[question_id] = (subject_id, hashes, keys)
+        self._by_subject.setdefault(subject_id, set()).add(question_id)
+
+    def _remove(self, question_id):
+        doc = self._docs.pop(question_id, None)
+        if doc is None:
+            return
+        subject_id, _, keys = doc
+        for key in keys:
+            bucket = self._buckets[key]
+            bucket.discard(question_id)
+            if not bucket:
+                del self._buckets[key]
+        self._by_subject[subject_id].discard(question_id)
+
+
+question_duplicates = QuestionDuplicateIndex()
@@ -0,0 +1,87 @@
+import csv
+import io
+import json
+from .utils import validate_question_type
+
+CSV_COLUMNS = ['subject_id', 'question_text', 'question_type', 'options', 'correct_answer', 'alternate_answers']
+
+
+def iter_csv_rows(stream):
+    """Yield (line_number, row dict) from a CSV byte stream with a header row.
+    List columns (options, alternate_answers) are '|'-separated."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        for column in ('options', 'alternate_answers'):
+            value = (row.get(column) or '').strip()
+            row[column] = [item.strip() for item in value.split('|')] if value else None
+        yield reader.line_num, row
+
+
+def iter_ndjson_rows(stream):
+    """Yield (line_number, row dict) from an NDJSON byte stream, skipping
+    blank lines. Lines that are not JSON objects are yielded as strings."""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = line
+        yield line_number, row
+
+
+def validate_question_row(row, subject_ids):
+    """Return (question values, errors) for one imported row."""
+    if not isinstance(row, dict):
+        return None, ['Row is not a JSON object']
+
+    errors = []
+    try:
+        subject_id = int(row.get('subject_id'))
+    except (TypeError, ValueError):
+        subject_id = None
+        errors.append('subject_id must be an integer')
+    else:
+        if subject_id not in subject_ids:
+            errors.append(f'Subject {subject_id} does not exist')
+
+    question_text = (row.get('question_text') or '').strip()
+    if not question_text:
+        errors.append('question_text is required')
+    elif len(question_text) > 255:
+        errors.append('question_text is longer than 255 characters')
+
+    question_type = row.get('question_type')
+    if not validate_question_type(question_type):
+        errors.append(f'Invalid question_type: {question_type}')
+
+    correct_answer = (row.get('correct_answer') or '').strip()
+    if not correct_answer:
+        errors.append('correct_answer is required')
+    elif len(correct_answer) > 255:
+        errors.append('correct_answer is longer than 255 characters')
+
+    options = row.get('options') or None
+    if options is not None and not isinstance(options, list):
+        errors.append('options must be a list')
+    elif question_type == 'multiple_choice':
+        if not options or len(options) < 2:
+            errors.append('multiple_choice questions need at least two options')
+        elif correct_answer and correct_answer not in options:
+            errors.append('correct_answer must be one of the options')
+
+    alternate_answers = row.get('alternate_answers') or None
+    if alternate_answers is not None and not isinstance(alternate_answers, list):
+        errors.append('alternate_answers must be a list')
+
+    if errors:
+        return None, errors
+    return {
+        'subject_id': subject_id,
+        'question_text': question_text,
+        'question_type': question_type,
+        'options': options,
+        'correct_answer': correct_answer,
+        'alternate_answers': alternate_answers
+    }, []
@@ -3,6 +3,10 @@ from ..utils.db import db
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    __table_args__ = (
+        db.Index('ix_questions_created_at_id', 'created_at', 'id'),
+        db.Index('ix_questions_question_text_fulltext', 'question_text', mysql_prefix='FULLTEXT'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
@@ -11,6 +15,13 @@ class Question(db.Model):
     question_type = db.Column(db.Enum('short_answer', 'multiple_choice', 'true_false', name='question_types'), nullable=False)  # e.g., 'multiple_choice', 'true_false'
     options = db.Column(db.JSON, nullable=True)  
     correct_answer = db.Column(db.String(255), nullable=False)
+    alternate_answers = db.Column(db.JSON, nullable=True)  # Other accepted answers for short_answer questions
+    # The latest immutable snapshot; edits add a new version instead of changing old ones
+    current_version_id = db.Column(
+        db.Integer,
+        db.ForeignKey('question_versions.id', use_alter=True, name='fk_questions_current_version_id'),
+        nullable=True
+    )
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
     # user = db.relationship('User', backref='questions', lazy=True)
@@ -18,4 +29,35 @@ class Question(db.Model):
 
     def __repr__(self):
         return f'<Question {self.question_text}>'
-    
+
+
+class QuestionVersion(db.Model):
+    __tablename__ = 'question_versions'
+    __table_args__ = (
+        db.UniqueConstraint('question_id', 'version', name='uq_question_versions_question_id_version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    question_text = db.Column(db.String(255), nullable=False)
+    question_type = db.Column(db.Enum('short_answer', 'multiple_choice', 'true_false', name='question_types'), nullable=False)
+    options = db.Column(db.JSON, nullable=True)
+    correct_answer = db.Column(db.String(255), nullable=False)
+    alternate_answers = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QuestionVersion question_id={self.question_id} version={self.version}>'
+
+
+class QuestionBankVersion(db.Model):
+    __tablename__ = 'question_bank_version'
+
+    # A single row whose counter every write to the questions table bumps,
+    # so each worker can tell its in-process question indexes are stale
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<QuestionBankVersion {self.version}>'
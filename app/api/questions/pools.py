@@ -0,0 +1,115 @@
+import threading
+from sqlalchemy import select
+from .models import Question, QuestionBankVersion
+from ..utils.db import db
+
+
+def question_bank_version():
+    """The current QuestionBankVersion counter; 0 before the first write."""
+    return db.session.scalar(select(QuestionBankVersion.version).where(QuestionBankVersion.id == 1)) or 0
+
+
+class QuestionIndex:
+    """Base class for in-process indexes over the questions table.
+
+    The index is loaded from the database on first use and then kept
+    current by the question services through add/update/remove. Other
+    worker processes can change questions too, so every write bumps the
+    single QuestionBankVersion counter and `refresh` reloads when the
+    counter has moved past the version this index holds; checking costs
+    one primary-key read. A write applied here carries the version its
+    transaction bumped the counter to, and is only applied on top of the
+    version right before it; after a write from elsewhere the index is left
+    behind for `refresh` to reload. Subclasses implement _clear/_add/_remove
+    over rows of `columns`, and must call `refresh` before reading under
+    `self._lock`.
+    """
+
+    columns = (Question.id, Question.subject_id, Question.question_type)
+
+    def __init__(self):
+        self._loaded = False
+        self._version = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        version = question_bank_version()
+        with self._lock:
+            if self._loaded and version == self._version:
+                return
+            self._clear()
+            for row in db.session.execute(select(*self.columns).execution_options(yield_per=1000)):
+                self._add(row)
+            self._loaded = True
+            self._version = version
+
+    def add(self, question, version):
+        with self._lock:
+            if self._follows(version):
+                self._add(self._row(question))
+                self._version = version
+
+    def update(self, question, version):
+        with self._lock:
+            if self._follows(version):
+                self._remove(question.id)
+                self._add(self._row(question))
+                self._version = version
+
+    def remove(self, question_id, version):
+        with self._lock:
+            if self._follows(version):
+                self._remove(question_id)
+                self._version = version
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+            self._loaded = False
+            self._version = None
+
+    def _follows(self, version):
+        return self._loaded and self._version == version - 1
+
+    def _row(self, question):
+        return tuple(getattr(question, column.key) for column in self.columns)
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _add(self, row):
+        raise NotImplementedError
+
+    def _remove(self, question_id):
+        raise NotImplementedError
+
+
+class QuestionPoolIndex(QuestionIndex):
+    """Question ids by (subject_id, question_type), for drawing exam papers."""
+
+    def __init__(self):
+        super().__init__()
+        self._pools = {}
+        self._pool_of = {}
+
+    def pool(self, subject_id, question_type):
+        self.refresh()
+        with self._lock:
+            return sorted(self._pools.get((subject_id, question_type), ()))
+
+    def _clear(self):
+        self._pools = {}
+        self._pool_of = {}
+
+    def _add(self, row):
+        question_id, subject_id, question_type = row
+        self._pools.setdefault((subject_id, question_type), set()).add(question_id)
+        self._pool_of[question_id] = (subject_id, question_type)
+
+    def _remove(self, question_id):
+        key = self._pool_of.pop(question_id, None)
+        if key is not None:
+            self._pools[key].discard(question_id)
+
+
+question_pools = QuestionPoolIndex()
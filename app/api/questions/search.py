@@ -0,0 +1,95 @@
+import heapq
+import math
+import re
+from collections import Counter
+from .models import Question
+from .pools import QuestionIndex
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Roughly MySQL's InnoDB full-text stopword list, so both backends ignore
+# the same filler words.
+STOPWORDS = frozenset((
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i',
+    'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when',
+    'where', 'who', 'will', 'with', 'und', 'www',
+))
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall((text or '').lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+class QuestionSearchIndex(QuestionIndex):
+    """Inverted index over question_text, ranked with BM25.
+
+    The fallback for databases without a full-text index of their own
+    (SQLite in development and tests); MySQL uses its FULLTEXT index.
+    """
+
+    columns = (Question.id, Question.subject_id, Question.question_type, Question.question_text)
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def search(self, text, filters=None, limit=20):
+        """Return up to `limit` (question_id, relevance) pairs, best first."""
+        terms = set(tokenize(text))
+        if not terms:
+            return []
+        filters = {key: value for key, value in (filters or {}).items() if value is not None}
+
+        self.refresh()
+        with self._lock:
+            doc_count = len(self._docs)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+            scores = Counter()
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for question_id, tf in postings.items():
+                    subject_id, question_type, length, _ = self._docs[question_id]
+                    if filters.get('subject_id', subject_id) != subject_id:
+                        continue
+                    if filters.get('question_type', question_type) != question_type:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[question_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+
+    def _clear(self):
+        self._postings = {}
+        self._docs = {}
+        self._total_length = 0
+
+    def _add(self, row):
+        question_id, subject_id, question_type, question_text = row
+        tokens = tokenize(question_text)
+        counts = Counter(tokens)
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[question_id] = tf
+        self._docs[question_id] = (subject_id, question_type, len(tokens), tuple(counts))
+        self._total_length += len(tokens)
+
+    def _remove(self, question_id):
+        doc = self._docs.pop(question_id, None)
+        if doc is None:
+            return
+        self._total_length -= doc[2]
+        for term in doc[3]:
+            postings = self._postings[term]
+            del postings[question_id]
+            if not postings:
+                del self._postings[term]
+
+
+question_search = QuestionSearchIndex()
@@ -1,13 +1,134 @@
-from .models import Question
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.dialects.mysql import match
+from .models import Question, QuestionBankVersion, QuestionVersion
+from .importer import validate_question_row
+from ..subjects.models import Subject
 from ..utils.db import db
-from flask import jsonify, make_response
+from ..utils.pagination import keyset_paginate
+from ..examinations.utils import answer_keys
+from ..examinations.models import ExamQuestion, ExamQuestionAnalytics, SubmissionAnswer
+from ..examinations.services import (
+    analytics_queue, bump_answer_keys, prune_rule_sets, remove_submission_answers, repair_exam_counters,
+    repin_question_version
+)
+from .pools import question_pools
+from .search import question_search
+from .duplicates import question_duplicates
+from flask import current_app, jsonify, make_response
 
-def get_all_questions():
-    return Question.query.all()
+# In-process indexes kept current as questions change; see pools.py.
+question_indexes = (question_pools, question_search, question_duplicates)
+
+# The fields captured by a QuestionVersion; changing any of them makes a new version
+VERSIONED_FIELDS = ('question_text', 'question_type', 'options', 'correct_answer', 'alternate_answers')
+
+# Mark every worker's question indexes stale in the caller's transaction and
+# return the new question bank version (see QuestionIndex). The counter row
+# stays locked until commit, so writes to the question bank take turns.
+def bump_question_bank():
+    result = db.session.execute(
+        update(QuestionBankVersion)
+        .where(QuestionBankVersion.id == 1)
+        .values(version=QuestionBankVersion.version + 1),
+        execution_options={'synchronize_session': False},
+    )
+    if not result.rowcount:
+        # A database created without the migrations has no row yet
+        db.session.add(QuestionBankVersion(id=1, version=1))
+        db.session.flush()
+    return db.session.scalar(select(QuestionBankVersion.version).where(QuestionBankVersion.id == 1))
+
+# Service to snapshot a question's current content as a new immutable version
+def snapshot_question(question, version):
+    question_version = QuestionVersion(
+        question_id=question.id,
+        version=version,
+        **{field: getattr(question, field) for field in VERSIONED_FIELDS}
+    )
+    db.session.add(question_version)
+    db.session.flush()
+    # Written directly so that snapshotting doesn't count as an edit of the question
+    db.session.execute(
+        update(Question)
+        .where(Question.id == question.id)
+        .values(current_version_id=question_version.id, updated_at=Question.updated_at),
+        execution_options={'synchronize_session': False},
+    )
+    set_committed_value(question, 'current_version_id', question_version.id)
+    return question_version
+
+# Service to give version 1 to every question that has none yet, as two
+# set-based statements; used after bulk INSERTs that bypass the ORM.
+def snapshot_unversioned_questions():
+    columns = [getattr(Question, field) for field in VERSIONED_FIELDS]
+    db.session.execute(
+        insert(QuestionVersion).from_select(
+            ['question_id', 'version', *VERSIONED_FIELDS, 'created_at'],
+            select(Question.id, literal(1), *columns, Question.created_at)
+            .where(Question.current_version_id.is_(None))
+        )
+    )
+    db.session.execute(
+        update(Question)
+        .where(Question.current_version_id.is_(None))
+        .values(
+            current_version_id=select(QuestionVersion.id).where(
+                QuestionVersion.question_id == Question.id, QuestionVersion.version == 1
+            ).scalar_subquery(),
+            updated_at=Question.updated_at
+        ),
+        execution_options={'synchronize_session': False},
+    )
+
+def get_all_questions(filters=None, cursor=None, limit=None, fields=None):
+    return keyset_paginate(Question.query, Question, cursor, limit, filters, fields)
+
+# Service to rank questions by how well their text matches `text`.
+# MySQL answers from its FULLTEXT index; other databases fall back to the
+# in-process index in search.py. Returns [{'question', 'relevance'}], best first.
+def search_questions(text, filters=None, limit=20):
+    filters = {key: value for key, value in (filters or {}).items() if value is not None}
+
+    if db.engine.dialect.name == 'mysql':
+        relevance = match(Question.question_text, against=text).in_natural_language_mode()
+        query = select(Question, relevance.label('relevance')).filter_by(**filters)
+        rows = db.session.execute(query.where(relevance > 0).order_by(relevance.desc()).limit(limit))
+        return [{'question': question, 'relevance': score} for question, score in rows]
+
+    ranked = question_search.search(text, filters, limit)
+    questions = Question.query.filter(Question.id.in_([question_id for question_id, _ in ranked])).all()
+    by_id = {question.id: question for question in questions}
+    return [{'question': by_id[question_id], 'relevance': score}
+            for question_id, score in ranked if question_id in by_id]
+
+# Service to find existing questions of the same subject that are
+# near-duplicates of `data` (question_text, options, subject_id).
+# Returns [{'question', 'similarity'}], most similar first.
+def find_similar_questions(data, threshold=None, exclude_id=None):
+    threshold = threshold or current_app.config['DUPLICATE_QUESTION_THRESHOLD']
+    matches = question_duplicates.similar(
+        data['question_text'], data.get('options'), data['subject_id'], threshold, exclude_id
+    )
+    by_id = {question.id: question for question in
+             Question.query.filter(Question.id.in_([question_id for question_id, _ in matches]))}
+    return [{'question': by_id[question_id], 'similarity': similarity}
+            for question_id, similarity in matches if question_id in by_id]
+
+# Service to report the clusters of near-duplicate questions in a subject.
+def get_duplicate_report(subject_id, threshold=None):
+    threshold = threshold or current_app.config['DUPLICATE_QUESTION_THRESHOLD']
+    return question_duplicates.groups(subject_id, threshold)
 
 def get_question_by_id(question_id):
     return Question.query.get(question_id)
 
+# Service to get every version of a question, oldest first
+def get_question_versions(question_id):
+    if not Question.query.get(question_id):
+        return None
+    return QuestionVersion.query.filter_by(question_id=question_id).order_by(QuestionVersion.version).all()
+
 def create_question(data):
     allowed_question_types = ['short_answer', 'multiple_choice', 'true_false']
     if data['question_type'] not in allowed_question_types:
@@ -19,10 +140,16 @@ def create_question(data):
         question_type=data['question_type'],
         options=data.get('options'),
         correct_answer=data['correct_answer'],
+        alternate_answers=data.get('alternate_answers'),
         user_id=data.get('user_id')
     )
     db.session.add(question)
+    db.session.flush()
+    snapshot_question(question, 1)
+    version = bump_question_bank()
     db.session.commit()
+    for index in question_indexes:
+        index.add(question, version)
     return question   
 
 
@@ -35,12 +162,33 @@ def update_question(question_id, data, user_id=None):
     if question.user_id != user_id:
         raise PermissionError("You do not have permission to update this question.")
     
+    content = {
+        'question_text': data['question_text'],
+        'question_type': data['question_type'],
+        'options': data.get('options'),
+        'correct_answer': data['correct_answer'],
+        'alternate_answers': data.get('alternate_answers')
+    }
+    changed = any(getattr(question, field) != value for field, value in content.items())
     question.subject_id = data['subject_id']
-    question.question_text = data['question_text']
-    question.question_type = data['question_type']
-    question.options = data.get('options')
-    question.correct_answer = data['correct_answer']
+    for field, value in content.items():
+        setattr(question, field, value)
+
+    # Versions are never edited: a content change adds a new one, and only
+    # exams nobody has submitted yet move on to it.
+    repinned_exam_ids = []
+    if changed or question.current_version_id is None:
+        latest = db.session.scalar(
+            select(func.max(QuestionVersion.version)).where(QuestionVersion.question_id == question_id)
+        )
+        question_version = snapshot_question(question, (latest or 0) + 1)
+        repinned_exam_ids = repin_question_version(question_id, question_version.id)
+    version = bump_question_bank()
     db.session.commit()
+    for exam_id in repinned_exam_ids:
+        answer_keys.invalidate_exam(exam_id)
+    for index in question_indexes:
+        index.update(question, version)
     return question
 
 def delete_question(question_id, user_id):
@@ -52,6 +200,77 @@ def delete_question(question_id, user_id):
     if question.user_id!= user_id:
         raise PermissionError("You do not have permission to delete this question.")
     
-    db.session.delete(question)
+    exam_ids = purge_questions([question_id])
+    version = bump_question_bank()
     db.session.commit()
+    for exam_id in exam_ids:
+        repair_exam_counters(exam_id)
+        answer_keys.invalidate_exam(exam_id)
+        analytics_queue.mark(exam_id)
+    for index in question_indexes:
+        index.remove(question_id, version)
     return question
+
+# Service to delete questions and every row referencing them (exam
+# questions, rule set pools, answers, analytics, versions) with set-based
+# DELETEs in dependency order; submissions that lose answers are re-scored
+# in the same transaction. question_ids is a list or a SELECT of ids.
+# Returns the ids of the exams that lost questions or answers; the caller
+# bumps the question bank, commits, repairs the exams' counters,
+# invalidates their answer keys and marks their analytics.
+def purge_questions(question_ids):
+    if not isinstance(question_ids, (list, tuple)):
+        # Through a derived table, so MySQL accepts it in a DELETE from questions
+        question_ids = select(question_ids.subquery().c.id)
+    options = {'synchronize_session': False}
+
+    exam_ids = set(db.session.scalars(
+        select(ExamQuestion.exam_id).where(ExamQuestion.question_id.in_(question_ids)).distinct()
+    ))
+    bump_answer_keys(exam_ids)
+    exam_ids.update(prune_rule_sets(
+        question_ids if isinstance(question_ids, (list, tuple)) else db.session.scalars(question_ids)
+    ))
+    exam_ids.update(remove_submission_answers(SubmissionAnswer.question_id.in_(question_ids)))
+    for model in (ExamQuestionAnalytics, ExamQuestion):
+        db.session.execute(delete(model).where(model.question_id.in_(question_ids)), execution_options=options)
+    db.session.execute(
+        update(Question).where(Question.id.in_(question_ids)).values(current_version_id=None),
+        execution_options=options,
+    )
+    db.session.execute(delete(QuestionVersion).where(QuestionVersion.question_id.in_(question_ids)),
+                       execution_options=options)
+    db.session.execute(delete(Question).where(Question.id.in_(question_ids)), execution_options=options)
+    return sorted(exam_ids)
+
+# Service to import questions from an iterator of (line_number, row) pairs.
+# Rows are validated one at a time and inserted in chunks of `chunk_size`,
+# each chunk in its own transaction, so neither the file nor a huge
+# transaction is ever held. Subject ids are looked up once up front.
+def import_questions(rows, user_id, chunk_size=500):
+    subject_ids = set(db.session.scalars(select(Subject.id)))
+    report = {'imported': 0, 'failed': 0, 'errors': []}
+    chunk = []
+
+    def flush():
+        db.session.execute(insert(Question), chunk)
+        snapshot_unversioned_questions()
+        bump_question_bank()
+        db.session.commit()
+        report['imported'] += len(chunk)
+        chunk.clear()
+
+    for line_number, row in rows:
+        values, errors = validate_question_row(row, subject_ids)
+        if errors:
+            report['failed'] += 1
+            report['errors'].append({'line': line_number, 'errors': errors})
+            continue
+        values['user_id'] = user_id
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+    return report
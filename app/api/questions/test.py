@@ -0,0 +1,193 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import event
+
+from ..utils.db import db
+from .models import Question
+from .pools import question_pools
+from .services import bump_question_bank
+
+
+@pytest.fixture
+def subject(client, make_user):
+    """A subject owned by a new user; returns (subject id, user id, headers)."""
+    user_id, headers = make_user()
+    subject = client.post('/subjects/', json={'name': 'Astronomy'}, headers=headers).get_json()
+    return subject['id'], user_id, headers
+
+
+def add_question(client, subject_id, headers, text, question_type='true_false', correct_answer='True', **fields):
+    response = client.post('/questions/', json=dict(
+        fields, subject_id=subject_id, question_text=text, question_type=question_type, correct_answer=correct_answer
+    ), headers=headers)
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_question_pools_follow_local_writes_without_reloading(client, subject, monkeypatch):
+    subject_id, _, headers = subject
+    first = add_question(client, subject_id, headers, 'The Sun is a star')
+    assert question_pools.pool(subject_id, 'true_false') == [first['id']]
+
+    reloads = []
+    monkeypatch.setattr(question_pools, '_clear', lambda: reloads.append(True))
+    second = add_question(client, subject_id, headers, 'The Moon is a planet', correct_answer='False')
+    client.delete(f"/questions/{first['id']}", headers=headers)
+
+    assert question_pools.pool(subject_id, 'true_false') == [second['id']]
+    assert not reloads
+
+
+def test_question_pools_reload_after_another_worker_writes(client, subject):
+    subject_id, user_id, headers = subject
+    first = add_question(client, subject_id, headers, 'The Sun is a star')
+    assert question_pools.pool(subject_id, 'true_false') == [first['id']]
+
+    # Another worker adds a question: this process's pools only see the counter move
+    question = Question(subject_id=subject_id, user_id=user_id, question_text='Mars is red',
+                        question_type='true_false', correct_answer='True')
+    db.session.add(question)
+    bump_question_bank()
+    db.session.commit()
+
+    assert question_pools.pool(subject_id, 'true_false') == [first['id'], question.id]
+
+
+def test_csv_import_inserts_valid_rows_in_chunks_and_reports_the_rest(client, subject):
+    subject_id, _, headers = subject
+    csv_file = '\n'.join([
+        'subject_id,question_text,question_type,options,correct_answer,alternate_answers',
+        f'{subject_id},Closest star?,short_answer,,The Sun,Sun|Sol',
+        f'{subject_id},Red planet?,multiple_choice,Mars|Venus,Mars,',
+        f'{subject_id},Largest planet?,multiple_choice,Jupiter|Saturn,Pluto,',
+        '999,Orphan?,true_false,,True,',
+        f'{subject_id},Pluto is a planet,true_false,,False,',
+    ]).encode()
+
+    response = client.post('/questions/import?chunk_size=2', data={'file': (io.BytesIO(csv_file), 'bank.csv')},
+                           content_type='multipart/form-data', headers=headers)
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['imported'], report['failed']) == (3, 2)
+    assert [error['line'] for error in report['errors']] == [4, 5]
+    assert report['errors'][0]['errors'] == ['correct_answer must be one of the options']
+    questions = Question.query.order_by(Question.id).all()
+    assert [question.question_text for question in questions] == ['Closest star?', 'Red planet?', 'Pluto is a planet']
+    assert questions[0].alternate_answers == ['Sun', 'Sol']
+    assert all(question.current_version_id for question in questions)
+    assert question_pools.pool(subject_id, 'true_false') == [questions[2].id]
+
+
+def test_ndjson_import_streams_the_request_body(client, subject):
+    subject_id, _, headers = subject
+    body = '\n'.join([
+        json.dumps({'subject_id': subject_id, 'question_text': 'Earth is round', 'question_type': 'true_false',
+                    'correct_answer': 'True'}),
+        '',
+        'not json',
+        json.dumps({'subject_id': subject_id, 'question_text': '', 'question_type': 'essay', 'correct_answer': 'x'}),
+    ])
+
+    response = client.post('/questions/import?format=ndjson', data=body, content_type='application/x-ndjson',
+                           headers=headers)
+
+    report = response.get_json()
+    assert (report['imported'], report['failed']) == (1, 2)
+    assert report['errors'] == [
+        {'line': 3, 'errors': ['Row is not a JSON object']},
+        {'line': 4, 'errors': ['question_text is required', 'Invalid question_type: essay']},
+    ]
+
+
+def test_search_ranks_matches_and_follows_question_changes(client, subject):
+    subject_id, _, headers = subject
+    other_subject = client.post('/subjects/', json={'name': 'Geology'}, headers=headers).get_json()['id']
+    planets = add_question(client, subject_id, headers, 'Planets orbit the Sun and planets have moons')
+    orbit = add_question(client, subject_id, headers, 'The Moon has an orbit', question_type='short_answer',
+                         correct_answer='yes')
+    rocks = add_question(client, other_subject, headers, 'Rocks orbit nothing')
+
+    def search(**args):
+        response = client.get('/questions/search', query_string=args, headers=headers)
+        assert response.status_code == 200
+        return [result['question']['id'] for result in response.get_json()]
+
+    assert search(q='planets orbit') == [planets['id'], orbit['id'], rocks['id']]
+    assert search(q='orbit', subject_id=subject_id, question_type='short_answer') == [orbit['id']]
+    assert search(q='orbit', subject_id=other_subject) == [rocks['id']]
+    assert search(q='the of') == []
+
+    client.put(f"/questions/{rocks['id']}", json=dict(rocks, question_text='Rocks are made of minerals'),
+               headers=headers)
+    client.delete(f"/questions/{planets['id']}", headers=headers)
+    assert search(q='orbit') == [orbit['id']]
+    assert search(q='minerals') == [rocks['id']]
+
+
+def test_duplicate_checks_find_near_identical_questions_of_the_subject(client, subject):
+    subject_id, _, headers = subject
+    other_subject = client.post('/subjects/', json={'name': 'Geology'}, headers=headers).get_json()['id']
+    options = ['Mars', 'Venus', 'Earth']
+    red = add_question(client, subject_id, headers, 'Which planet is known as the red planet?',
+                       question_type='multiple_choice', options=options, correct_answer='Mars')
+    copy = add_question(client, subject_id, headers, 'Which planet is known as the Red Planet',
+                        question_type='multiple_choice', options=options, correct_answer='Mars')
+    add_question(client, other_subject, headers, 'Which planet is known as the red planet?',
+                 question_type='multiple_choice', options=options, correct_answer='Mars')
+    add_question(client, subject_id, headers, 'Pluto is a dwarf planet')
+
+    payload = dict(subject_id=subject_id, question_text='which planet is known as the red planet',
+                   question_type='multiple_choice', options=options, correct_answer='Mars')
+    response = client.post('/questions/?check_duplicates=true', json=payload, headers=headers)
+    assert response.status_code == 409
+    assert sorted(response.get_json()['duplicates']) == [red['id'], copy['id']]
+
+    response = client.post('/questions/similar', json=dict(payload, id=red['id']), headers=headers)
+    assert [(match['question']['id'], match['similarity']) for match in response.get_json()] == [(copy['id'], 1.0)]
+
+    response = client.get('/questions/duplicates', query_string={'subject_id': subject_id}, headers=headers)
+    assert response.get_json() == [{'question_ids': [red['id'], copy['id']], 'similarity': 1.0}]
+
+    client.delete(f"/questions/{copy['id']}", headers=headers)
+    assert client.get('/questions/duplicates', query_string={'subject_id': subject_id}, headers=headers).get_json() == []
+
+
+def test_duplicate_threshold_is_adjustable(client, subject):
+    subject_id, _, headers = subject
+    add_question(client, subject_id, headers, 'The Sun is the closest star to the Earth')
+    payload = dict(subject_id=subject_id, question_text='The Sun is the nearest star to the Earth',
+                   question_type='true_false', correct_answer='True')
+
+    assert client.post('/questions/similar', json=payload, headers=headers).get_json() == []
+    matches = client.post('/questions/similar?threshold=0.5', json=payload, headers=headers).get_json()
+    assert [round(match['similarity'], 2) for match in matches] == [0.6]
+    assert client.post('/questions/?check_duplicates=true', json=payload, headers=headers).status_code == 201
+
+
+def test_fields_restrict_the_listing_and_its_select(app, client, subject):
+    subject_id, _, headers = subject
+    question = add_question(client, subject_id, headers, 'Which planet is largest?', question_type='multiple_choice',
+                            options=['Jupiter', 'Mars'], correct_answer='Jupiter')
+
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = client.get('/questions/?fields=question_text,question_type', headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    assert response.get_json() == [{'question_text': question['question_text'], 'question_type': 'multiple_choice'}]
+    select = next(statement for statement in statements if 'FROM questions' in statement)
+    assert 'questions.question_text' in select
+    assert 'questions.options' not in select and 'questions.correct_answer' not in select
+
+    assert set(client.get('/questions/', headers=headers).get_json()[0]) >= {'options', 'correct_answer'}
+    response = client.get('/questions/?fields=question_text,secret', headers=headers)
+    assert response.status_code == 400
+    assert 'Unknown fields: secret' in response.get_json()['message']
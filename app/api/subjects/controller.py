@@ -1,7 +1,9 @@
 from flask_restx import Resource, fields
 from .services import get_all_subjects, get_subject_by_id, create_subject, update_subject, delete_subject, get_subjects_by_user
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..models.users import User
+from ..utils.decorator import current_user_is_admin
+from ..utils.pagination import pagination_parser, page_headers
+from ..utils.fieldsets import parse_fieldset, marshal_fieldset
 
 def register_routes(api):
     subject_model = api.model('Subject', {
@@ -12,20 +14,31 @@ def register_routes(api):
         'updated_at': fields.DateTime(readOnly=True),
     })
 
+    subject_list_parser = pagination_parser.copy()
+    subject_list_parser.add_argument('creator_id', type=int, location='args',
+                                     help='Only subjects created by this user (admins only)')
+
     @api.route('/')
     class SubjectList(Resource):
-        @api.marshal_list_with(subject_model)
+        @api.expect(subject_list_parser)
+        @api.response(200, 'Success', [subject_model])
         @jwt_required()
         def get(self):
-            """List all subjects (Admins only) or subjects created by the user"""
+            """List all subjects (Admins only) or subjects created by the user, one page at a time"""
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
-
-            if current_user.is_admin:
-                return get_all_subjects()
-            else:
-                # Regular users can only see the subjects they created
-                return get_subjects_by_user(current_user_id)
+            args = subject_list_parser.parse_args()
+
+            try:
+                fields = parse_fieldset(args['fields'], subject_model)
+                if current_user_is_admin():
+                    filters = {'creator_id': args['creator_id']}
+                    subjects, next_cursor = get_all_subjects(filters, args['cursor'], args['limit'], fields)
+                else:
+                    # Regular users can only see the subjects they created
+                    subjects, next_cursor = get_subjects_by_user(current_user_id, args['cursor'], args['limit'], fields)
+            except ValueError as e:
+                api.abort(400, str(e))
+            return marshal_fieldset(subjects, subject_model, fields), 200, page_headers(next_cursor)
 
         @api.expect(subject_model)
         @api.marshal_with(subject_model, code=201)
@@ -46,14 +59,13 @@ def register_routes(api):
         def get(self, id):
             """Fetch a subject by its ID (Admins can fetch any subject, users can only fetch their own)"""
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
             subject = get_subject_by_id(id)
 
             if not subject:
                 api.abort(404, f"Subject {id} not found")
 
             # Only allow regular users to access subjects they created
-            if not current_user.is_admin and subject.creator_id != current_user_id:
+            if not current_user_is_admin() and subject.creator_id != current_user_id:
                 api.abort(403, "Access denied")
 
             return subject
@@ -64,31 +76,33 @@ def register_routes(api):
         def put(self, id):
             """Update a subject given its ID (Admins can update any subject, users can only update their own)"""
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
             subject = get_subject_by_id(id)
 
             if not subject:
                 api.abort(404, f"Subject {id} not found")
 
             # Only allow regular users to update subjects they created
-            if not current_user.is_admin and subject.creator_id != current_user_id:
+            if not current_user_is_admin() and subject.creator_id != current_user_id:
                 api.abort(403, "Access denied")
 
             return update_subject(id, api.payload)
 
         @api.response(204, 'Subject deleted')
+        @api.response(202, 'Subject queued for deletion in the background')
         @jwt_required()
         def delete(self, id):
             """Delete a subject given its ID (Admins can delete any subject, users can only delete their own)"""
             current_user_id = get_jwt_identity()
-            current_user = User.query.get(current_user_id)
             subject = get_subject_by_id(id)
 
             if not subject:
                 api.abort(404, f"Subject {id} not found")
 
             # Only allow regular users to delete subjects they created
-            if not current_user.is_admin and subject.creator_id != current_user_id:
+            if not current_user_is_admin() and subject.creator_id != current_user_id:
                 api.abort(403, "Access denied")
 
-            return delete_subject(id), 204
+            _, queued = delete_subject(id)
+            if queued:
+                return {'message': f"Subject {id} is being deleted"}, 202
+            return '', 204
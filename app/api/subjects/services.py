@@ -1,15 +1,23 @@
+from flask import current_app
+from sqlalchemy import delete, func, select
 from .models import Subject
-from flask_jwt_extended import get_jwt_identity
+from ..examinations.models import SubmissionAnswer
+from ..examinations.services import analytics_queue, remove_submission_answers, repair_exam_counters
+from ..examinations.utils import answer_keys
+from ..questions.models import Question
+from ..questions import services as question_services  # module import: questions.services imports this package
+from ..utils.background import run_in_background
 from ..utils.db import db
+from ..utils.pagination import keyset_paginate
 
-def get_all_subjects():
-    return Subject.query.all()
+def get_all_subjects(filters=None, cursor=None, limit=None, fields=None):
+    return keyset_paginate(Subject.query, Subject, cursor, limit, filters, fields)
 
 def get_subject_by_id(subject_id):
     return Subject.query.get(subject_id)
 
-def get_subjects_by_user(user_id):
-    return Subject.query.filter_by(creator_id=user_id).all()
+def get_subjects_by_user(user_id, cursor=None, limit=None, fields=None):
+    return keyset_paginate(Subject.query.filter_by(creator_id=user_id), Subject, cursor, limit, fields=fields)
 
 
 def create_subject(data):
@@ -33,18 +41,61 @@ def update_subject(subject_id, data):
     db.session.commit()
     return subject
 
+# Service to delete a subject with its questions and everything that
+# references them. Returns (subject, queued): subjects with more than
+# CASCADE_DELETE_SYNC_LIMIT questions are queued for deletion in the
+# background instead of in this request. Callers check permissions.
 def delete_subject(subject_id):
     subject = Subject.query.get(subject_id)
     if not subject:
-        return None
-    # Check if the current user is the creator of the subject
-    if subject.creator_id != get_jwt_identity():
-        return None
-    # Delete all associated questions
-    for question in subject.questions:
-        db.session.delete(question)
-    db.session.delete(subject)
+        return None, False
+
+    app_config = current_app.config
+    question_count = db.session.scalar(select(func.count(Question.id)).where(Question.subject_id == subject_id))
+    if question_count > app_config['CASCADE_DELETE_SYNC_LIMIT']:
+        run_in_background(purge_subject, subject_id, app_config['CASCADE_DELETE_CHUNK_SIZE'])
+        return subject, True
+    purge_subject(subject_id)
+    return subject, False
+
+# Service to delete a subject and its questions with set-based DELETEs.
+# Without chunk_size it is one transaction; with it, the answers to its
+# questions (the bulk of the rows) are deleted chunk_size answers per
+# transaction first, re-scoring the submissions they belonged to as they
+# go, then the questions chunk_size per transaction. Exams that lose
+# questions, fixed or from rule set pools, or answers get their counters
+# recomputed, their answer keys dropped and their analytics refreshed.
+def purge_subject(subject_id, chunk_size=None):
+    exam_ids = set()
+    while chunk_size:
+        answer_ids = db.session.scalars(
+            select(SubmissionAnswer.id)
+            .where(SubmissionAnswer.question_id.in_(select(Question.id).where(Question.subject_id == subject_id)))
+            .limit(chunk_size)
+        ).all()
+        if not answer_ids:
+            break
+        exam_ids.update(remove_submission_answers(SubmissionAnswer.id.in_(answer_ids)))
+        db.session.commit()
+
+    while chunk_size:
+        question_ids = db.session.scalars(
+            select(Question.id).where(Question.subject_id == subject_id).limit(chunk_size)
+        ).all()
+        if not question_ids:
+            break
+        exam_ids.update(question_services.purge_questions(question_ids))
+        question_services.bump_question_bank()
+        db.session.commit()
+
+    exam_ids.update(question_services.purge_questions(select(Question.id).where(Question.subject_id == subject_id)))
+    question_services.bump_question_bank()
+    db.session.execute(delete(Subject).where(Subject.id == subject_id), execution_options={'synchronize_session': False})
     db.session.commit()
-    return subject
+
+    for exam_id in exam_ids:
+        repair_exam_counters(exam_id)
+        answer_keys.invalidate_exam(exam_id)
+        analytics_queue.mark(exam_id)
 
     
\ No newline at end of file
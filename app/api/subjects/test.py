@@ -0,0 +1,190 @@
+import pytest
+
+from ..examinations.models import Exam, ExamPaper, ExamRuleSet, ExamSubmission, SubmissionAnswer
+from ..examinations.services import analytics_queue, load_rule_set
+from ..examinations.utils import answer_keys
+from ..questions.models import Question, QuestionVersion
+from ..utils.db import db
+from .models import Subject
+from .services import purge_subject
+
+
+def create_subject(client, headers, name, question_count):
+    subject = client.post('/subjects/', json={'name': name}, headers=headers).get_json()
+    question_ids = [
+        client.post('/questions/', json={
+            'subject_id': subject['id'], 'question_text': f'{name} statement {number}',
+            'question_type': 'true_false', 'correct_answer': 'True'
+        }, headers=headers).get_json()['id']
+        for number in range(question_count)
+    ]
+    return subject['id'], question_ids
+
+
+@pytest.fixture
+def rule_based_exam(client, make_user):
+    """A rule-based exam drawing two questions from one subject and one from
+    another, and a student who has fetched their paper."""
+    _, owner = make_user()
+    history_id, history_questions = create_subject(client, owner, 'History', 3)
+    science_id, science_questions = create_subject(client, owner, 'Science', 2)
+    exam = client.post('/exams/', json={'title': 'Mixed', 'total_marks': 4, 'duration': 30},
+                       headers=owner).get_json()
+    response = client.put(f"/exams/{exam['id']}/rules", json={'rules': [
+        {'subject_id': history_id, 'question_type': 'true_false', 'count': 2, 'marks': 1},
+        {'subject_id': science_id, 'question_type': 'true_false', 'count': 1, 'marks': 2},
+    ]}, headers=owner)
+    assert response.status_code == 200
+    _, student = make_user()
+    paper = client.get(f"/exams/{exam['id']}/paper", headers=student).get_json()
+    return {
+        'exam_id': exam['id'], 'owner': owner, 'student': student, 'paper': paper,
+        'history_id': history_id, 'history_questions': history_questions, 'science_questions': science_questions,
+    }
+
+
+@pytest.mark.parametrize('warm_cache', [False, True])
+def test_deleting_a_subject_prunes_it_from_rule_based_exams(client, rule_based_exam, warm_cache):
+    exam_id, student = rule_based_exam['exam_id'], rule_based_exam['student']
+    history_questions = set(rule_based_exam['history_questions'])
+    if warm_cache:
+        paper = db.session.get(ExamPaper, 1)
+        answer_keys.get(exam_id, load_rule_set(exam_id, paper.rule_version))
+
+    response = client.delete(f"/subjects/{rule_based_exam['history_id']}", headers=rule_based_exam['owner'])
+
+    assert response.status_code == 204
+    assert db.session.get(Subject, rule_based_exam['history_id']) is None
+    assert not db.session.scalars(db.select(Question.id).where(Question.id.in_(history_questions))).all()
+    assert not db.session.scalars(
+        db.select(QuestionVersion.id).where(QuestionVersion.question_id.in_(history_questions))
+    ).all()
+    first, rule_set = db.session.scalars(
+        db.select(ExamRuleSet).where(ExamRuleSet.exam_id == exam_id).order_by(ExamRuleSet.version)
+    ).all()
+    assert len(first.rules) == 2
+    assert [rule['pool'] for rule in rule_set.rules] == [rule_based_exam['science_questions']]
+    assert (db.session.get(Exam, exam_id).question_count, rule_set.total_marks) == (1, 2)
+
+    paper = client.get(f'/exams/{exam_id}/paper', headers=student).get_json()
+    assert len(paper['questions']) == 1
+    science_question = paper['questions'][0]['question_id']
+
+    deleted_question = next(iter(history_questions))
+    response = client.post(f'/exams/{exam_id}/submissions', json={'answers': [
+        {'question_id': deleted_question, 'answer': 'True'}
+    ]}, headers=student)
+    assert response.status_code == 400
+    assert not db.session.scalars(db.select(SubmissionAnswer.id)).all()
+
+    response = client.post(f'/exams/{exam_id}/submissions', json={'answers': [
+        {'question_id': science_question, 'answer': 'True'}
+    ]}, headers=student)
+    assert response.status_code == 201
+    assert response.get_json()['score'] == 2
+
+
+def test_deleting_a_rule_based_exam_removes_its_papers_and_submissions(client, rule_based_exam):
+    exam_id = rule_based_exam['exam_id']
+    question_id = rule_based_exam['paper']['questions'][0]['question_id']
+    response = client.post(f'/exams/{exam_id}/submissions', json={'answers': [
+        {'question_id': question_id, 'answer': 'True'}
+    ]}, headers=rule_based_exam['student'])
+    assert response.status_code == 201
+
+    response = client.delete(f'/exams/{exam_id}', headers=rule_based_exam['owner'])
+
+    assert response.status_code == 204
+    assert db.session.get(Exam, exam_id) is None
+    for model in (ExamRuleSet, ExamPaper, ExamSubmission):
+        assert not db.session.scalars(db.select(model.id).where(model.exam_id == exam_id)).all()
+    assert not db.session.scalars(db.select(SubmissionAnswer.id)).all()
+    # The questions belong to their subjects and survive the exam
+    assert db.session.get(Question, question_id) is not None
+
+
+def test_deleting_a_question_leaves_existing_papers_drawn_as_they_were(client, make_user, rule_based_exam):
+    exam_id, paper = rule_based_exam['exam_id'], rule_based_exam['paper']
+    drawn = [question['question_id'] for question in paper['questions']]
+    deleted_question = drawn[0]
+
+    response = client.delete(f'/questions/{deleted_question}', headers=rule_based_exam['owner'])
+
+    assert response.status_code == 204
+    paper = client.get(f'/exams/{exam_id}/paper', headers=rule_based_exam['student']).get_json()
+    assert [question['question_id'] for question in paper['questions']] == drawn[1:]
+    _, new_student = make_user()
+    paper = client.get(f'/exams/{exam_id}/paper', headers=new_student).get_json()
+    assert paper['rule_version'] == 2
+    question_ids = [question['question_id'] for question in paper['questions']]
+    assert len(question_ids) == 3 and deleted_question not in question_ids
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1])
+def test_deleting_a_subject_rescores_the_submissions_that_answered_it(client, make_user, rule_based_exam,
+                                                                     chunk_size):
+    exam_id, student = rule_based_exam['exam_id'], rule_based_exam['student']
+    response = client.post(f'/exams/{exam_id}/submissions', json={'answers': [
+        {'question_id': question['question_id'], 'answer': 'True'}
+        for question in rule_based_exam['paper']['questions']
+    ]}, headers=student)
+    assert response.get_json()['score'] == 4
+    analytics_queue.flush()
+
+    purge_subject(rule_based_exam['history_id'], chunk_size)
+
+    submission = db.session.get(ExamSubmission, response.get_json()['id'])
+    db.session.refresh(submission)
+    assert submission.score == 2
+    leaderboard = client.get(f'/exams/{exam_id}/leaderboard', headers=student).get_json()
+    assert [entry['score'] for entry in leaderboard] == [2]
+    analytics_queue.flush()
+    analytics = client.get(f'/exams/{exam_id}/analytics', headers=rule_based_exam['owner']).get_json()
+    assert analytics['submission_count'] == 1 and analytics['mean'] == 2
+    assert len(analytics['questions']) == 1
+
+
+def test_subjects_are_listed_a_page_at_a_time_by_cursor(client, make_user):
+    _, owner = make_user()
+    names = [f'Subject {number}' for number in range(5)]
+    for name in names:
+        client.post('/subjects/', json={'name': name}, headers=owner)
+
+    listed, cursor, pages = [], None, 0
+    while True:
+        response = client.get('/subjects/', query_string={'limit': 2, 'cursor': cursor},
+                              headers=dict(owner, Origin='https://app.example.com'))
+        assert response.status_code == 200
+        assert 'X-Next-Cursor' in response.headers['Access-Control-Expose-Headers']
+        listed += [subject['name'] for subject in response.get_json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert (listed, pages) == (names, 3)
+
+    assert client.get('/subjects/?cursor=not-a-cursor', headers=owner).status_code == 400
+
+
+def test_admins_can_filter_subjects_by_creator(client, make_user):
+    creator_id, creator = make_user()
+    _, other = make_user()
+    _, admin = make_user(admin=True)
+    client.post('/subjects/', json={'name': 'Mine'}, headers=creator)
+    client.post('/subjects/', json={'name': 'Theirs'}, headers=other)
+
+    assert len(client.get('/subjects/', headers=admin).get_json()) == 2
+    response = client.get(f'/subjects/?creator_id={creator_id}', headers=admin)
+    assert [subject['name'] for subject in response.get_json()] == ['Mine']
+
+
+def test_subject_listings_honour_fields_with_pagination(client, make_user):
+    _, owner = make_user()
+    for name in ('Algebra', 'Botany', 'Chemistry'):
+        client.post('/subjects/', json={'name': name, 'description': 'Long text'}, headers=owner)
+
+    response = client.get('/subjects/?fields=name&limit=2', headers=owner)
+    assert response.get_json() == [{'name': 'Algebra'}, {'name': 'Botany'}]
+    cursor = response.headers['X-Next-Cursor']
+    response = client.get('/subjects/', query_string={'fields': 'name', 'cursor': cursor}, headers=owner)
+    assert response.get_json() == [{'name': 'Chemistry'}]
@@ -0,0 +1,24 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from .importer import iter_csv_rows
+from .services import provision_users
+
+users_cli = AppGroup('users', help='Maintenance commands for user accounts.')
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', type=click.IntRange(1), default=None, help='Users inserted per transaction.')
+def import_command(path, chunk_size):
+    """Create user accounts and profiles from a CSV file."""
+    chunk_size = chunk_size or current_app.config['USER_IMPORT_CHUNK_SIZE']
+
+    with open(path, 'rb') as stream:
+        report = provision_users(iter_csv_rows(stream), chunk_size)
+
+    click.echo(f"Created {report['created']} user(s), skipped {report['skipped']} existing, "
+               f"rejected {report['failed']}.")
+    for result in report['rows']:
+        if result['status'] != 'created':
+            click.echo(f"  line {result['line']}: {result['status']}: {'; '.join(result['errors'])}")
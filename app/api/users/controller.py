@@ -1,10 +1,16 @@
-from flask_restx import Resource, fields
+from flask import current_app, request
+from flask_restx import Resource, fields, inputs
+from werkzeug.datastructures import FileStorage
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from .services import (
     get_user_profile, update_user_profile, delete_user_profile, 
-    admin_get_user, admin_get_all_users, admin_delete_user, change_password
+    admin_get_user, admin_get_all_users, admin_delete_user, change_password, provision_users,
+    DIRECTORY_SORTS
 )
+from .importer import iter_csv_rows
 from ..utils.decorator import admin_required  # Assuming you have an admin decorator
+from ..utils.pagination import pagination_parser, page_headers
+from ..utils.fieldsets import parse_fieldset, marshal_fieldset
 
 def register_routes(api):
     profile_model = api.model('UserProfile', {
@@ -20,6 +26,47 @@ def register_routes(api):
         'updated_at': fields.DateTime(readOnly=True),
     })
 
+    directory_entry_model = api.model('UserDirectoryEntry', {
+        'user_id': fields.Integer(attribute='id', description='The unique identifier of the user'),
+        'username': fields.String(description='Username of the user'),
+        'email': fields.String(description='Email address of the user'),
+        'is_admin': fields.Boolean(description='Whether the user is an admin'),
+        'full_name': fields.String(attribute='details.full_name', description='Full name of the user'),
+        'bio': fields.String(attribute='details.bio', description='Short bio of the user'),
+        'avatar_url': fields.String(attribute='details.avatar_url', description='URL to the profile picture'),
+        'phone_number': fields.String(attribute='details.phone_number', description='Phone number of the user'),
+        'address': fields.String(attribute='details.address', description='Home address of the user'),
+        'created_at': fields.DateTime(readOnly=True),
+    })
+
+    directory_parser = pagination_parser.copy()
+    directory_parser.add_argument('username', type=str, location='args', help='Only users whose username starts with this')
+    directory_parser.add_argument('email', type=str, location='args', help='Only users whose email starts with this')
+    directory_parser.add_argument('is_admin', type=inputs.boolean, location='args', help='Only admins, or only non-admins')
+    directory_parser.add_argument('sort', type=str, location='args', default='created_at',
+                                  choices=DIRECTORY_SORTS + tuple('-' + sort for sort in DIRECTORY_SORTS),
+                                  help='Column to sort by; prefix with - for descending order')
+
+    import_parser = api.parser()
+    import_parser.add_argument('file', type=FileStorage, location='files',
+                               help='The CSV file; alternatively send it as the raw request body')
+    import_parser.add_argument('chunk_size', type=inputs.int_range(1, 10000), location='args',
+                               help='Users inserted per transaction')
+
+    import_report_model = api.model('UserImportReport', {
+        'created': fields.Integer(description='Number of users created'),
+        'skipped': fields.Integer(description='Number of rows whose email or username already exists'),
+        'failed': fields.Integer(description='Number of rejected rows'),
+        'rows': fields.List(fields.Nested(api.model('UserImportRow', {
+            'line': fields.Integer(description='Line number in the file'),
+            'username': fields.String,
+            'email': fields.String,
+            'status': fields.String(description='created, exists, invalid or failed'),
+            'user_id': fields.Integer(description='Id of the created user'),
+            'errors': fields.List(fields.String)
+        })))
+    })
+
     # User's own profile
     @api.route('/profile')
     class UserProfileResource(Resource):
@@ -47,12 +94,38 @@ def register_routes(api):
     # Admin-only endpoints
     @api.route('/admin/users')
     class AdminUsersResource(Resource):
-        @api.marshal_list_with(profile_model)
+        @api.expect(directory_parser)
+        @api.response(200, 'Success', [directory_entry_model])
         @jwt_required()
-        # @admin_required  # Only admins can access these
+        @admin_required  # Only admins can access these
         def get(self):
-            """Admin: Get all users' profiles"""
-            return admin_get_all_users()
+            """Admin: List users with their profiles, one page at a time"""
+            args = directory_parser.parse_args()
+            filters = {
+                'username': args['username'],
+                'email': args['email'],
+                'is_admin': args['is_admin']
+            }
+            try:
+                fields = parse_fieldset(args['fields'], directory_entry_model)
+                users, next_cursor = admin_get_all_users(filters, args['cursor'], args['limit'], fields, args['sort'])
+            except ValueError as e:
+                api.abort(400, str(e))
+            return marshal_fieldset(users, directory_entry_model, fields), 200, page_headers(next_cursor)
+
+    @api.route('/admin/users/import')
+    class AdminUserImportResource(Resource):
+        @api.expect(import_parser)
+        @api.marshal_with(import_report_model)
+        @jwt_required()
+        @admin_required
+        def post(self):
+            """Admin: Create users and profiles from a CSV file"""
+            args = import_parser.parse_args()
+            upload = args['file']
+            stream = upload.stream if upload else request.stream
+            chunk_size = args['chunk_size'] or current_app.config['USER_IMPORT_CHUNK_SIZE']
+            return provision_users(iter_csv_rows(stream), chunk_size)
 
     @api.route('/admin/users/<int:user_id>')
     class AdminUserResource(Resource):
@@ -0,0 +1,57 @@
+import csv
+import io
+
+CSV_COLUMNS = ['username', 'email', 'password', 'is_admin', 'full_name', 'bio', 'avatar_url', 'phone_number', 'address']
+PROFILE_COLUMNS = {'full_name': 100, 'bio': 255, 'avatar_url': 255, 'phone_number': 20, 'address': 255}
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'no', 'n'}
+
+
+def iter_csv_rows(stream):
+    """Yield (line_number, row dict) from a CSV byte stream with a header row."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def validate_user_row(row):
+    """Return ((user values, profile values), errors) for one imported row."""
+    errors = []
+
+    username = (row.get('username') or '').strip()
+    if not username:
+        errors.append('username is required')
+    elif len(username) > 45:
+        errors.append('username is longer than 45 characters')
+
+    email = (row.get('email') or '').strip()
+    if not email:
+        errors.append('email is required')
+    elif len(email) > 45:
+        errors.append('email is longer than 45 characters')
+    elif '@' not in email:
+        errors.append('email is not a valid address')
+
+    password = row.get('password') or ''
+    if not password:
+        errors.append('password is required')
+
+    is_admin = (row.get('is_admin') or '').strip().lower()
+    if is_admin not in TRUE_VALUES | FALSE_VALUES:
+        errors.append(f'Invalid is_admin: {is_admin}')
+
+    profile = {}
+    for column, max_length in PROFILE_COLUMNS.items():
+        value = (row.get(column) or '').strip()
+        if len(value) > max_length:
+            errors.append(f'{column} is longer than {max_length} characters')
+        profile[column] = value
+
+    if errors:
+        return None, errors
+    return ({
+        'username': username,
+        'email': email,
+        'password': password,
+        'is_admin': is_admin in TRUE_VALUES
+    }, profile), []
@@ -3,6 +3,9 @@ from ..utils.db import db
 
 class UserProfile(db.Model):
     __tablename__ = 'user_profiles'
+    __table_args__ = (
+        db.Index('ix_user_profiles_created_at_id', 'created_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
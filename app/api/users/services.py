@@ -1,8 +1,14 @@
 from ..models.users import User
 from .models import UserProfile
 from ..utils.db import db
+from ..utils.pagination import keyset_paginate
+from ..utils.user_cache import user_cache
 from flask import abort
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from ..utils.passwords import passwords
+from .importer import validate_user_row
 
 def get_user_profile(user_id):
     profile = UserProfile.query.filter_by(user_id=user_id).first()
@@ -22,6 +28,7 @@ def update_user_profile(user_id, data):
     profile.address = data.get('address', profile.address)
 
     db.session.commit()
+    user_cache.invalidate(user_id)
     return profile
 
 def delete_user_profile(user_id):
@@ -30,6 +37,7 @@ def delete_user_profile(user_id):
         abort(404, "User profile not found")
     
     profile.delete()
+    user_cache.invalidate(user_id)
     return '', 204
 
 # Admin: Get any user profile
@@ -52,6 +60,7 @@ def admin_delete_user(user_id):
     
     db.session.delete(user)
     db.session.commit()
+    user_cache.invalidate(user_id)
     return '', 204
 
 # Change user's password
@@ -60,55 +69,120 @@ def change_password(user_id, old_password, new_password):
     if not user:
         abort(404, "User not found")
 
-    if not check_password_hash(user.password_hash, old_password):
+    if not passwords.check(user.password_hash, old_password):
         abort(400, "Old password is incorrect")
 
-    user.password_hash = generate_password_hash(new_password)
+    user.password_hash = passwords.hash(new_password)
     db.session.commit()
     return {'message': 'Password updated successfully'}
 
 
-# Admin: Get all user profiles
-def admin_get_all_users():
-    # Query all users with their profiles
-    # users = User.query.all()
-
-    # if not users:
-    #     abort(404, "No users found")
-
-    # profiles = UserProfile.query.all()
-
-    # return [
-    #     {
-    #         'user_id': user.id,
-    #         'email': user.email,
-    #         'profile': {
-    #             'full_name': user.profile.full_name if user.profile else None,
-    #             'bio': user.profile.bio if user.profile else None,
-    #             'avatar_url': user.profile.avatar_url if user.profile else None,
-    #             'phone_number': user.profile.phone_number if user.profile else None,
-    #             'address': user.profile.address if user.profile else None,
-    #             'created_at': user.profile.created_at if user.profile else None,
-    #             'updated_at': user.profile.updated_at if user.profile else None
-    #         }
-    #     } for user in users 
-    # ]
-
-
-    # return [
-    #     {
-    #         'profile': {
-    #             'user_id': profile.user.id,
-    #             'email': profile.user.email,
-    #             'username': profile.user.username,
-    #             'full_name': profile.full_name if profile else None,
-    #             'bio': profile.bio if profile else None,
-    #             'avatar_url': profile.avatar_url if profile else None,
-    #             'phone_number': profile.phone_number if profile else None,
-    #             'address': profile.address if profile else None,
-    #             'created_at': profile.created_at if profile else None,
-    #             'updated_at': profile.updated_at if profile else None
-    #         }
-    #     } for profile in profiles
-    # ]
-    return UserProfile.query.all()
\ No newline at end of file
+DIRECTORY_SORTS = ('created_at', 'username', 'email')
+PROFILE_FIELDS = ('full_name', 'bio', 'avatar_url', 'phone_number', 'address')
+
+# Admin: One page of the user directory. Profiles are joined into the same
+# query unless fields leaves them out; username/email filter by prefix, and
+# sort names a column of DIRECTORY_SORTS, prefixed with '-' for descending.
+def admin_get_all_users(filters=None, cursor=None, limit=None, fields=None, sort='created_at'):
+    filters = dict(filters or {})
+    query = User.query
+    if fields is None or any(name in PROFILE_FIELDS for name in fields):
+        query = query.options(joinedload(User.details))
+    for name in ('username', 'email'):
+        prefix = filters.pop(name, None)
+        if prefix:
+            query = query.filter(getattr(User, name).startswith(prefix, autoescape=True))
+    return keyset_paginate(query, User, cursor, limit, filters, fields, sort.lstrip('-'), sort.startswith('-'))
+
+
+# Bulk-create users and their profiles from imported rows. Each chunk is
+# checked against existing accounts with one query, its passwords are hashed
+# in parallel, and its users and profiles are inserted with multi-row
+# INSERTs in one transaction. The report has one result per row.
+def provision_users(rows, chunk_size=500):
+    report = {'created': 0, 'skipped': 0, 'failed': 0, 'rows': []}
+    seen_usernames, seen_emails = {}, {}
+    chunk = []
+
+    def flush():
+        usernames = [user['username'] for _, (user, _) in chunk]
+        emails = [user['email'] for _, (user, _) in chunk]
+        existing = db.session.execute(
+            select(User.username, User.email).where(or_(User.username.in_(usernames), User.email.in_(emails)))
+        ).all()
+        taken_usernames = {row.username for row in existing}
+        taken_emails = {row.email for row in existing}
+
+        pending = []
+        for result, (user, profile) in chunk:
+            if user['email'] in taken_emails:
+                result['errors'].append(f"User with email {user['email']} already exists")
+            if user['username'] in taken_usernames:
+                result['errors'].append(f"User with username {user['username']} already exists")
+            if result['errors']:
+                result['status'] = 'exists'
+                report['skipped'] += 1
+            else:
+                pending.append((result, user, profile))
+        chunk.clear()
+        if not pending:
+            return
+
+        hashes = passwords.hash_many([user['password'] for _, user, _ in pending])
+        try:
+            db.session.execute(insert(User), [{
+                'username': user['username'],
+                'email': user['email'],
+                'password_hash': password_hash,
+                'is_admin': user['is_admin']
+            } for (_, user, _), password_hash in zip(pending, hashes)])
+            user_ids = dict(db.session.execute(
+                select(User.email, User.id).where(User.email.in_([user['email'] for _, user, _ in pending]))
+            ).all())
+            db.session.execute(insert(UserProfile), [
+                dict(profile, user_id=user_ids[user['email']]) for _, user, profile in pending
+            ])
+            db.session.commit()
+        except IntegrityError:
+            # An account in this chunk was created concurrently; nothing was kept
+            db.session.rollback()
+            for result, _, _ in pending:
+                result['status'] = 'failed'
+                result['errors'].append('Conflicted with a concurrently created account; import this row again')
+            report['failed'] += len(pending)
+            return
+
+        for result, user, _ in pending:
+            result['status'] = 'created'
+            result['user_id'] = user_ids[user['email']]
+        report['created'] += len(pending)
+
+    for line_number, row in rows:
+        values, errors = validate_user_row(row)
+        result = {
+            'line': line_number,
+            'username': (row.get('username') or '').strip(),
+            'email': (row.get('email') or '').strip(),
+            'status': 'invalid',
+            'user_id': None,
+            'errors': errors
+        }
+        report['rows'].append(result)
+        if values:
+            user = values[0]
+            if user['username'] in seen_usernames:
+                errors.append(f"Duplicate username (line {seen_usernames[user['username']]})")
+            if user['email'] in seen_emails:
+                errors.append(f"Duplicate email (line {seen_emails[user['email']]})")
+            seen_usernames.setdefault(user['username'], line_number)
+            seen_emails.setdefault(user['email'], line_number)
+        if errors:
+            report['failed'] += 1
+            continue
+        chunk.append((result, values))
+        if len(chunk) >= chunk_size:
+            flush()
+
+    if chunk:
+        flush()
+    return report
@@ -0,0 +1,126 @@
+import io
+
+import pytest
+from sqlalchemy import event
+
+from ..models.users import User
+from ..utils.db import db
+from .models import UserProfile
+from .services import provision_users
+
+CSV_HEADER = 'username,email,password,is_admin,full_name,bio,avatar_url,phone_number,address'
+
+
+def csv_upload(*lines):
+    return {'file': (io.BytesIO('\n'.join((CSV_HEADER,) + lines).encode()), 'users.csv')}
+
+
+def test_import_creates_users_in_chunks_and_reports_every_row(client, make_user):
+    _, admin = make_user(admin=True)
+    existing = User.query.first()
+    upload = csv_upload(
+        'ada,ada@example.com,secret1,,Ada Lovelace,,,,',
+        'alan,alan@example.com,secret2,yes,Alan Turing,,,,',
+        f'taken,{existing.email},secret3,,,,,,',
+        'ada2,ada@example.com,secret4,,,,,,',
+        'grace,not-an-address,secret5,maybe,,,,,',
+        'grace,grace@example.com,secret6,,Grace Hopper,,,,',
+    )
+
+    response = client.post('/users/admin/users/import?chunk_size=2', data=upload,
+                           content_type='multipart/form-data', headers=admin)
+
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['created'], report['skipped'], report['failed']) == (3, 1, 2)
+    assert [(row['line'], row['status']) for row in report['rows']] == [
+        (2, 'created'), (3, 'created'), (4, 'exists'), (5, 'invalid'), (6, 'invalid'), (7, 'created')
+    ]
+    assert report['rows'][3]['errors'] == ['Duplicate email (line 2)']
+    assert report['rows'][4]['errors'] == ['email is not a valid address', 'Invalid is_admin: maybe']
+
+    alan = User.query.get(report['rows'][1]['user_id'])
+    assert (alan.username, alan.is_admin) == ('alan', True)
+    assert UserProfile.query.filter_by(user_id=alan.id).one().full_name == 'Alan Turing'
+    login = client.post('/auth/login', json={'email': 'grace@example.com', 'password': 'secret6'})
+    assert login.status_code == 200
+
+
+def test_only_admins_can_import_users(client, make_user):
+    _, student = make_user()
+    response = client.post('/users/admin/users/import', data=csv_upload('ada,ada@example.com,secret,,,,,,'),
+                           content_type='multipart/form-data', headers=student)
+    assert response.status_code == 403
+    assert User.query.filter_by(username='ada').first() is None
+
+
+def test_import_command_reads_a_csv_file(app, tmp_path):
+    path = tmp_path / 'users.csv'
+    path.write_text('\n'.join([CSV_HEADER, 'ada,ada@example.com,secret,,,,,,', 'bob,,secret,,,,,,']))
+
+    result = app.test_cli_runner().invoke(args=['users', 'import', str(path)])
+
+    assert 'Created 1 user(s), skipped 0 existing, rejected 1.' in result.output
+    assert 'line 3: invalid: email is required' in result.output
+    assert User.query.filter_by(username='ada').one().email == 'ada@example.com'
+
+
+@pytest.fixture
+def cohort(app):
+    """Twelve students with profiles, provisioned in one import."""
+    rows = [(line, {'username': f'student{number:02}', 'email': f's{number:02}@school.example', 'password': 'secret',
+                    'full_name': f'Student {number}'})
+            for line, number in enumerate(range(12), start=2)]
+    report = provision_users(rows)
+    assert report['created'] == 12
+
+
+def test_directory_pages_users_with_their_profiles_in_one_query_each(app, client, make_user, cohort):
+    _, admin = make_user(admin=True)
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        listed, cursor, pages = [], None, 0
+        while True:
+            response = client.get('/users/admin/users', query_string={
+                'username': 'student', 'sort': '-username', 'limit': 5, 'cursor': cursor
+            }, headers=admin)
+            assert response.status_code == 200
+            listed += response.get_json()
+            pages += 1
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert [user['username'] for user in listed] == [f'student{number:02}' for number in reversed(range(12))]
+    assert listed[0]['full_name'] == 'Student 11'
+    directory_queries = [statement for statement in statements if 'FROM users' in statement]
+    assert (pages, len(directory_queries)) == (3, 3)
+    assert all('JOIN user_profiles' in statement for statement in directory_queries)
+
+
+@pytest.mark.parametrize('query, expected', [
+    ({'email': 's1'}, ['student10', 'student11']),
+    ({'username': 'student0', 'email': 's05'}, ['student05']),
+    ({'username': 'student%'}, []),
+    ({'is_admin': 'true'}, ['admin']),
+])
+def test_directory_filters_by_prefix_and_role(client, make_user, cohort, query, expected):
+    admin_id, admin = make_user(admin=True)
+    User.query.get(admin_id).username = 'admin'
+    db.session.commit()
+
+    response = client.get('/users/admin/users', query_string=dict(query, sort='username', fields='username'),
+                          headers=admin)
+
+    assert response.get_json() == [{'username': username} for username in expected]
+
+
+def test_only_admins_can_list_users(client, make_user):
+    _, student = make_user()
+    assert client.get('/users/admin/users', headers=student).status_code == 403
+    _, admin = make_user(admin=True)
+    assert client.get('/users/admin/users?sort=password_hash', headers=admin).status_code == 400
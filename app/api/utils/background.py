@@ -0,0 +1,26 @@
+import logging
+import threading
+from flask import current_app
+from .db import db
+
+logger = logging.getLogger(__name__)
+
+
+def run_in_background(fn, *args, **kwargs):
+    """Call fn(*args, **kwargs) on a daemon thread inside an app context
+    of the current app. Failures are logged; the thread is returned."""
+    app = current_app._get_current_object()
+
+    def target():
+        with app.app_context():
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                db.session.rollback()
+                logger.exception('Background task %s failed', fn.__name__)
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=target, name=f'background-{fn.__name__}', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,162 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import and_, delete, func, or_, select
+from .background import run_in_background
+from .db import db
+from ..models.users import TokenBlacklist
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings: no false negatives, and false
+    positives at about `error_rate` while holding up to `capacity` items."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenBlocklist:
+    """In-process view of the token_blacklist table for the JWT
+    `token_in_blocklist_loader`.
+
+    A Bloom filter holds every revoked jti, so a token that was never
+    revoked (nearly all of them) is accepted without a query. Only filter
+    hits are looked up in the table, and those answers are kept in a TTL
+    cache. Rows added by other workers are pulled in incrementally (by id)
+    at most every BLOCKLIST_SYNC_INTERVAL seconds, so a logout elsewhere
+    takes effect here within that interval. Every BLOCKLIST_PURGE_INTERVAL
+    seconds a background thread deletes the rows of expired tokens, on its
+    own session rather than the request's, and then has the filter rebuilt.
+    """
+
+    def __init__(self):
+        self.sync_interval = 30.0
+        self.purge_interval = 3600.0
+        self.cache_ttl = 300.0
+        self.capacity = 100000
+        self._filter = None
+        self._rebuild_due = False
+        self._last_id = 0
+        self._synced_at = 0.0
+        self._purged_at = 0.0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, jwt):
+        self.sync_interval = app.config['BLOCKLIST_SYNC_INTERVAL']
+        self.purge_interval = app.config['BLOCKLIST_PURGE_INTERVAL']
+        self.cache_ttl = app.config['BLOCKLIST_CACHE_TTL']
+        self.capacity = app.config['BLOCKLIST_BLOOM_CAPACITY']
+        self._purged_at = time.monotonic()
+        # The app's database may not be the one the filter was built from
+        with self._lock:
+            self._filter = None
+            self._cache = {}
+
+        @jwt.token_in_blocklist_loader
+        def check_if_token_revoked(jwt_header, jwt_payload):
+            return self.is_revoked(jwt_payload['jti'])
+
+    def is_revoked(self, jti):
+        self._sync()
+        with self._lock:
+            cached = self._cache.get(jti)
+            if cached is not None and cached[1] > time.monotonic():
+                return cached[0]
+            if jti not in self._filter:
+                return False
+
+        revoked = db.session.scalar(select(TokenBlacklist.id).where(TokenBlacklist.jti == jti)) is not None
+        with self._lock:
+            if len(self._cache) >= self.capacity:
+                self._cache.clear()
+            self._cache[jti] = (revoked, time.monotonic() + self.cache_ttl)
+        return revoked
+
+    def revoke(self, jti):
+        """Record a jti this process just wrote to the table. The cache
+        entry covers it until the next sync has put it in the filter."""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+            self._cache[jti] = (True, time.monotonic() + self.cache_ttl)
+
+    def rebuild(self):
+        """Reload the filter from the table, e.g. after a purge."""
+        with self._lock:
+            self._rebuild_due = True
+        self._sync()
+
+    def _sync(self):
+        now = time.monotonic()
+        if self._filter is not None and not self._rebuild_due and now - self._synced_at < self.sync_interval:
+            return
+        if self.purge_interval and now - self._purged_at >= self.purge_interval:
+            self._purged_at = now
+            run_in_background(self._purge)
+
+        with self._lock:
+            rebuild = self._filter is None or self._rebuild_due or self._filter.count >= self._filter.capacity
+            self._rebuild_due = False
+            last_id = 0 if rebuild else self._last_id
+        rows = db.session.execute(
+            select(TokenBlacklist.id, TokenBlacklist.jti).where(TokenBlacklist.id > last_id).order_by(TokenBlacklist.id)
+        ).all()
+
+        with self._lock:
+            if rebuild:
+                self._filter = BloomFilter(max(self.capacity, 2 * len(rows)))
+                self._last_id = 0
+            for row_id, jti in rows:
+                self._filter.add(jti)
+                # A "not revoked" answer cached for a filter hit may be stale now
+                if self._cache.get(jti, (True,))[0] is False:
+                    del self._cache[jti]
+                self._last_id = row_id
+            self._synced_at = now
+
+    def _purge(self):
+        purge_expired_tokens()
+        # Purged jtis only cost filter hits until the next sync rebuilds it
+        with self._lock:
+            self._rebuild_due = True
+
+
+# Delete blocklist rows whose tokens have expired and so can't be presented
+# any more. Rows written before expiry times were recorded are kept for the
+# longest token lifetime after they were blacklisted.
+def purge_expired_tokens():
+    now = datetime.utcnow()
+    longest_lifetime = max(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'], current_app.config['JWT_REFRESH_TOKEN_EXPIRES'])
+    result = db.session.execute(
+        delete(TokenBlacklist).where(or_(
+            TokenBlacklist.expires_at < now,
+            and_(TokenBlacklist.expires_at.is_(None), TokenBlacklist.blacklisted_at < now - longest_lifetime)
+        )),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+token_blocklist = TokenBlocklist()
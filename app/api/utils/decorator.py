@@ -1,17 +1,33 @@
 from functools import wraps
-from flask_jwt_extended import get_jwt_identity
+from flask_jwt_extended import get_jwt, get_jwt_identity
 from flask import abort
-from ..models.users import User
+from .user_cache import user_cache
+
+
+def role_claims(user):
+    """Extra JWT claims describing the user's roles, for create_access_token."""
+    return {'is_admin': bool(user.is_admin)}
+
+
+def current_user_is_admin():
+    """Whether the user of the current request's token is an admin.
+
+    Read from the token's claims; tokens issued before the claims existed
+    fall back to the cached user record.
+    """
+    claims = get_jwt()
+    if 'is_admin' in claims:
+        return bool(claims['is_admin'])
+    user = user_cache.get(get_jwt_identity())
+    return bool(user and user.is_admin)
+
 
 def admin_required(fn):
     @wraps(fn)
     def wrapper(*args, **kwargs):
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
-        
-        if not user or not user.is_admin:
+        if not current_user_is_admin():
             abort(403, "Admin privileges required")
         
         return fn(*args, **kwargs)
     
-    return wrapper
\ No newline at end of file
+    return wrapper
@@ -0,0 +1,31 @@
+from flask_restx import marshal
+from sqlalchemy.orm import load_only
+
+
+def parse_fieldset(value, model):
+    """Split a comma-separated `fields=` value into field names of the
+    marshal model; None (all fields) when the value is empty."""
+    if not value:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in model]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(model)}")
+    return names or None
+
+
+def load_fieldset(query, model, names, required=('id',)):
+    """Restrict the SELECT to the columns of model behind names (plus the
+    required ones); names that aren't columns are left to load lazily."""
+    if names is None:
+        return query
+    columns = model.__mapper__.column_attrs
+    keys = [key for key in dict.fromkeys((*required, *names)) if key in columns]
+    return query.options(load_only(*(getattr(model, key) for key in keys)))
+
+
+def marshal_fieldset(data, model, names):
+    """Marshal data with only the named fields of the model."""
+    if names is not None:
+        model = {name: model[name] for name in names}
+    return marshal(data, model)
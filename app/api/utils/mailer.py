@@ -0,0 +1,169 @@
+import logging
+import smtplib
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Mail, Message
+from .db import db
+from ..models.outbox import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutbox:
+    """Outgoing mail, written to the email_outbox table and sent later.
+
+    `enqueue` only inserts a row, so a request never waits on SMTP. A
+    dispatcher thread (started with the app unless MAIL_OUTBOX_DISPATCHER
+    is off, in which case `flask auth send-mail` does the sending) sends
+    due messages in batches of MAIL_OUTBOX_BATCH_SIZE over one SMTP
+    connection, kept open across batches until it has been idle for
+    MAIL_OUTBOX_IDLE_TIMEOUT seconds. A failed message is retried after
+    MAIL_OUTBOX_RETRY_DELAY seconds, doubling per attempt, and given up on
+    after MAIL_OUTBOX_MAX_ATTEMPTS. Batches are claimed with SKIP LOCKED
+    where the database supports it, so several workers can dispatch.
+    """
+
+    def __init__(self):
+        self.mail = Mail()
+        self.batch_size = 50
+        self.poll_interval = 10.0
+        self.idle_timeout = 30.0
+        self.retry_delay = 30.0
+        self.max_attempts = 6
+        self.run_dispatcher = True
+        self._app = None
+        self._connection = None
+        self._used_at = 0.0
+        self._thread = None
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.mail.init_app(app)
+        self.batch_size = app.config['MAIL_OUTBOX_BATCH_SIZE']
+        self.poll_interval = app.config['MAIL_OUTBOX_POLL_INTERVAL']
+        self.idle_timeout = app.config['MAIL_OUTBOX_IDLE_TIMEOUT']
+        self.retry_delay = app.config['MAIL_OUTBOX_RETRY_DELAY']
+        self.max_attempts = app.config['MAIL_OUTBOX_MAX_ATTEMPTS']
+        self.run_dispatcher = app.config['MAIL_OUTBOX_DISPATCHER']
+        self._app = app
+        if self.run_dispatcher:
+            # Not left to the first enqueue: messages still pending from
+            # before a restart must go out even if no new mail comes in
+            self._start()
+
+    def enqueue(self, subject, recipients, body, sender=None):
+        """Store a message for sending and commit it."""
+        email = OutboxEmail(
+            subject=subject,
+            sender=sender or current_app.config['MAIL_DEFAULT_SENDER'],
+            recipients=list(recipients),
+            body=body,
+        )
+        db.session.add(email)
+        db.session.commit()
+        if self.run_dispatcher:
+            self._start()
+            self._wakeup.set()
+        return email
+
+    def dispatch(self):
+        """Send one batch of due messages; returns how many were attempted."""
+        now = datetime.utcnow()
+        batch = (
+            OutboxEmail.query
+            .filter(OutboxEmail.status == OutboxEmail.PENDING, OutboxEmail.next_attempt_at <= now)
+            .order_by(OutboxEmail.next_attempt_at, OutboxEmail.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not batch:
+            db.session.commit()
+            return 0
+
+        try:
+            self._connect()
+        except OSError as exc:
+            # Nothing can go out without a connection; back the whole batch off
+            for email in batch:
+                self._failed(email, exc, now)
+        else:
+            for email in batch:
+                try:
+                    self._send(email)
+                except Exception as exc:
+                    self._failed(email, exc, now)
+                else:
+                    email.status = OutboxEmail.SENT
+                    email.attempts += 1
+                    email.sent_at = datetime.utcnow()
+                    email.last_error = None
+        db.session.commit()
+        return len(batch)
+
+    def close(self):
+        """Quit the pooled SMTP connection, if open."""
+        connection, self._connection = self._connection, None
+        if connection is not None and connection.host is not None:
+            try:
+                connection.host.quit()
+            except OSError:
+                pass
+
+    def _connect(self):
+        if self._connection is None:
+            connection = self.mail.connect()
+            connection.__enter__()
+            self._connection = connection
+        return self._connection
+
+    def _send(self, email):
+        message = Message(subject=email.subject, sender=email.sender, recipients=email.recipients, body=email.body)
+        try:
+            self._connect().send(message)
+        except smtplib.SMTPServerDisconnected:
+            # The pooled connection went stale while idle; reconnect once
+            self.close()
+            self._connect().send(message)
+        self._used_at = time.monotonic()
+
+    def _failed(self, email, exc, now):
+        # Refused recipients or content leave the connection usable
+        if isinstance(exc, smtplib.SMTPServerDisconnected) or not isinstance(exc, smtplib.SMTPException):
+            self.close()
+        email.attempts += 1
+        email.last_error = str(exc)[:1000]
+        if email.attempts >= self.max_attempts:
+            email.status = OutboxEmail.FAILED
+            logger.error('Giving up on outbox email %s after %s attempts: %s', email.id, email.attempts, exc)
+        else:
+            email.next_attempt_at = now + timedelta(seconds=self.retry_delay * 2 ** (email.attempts - 1))
+
+    def _start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            with self._app.app_context():
+                try:
+                    while self.dispatch() >= self.batch_size:
+                        pass
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Email outbox dispatch failed')
+                finally:
+                    db.session.remove()
+                if self._connection is not None and time.monotonic() - self._used_at >= self.idle_timeout:
+                    self.close()
+
+
+outbox = EmailOutbox()
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from flask import current_app
+from flask_restx import reqparse
+from sqlalchemy import DateTime, and_, or_
+from .fieldsets import load_fieldset
+
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument('cursor', type=str, location='args', help='Opaque cursor from the X-Next-Cursor header')
+pagination_parser.add_argument('limit', type=int, location='args', help='Maximum number of items to return')
+pagination_parser.add_argument('fields', type=str, location='args',
+                               help='Comma-separated fields to return (default: all)')
+
+
+def encode_cursor(item, sort='created_at'):
+    value = getattr(item, sort)
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value, item.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, column=None):
+    """Return (sort value, id) from a cursor; the value is a datetime unless
+    column (the sort column) is of another type."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        if column is None or isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        return value, int(item_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+
+def keyset_paginate(query, model, cursor=None, limit=None, filters=None, fields=None, sort='created_at',
+                    descending=False):
+    """Return one page of query ordered by (sort, id) and the cursor of the
+    next page, or None when this is the last page.
+
+    filters maps column names to values; None values are ignored. fields,
+    if given, limits the columns loaded to those (see load_fieldset). sort
+    names a non-null column; index (sort, id) to keep pages cheap.
+    """
+    default_limit = current_app.config['PAGINATION_DEFAULT_LIMIT']
+    max_limit = current_app.config['PAGINATION_MAX_LIMIT']
+    limit = min(max(limit or default_limit, 1), max_limit)
+    column = getattr(model, sort)
+
+    query = load_fieldset(query, model, fields, required=('id', sort))
+
+    if filters:
+        query = query.filter_by(**{name: value for name, value in filters.items() if value is not None})
+
+    if cursor:
+        value, item_id = decode_cursor(cursor, column)
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, model.id < item_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, model.id > item_id)))
+
+    order = (column.desc(), model.id.desc()) if descending else (column, model.id)
+    items = query.order_by(*order).limit(limit + 1).all()
+    next_cursor = encode_cursor(items[limit - 1], sort) if len(items) > limit else None
+    return items[:limit], next_cursor
+
+
+def page_headers(next_cursor):
+    return {'X-Next-Cursor': next_cursor} if next_cursor else {}
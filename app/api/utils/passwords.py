@@ -0,0 +1,87 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(ServiceUnavailable):
+    description = 'Too many sign-ins are being processed; please try again shortly.'
+
+
+class PasswordHasher:
+    """Runs password hashing and checking on a bounded thread pool.
+
+    The pool bounds how much hashing runs at once; it does not make hashing
+    asynchronous. The app is synchronous WSGI, so a request thread still
+    blocks until its hash is done. What the pool adds is a cap: key
+    stretching is CPU-bound but hashlib releases the GIL while it runs, so
+    PASSWORD_HASH_WORKERS threads (one per CPU by default) hash in
+    parallel without oversubscribing the CPUs, however many requests
+    arrive. At most PASSWORD_HASH_MAX_QUEUED more operations may wait for a
+    free worker; beyond that a caller gives up after
+    PASSWORD_HASH_WAIT_TIMEOUT seconds with HashingBusy (503), rather than
+    letting a login burst tie up every request thread. New hashes use
+    PASSWORD_HASH_METHOD (any werkzeug method, e.g. "scrypt:32768:8:1" or
+    "pbkdf2:sha256:600000"); `needs_rehash` spots hashes made otherwise.
+    """
+
+    def __init__(self):
+        self.method = 'scrypt'
+        self.wait_timeout = 5.0
+        self._method_prefix = None
+        self._workers = 1
+        self._executor = None
+        self._slots = None
+
+    def init_app(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.wait_timeout = app.config['PASSWORD_HASH_WAIT_TIMEOUT']
+        self._workers = app.config['PASSWORD_HASH_WORKERS'] or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(self._workers + app.config['PASSWORD_HASH_MAX_QUEUED'])
+        self._method_prefix = None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, values):
+        """Hash a list of passwords in parallel, returning hashes in order.
+        A batch holds at most one slot per worker, so the queue stays free
+        for interactive requests while it runs."""
+        in_flight = threading.BoundedSemaphore(self._workers)
+
+        def release(future):
+            self._slots.release()
+            in_flight.release()
+
+        futures = []
+        for password in values:
+            in_flight.acquire()
+            self._slots.acquire()
+            future = self._executor.submit(generate_password_hash, password, self.method)
+            future.add_done_callback(release)
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    def check(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """Whether pwhash was made with another method or cost than the configured one."""
+        if self._method_prefix is None:
+            # werkzeug fills in default parameters, so compare against a real hash
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HashingBusy(retry_after=1)
+        try:
+            # Blocks the calling thread; the pool only caps concurrent hashing
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+passwords = PasswordHasher()
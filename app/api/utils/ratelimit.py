@@ -0,0 +1,179 @@
+import math
+import re
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache, wraps
+from flask import current_app, request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import TooManyRequests
+from .db import db
+from ..models.ratelimit import RateLimitCounter
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class RateLimited(TooManyRequests):
+    description = 'Too many attempts; please wait before trying again.'
+
+
+@lru_cache(maxsize=None)
+def parse_limit(value):
+    """Parse a limit such as "10/minute" or "5/15 minutes" into
+    (requests, window seconds); None for an empty value (no limit)."""
+    if not value or not value.strip():
+        return None
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*', value)
+    if not match:
+        raise ValueError(f'Invalid rate limit: {value!r}')
+    requests, multiple, period = match.groups()
+    if int(requests) < 1:
+        raise ValueError(f'Invalid rate limit: {value!r}; use an empty value for no limit')
+    return int(requests), int(multiple or 1) * PERIODS[period]
+
+
+class MemoryStore:
+    """Per-process counters: key -> [window, count, previous window's count]."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, allow, window_length):
+        with self._lock:
+            counter = self._counters.pop(key, None)
+            if counter is None or counter[0] < window - 1:
+                counter = [window, 0, 0]
+            elif counter[0] == window - 1:
+                counter = [window, 0, counter[1]]
+            allowed = allow(counter[2], counter[1])
+            if allowed:
+                counter[1] += 1
+            if len(self._counters) >= self.max_keys:
+                self._evict()
+            self._counters[key] = counter
+            return allowed, counter[2], counter[1]
+
+    def _evict(self):
+        # Keys are re-inserted on every hit, so the least recently used come first
+        for key in list(self._counters)[:max(1, self.max_keys // 10)]:
+            del self._counters[key]
+
+
+class DatabaseStore:
+    """Counters in the rate_limit_counters table, shared by all workers.
+    Rows are written on their own connection, outside the request's
+    session, and expired rows are purged every `purge_interval` seconds."""
+
+    def __init__(self, purge_interval=300.0):
+        self.purge_interval = purge_interval
+        self._purged_at = time.monotonic()
+
+    def hit(self, key, window, allow, window_length):
+        table = RateLimitCounter.__table__
+        with db.engine.begin() as connection:
+            counts = dict(connection.execute(
+                select(table.c.window, table.c.count).where(table.c.key == key, table.c.window.in_((window - 1, window)))
+            ).all())
+            previous, current = counts.get(window - 1, 0), counts.get(window, 0)
+            if not allow(previous, current):
+                return False, previous, current
+
+            increment = update(table).where(table.c.key == key, table.c.window == window).values(count=table.c.count + 1)
+            if not current or not connection.execute(increment).rowcount:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(table.insert().values(
+                            key=key, window=window, count=1,
+                            expires_at=datetime.utcfromtimestamp((window + 2) * window_length)
+                        ))
+                except IntegrityError:
+                    # Another worker created the row first
+                    connection.execute(increment)
+
+            if time.monotonic() - self._purged_at >= self.purge_interval:
+                self._purged_at = time.monotonic()
+                connection.execute(delete(table).where(table.c.expires_at < datetime.utcnow()))
+        return True, previous, current + 1
+
+
+class RateLimiter:
+    """Sliding-window rate limits for unauthenticated endpoints.
+
+    Each request counts against its client IP and, when the JSON body has
+    one, the email it names, so a burst from one address and a spray
+    against one account are both cut off. A window's count is the current
+    fixed window's hits plus the previous window's, weighted by how much of
+    it still overlaps; that needs two counters per key. Limits come from
+    RATELIMIT_<NAME> (e.g. "10/minute", empty for none); counters live in
+    this process unless RATELIMIT_STORAGE is "database", which shares them
+    between workers at the cost of a write per request.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.store = MemoryStore()
+
+    def init_app(self, app):
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        storage = app.config['RATELIMIT_STORAGE']
+        if storage == 'memory':
+            self.store = MemoryStore(app.config['RATELIMIT_MAX_KEYS'])
+        elif storage == 'database':
+            self.store = DatabaseStore()
+        else:
+            raise ValueError(f'Unknown RATELIMIT_STORAGE: {storage!r}')
+
+    def limit(self, name):
+        """Decorator for a Resource method limited by RATELIMIT_<NAME>."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                self.check(name)
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def check(self, name):
+        """Count the current request against `name`'s limit, raising
+        RateLimited (429 with Retry-After) once it is used up."""
+        if not self.enabled:
+            return
+        limit = parse_limit(current_app.config[f'RATELIMIT_{name.upper()}'])
+        if limit is None:
+            return
+
+        keys = [f'{name}:ip:{request.remote_addr}']
+        data = request.get_json(silent=True)
+        email = data.get('email') if isinstance(data, dict) else None
+        if isinstance(email, str) and email.strip():
+            keys.append(f'{name}:email:{email.strip().lower()[:160]}')
+
+        retry_after = max(self._hit(key, *limit) for key in keys)
+        if retry_after:
+            raise RateLimited(retry_after=retry_after)
+
+    def _hit(self, key, max_requests, window_length):
+        """Count one hit for key; 0 if allowed, else seconds to wait."""
+        now = time.time()
+        window = int(now // window_length)
+        elapsed = now / window_length - window  # fraction of the current window gone
+
+        def allow(previous, current):
+            return previous * (1 - elapsed) + current + 1 <= max_requests
+
+        allowed, previous, current = self.store.hit(key, window, allow, window_length)
+        if allowed:
+            return 0
+
+        if current + 1 > max_requests:
+            # Wait for the next window, then for the carried-over weight to fall
+            wait = (1 - elapsed) + max(0.0, 1 - (max_requests - 1) / current)
+        else:
+            wait = 1 - (max_requests - 1 - current) / previous - elapsed
+        return max(1, math.ceil(wait * window_length))
+
+
+rate_limiter = RateLimiter()
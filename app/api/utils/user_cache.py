@@ -0,0 +1,52 @@
+import threading
+from collections import OrderedDict, namedtuple
+from sqlalchemy import select
+from .db import db
+from ..models.users import User
+
+CachedUser = namedtuple('CachedUser', ['id', 'username', 'email', 'is_admin'])
+
+
+class UserCache:
+    """Per-process LRU cache of the user fields authorization needs.
+
+    Services that change or delete a user call `invalidate`; other workers
+    keep their copy until it is evicted, so anything that must be exact
+    should read the table.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the CachedUser for user_id, or None if there is no such user."""
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is not None:
+                self._users.move_to_end(user_id)
+                return user
+
+        row = db.session.execute(
+            select(User.id, User.username, User.email, User.is_admin).where(User.id == user_id)
+        ).first()
+        if row is None:
+            return None
+        user = CachedUser(row.id, row.username, row.email, bool(row.is_admin))
+        with self._lock:
+            self._users[user_id] = user
+            while len(self._users) > self.maxsize:
+                self._users.popitem(last=False)
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()
@@ -0,0 +1,66 @@
+import os
+import uuid
+
+import pytest
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('MAIL_USERNAME', 'test')
+os.environ.setdefault('MAIL_PASSWORD', 'test')
+os.environ.setdefault('ADMIN_SECRET_CODE', 'test-admin-code')
+
+from .api import create_app
+from .api.config.config import DevConfig
+from .api.examinations.services import analytics_queue, exam_counters
+from .api.examinations.utils import answer_keys
+from .api.questions.services import question_indexes
+from .api.utils.db import db
+from .api.utils.user_cache import user_cache
+
+
+class TestConfig(DevConfig):
+    TESTING = True
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_ECHO = False
+    JWT_SECRET_KEY = 'test-secret-key-long-enough-for-hs256'
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    MAIL_OUTBOX_DISPATCHER = False
+    ANALYTICS_REFRESH_INTERVAL = 3600.0  # tests flush analytics_queue themselves
+    EXAM_COUNTER_FLUSH_INTERVAL = 3600.0  # likewise exam_counters
+    RATELIMIT_ENABLED = False
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        analytics_queue.flush()
+        exam_counters.flush()
+        db.session.remove()
+        db.drop_all()
+    # Process-wide caches outlive the app; each test starts from a fresh database
+    answer_keys.clear()
+    user_cache.clear()
+    for index in question_indexes:
+        index.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(client):
+    """Sign up and log in a new user; returns (user id, auth headers)."""
+    def make_user(admin=False):
+        name = uuid.uuid4().hex[:12]
+        body = {'username': name, 'email': f'{name}@example.com', 'password': 'secret'}
+        if admin:
+            body['admin_code'] = os.environ['ADMIN_SECRET_CODE']
+        user_id = client.post('/auth/signup', json=body).get_json()['id']
+        token = client.post('/auth/login', json={'email': body['email'], 'password': 'secret'}).get_json()['access_token']
+        return user_id, {'Authorization': f'Bearer {token}'}
+    return make_user
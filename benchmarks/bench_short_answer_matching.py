@@ -0,0 +1,95 @@
+"""Short-answer grading throughput on a synthetic batch of answers.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_short_answer_matching.py [answers]
+
+Compares grading each answer on its own with an unbounded edit distance
+against ShortAnswerMatcher.grade, serially and through the process pool.
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('MAIL_USERNAME', '')
+os.environ.setdefault('MAIL_PASSWORD', '')
+
+from api.examinations.matching import ShortAnswerMatcher, normalize_short_answer
+
+CORRECT = 'Mitochondria'
+ALTERNATES = ['the mitochondrion', 'mitochondrion']
+WRONG = ['ribosome', 'nucleus', 'chloroplast', 'golgi apparatus', 'cell membrane', 'lysosome']
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def naive_grade(answers):
+    accepted = [normalize_short_answer(answer) for answer in [CORRECT] + ALTERNATES]
+    return [
+        any(edit_distance(normalize_short_answer(answer), target) <= min(2, int(len(target) * 0.2))
+            for target in accepted)
+        for answer in answers
+    ]
+
+
+def typo(text, rng):
+    position = rng.randrange(len(text))
+    return text[:position] + rng.choice(string.ascii_lowercase) + text[position + 1:]
+
+
+def make_answers(n, seed=7):
+    rng = random.Random(seed)
+    answers = []
+    for _ in range(n):
+        roll = rng.random()
+        if roll < 0.4:
+            answers.append(rng.choice([CORRECT, CORRECT.upper(), ' mitochondria. '] + ALTERNATES))
+        elif roll < 0.7:
+            answers.append(typo(rng.choice([CORRECT] + ALTERNATES), rng))
+        elif roll < 0.9:
+            answers.append(rng.choice(WRONG))
+        else:
+            answers.append(''.join(rng.choice(string.ascii_lowercase + ' ') for _ in range(rng.randint(3, 20))))
+    return answers
+
+
+def timed(fn, answers):
+    start = time.perf_counter()
+    verdicts = fn(answers)
+    return time.perf_counter() - start, verdicts
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    answers = make_answers(n)
+
+    serial = ShortAnswerMatcher(CORRECT, ALTERNATES, pool_threshold=float('inf'))
+    pooled = ShortAnswerMatcher(CORRECT, ALTERNATES, pool_threshold=0)
+    pooled.grade(answers[:100])  # start the worker processes outside the timing
+
+    naive_time, expected = timed(naive_grade, answers)
+    serial_time, serial_verdicts = timed(serial.grade, answers)
+    pooled_time, pooled_verdicts = timed(pooled.grade, answers)
+    assert serial_verdicts == expected and pooled_verdicts == expected
+
+    print(f'{n} answers, {sum(expected)} correct, {len(set(map(normalize_short_answer, answers)))} distinct')
+    print(f'  per-answer edit distance: {naive_time:7.3f}s')
+    print(f'  batch matcher (serial):   {serial_time:7.3f}s  ({naive_time / serial_time:.1f}x)')
+    print(f'  batch matcher (pool):     {pooled_time:7.3f}s  ({naive_time / pooled_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
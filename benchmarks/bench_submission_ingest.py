@@ -0,0 +1,99 @@
+"""Submissions per second for the legacy per-answer ingest vs. the bulk ingest.
+
+Usage (from the repository root):
+
+    python benchmarks/bench_submission_ingest.py [submissions] [answers_per_submission]
+
+Set BENCHMARK_DATABASE_URL to benchmark against a real server; by default a
+throwaway SQLite file is used. DATABASE_URL is ignored: the benchmark drops
+every table of the database it runs on, so point it at a dedicated one.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+_tmpdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = os.environ.get('BENCHMARK_DATABASE_URL') or \
+    f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}"
+os.environ.setdefault('MAIL_USERNAME', '')
+os.environ.setdefault('MAIL_PASSWORD', '')
+
+from api import create_app
+from api.config.config import DevConfig
+from api.utils.db import db
+from api.models.users import User
+from api.subjects.services import create_subject
+from api.questions.services import create_question
+from api.examinations.models import ExamSubmission, SubmissionAnswer
+from api.examinations.services import add_question_to_exam, create_exam, create_submission
+
+
+class BenchConfig(DevConfig):
+    SQLALCHEMY_ECHO = False
+
+
+def legacy_create_submission(exam_id, user_id, answers):
+    submission = ExamSubmission(exam_id=exam_id, user_id=user_id)
+    db.session.add(submission)
+    db.session.commit()
+    for answer in answers:
+        db.session.add(SubmissionAnswer(
+            submission_id=submission.id,
+            question_id=answer['question_id'],
+            answer=answer['answer']
+        ))
+        db.session.flush()
+    db.session.commit()
+    return submission
+
+
+# Seeded through the services so the rows (question versions, pins,
+# counters) look like the ones the API writes.
+def seed(n_questions):
+    user = User(username='bench', email='bench@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    subject = create_subject({'name': 'Bench', 'creator_id': user.id})
+    exam = create_exam({'title': 'Bench', 'total_marks': n_questions, 'duration': 60, 'user_id': user.id})
+    question_ids = []
+    for i in range(n_questions):
+        question = create_question({'subject_id': subject.id, 'user_id': user.id, 'question_text': f'Q{i}',
+                                    'question_type': 'short_answer', 'correct_answer': 'a'})
+        add_question_to_exam(exam.id, {'question_id': question.id, 'marks': 1})
+        question_ids.append(question.id)
+    return user.id, exam.id, question_ids
+
+
+def run(fn, n_submissions, user_id, exam_id, answers):
+    start = time.perf_counter()
+    for _ in range(n_submissions):
+        fn(exam_id, user_id, answers)
+        db.session.expunge_all()
+    return n_submissions / (time.perf_counter() - start)
+
+
+def main():
+    n_submissions = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    n_answers = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user_id, exam_id, question_ids = seed(n_answers)
+        answers = [{'question_id': qid, 'answer': 'a'} for qid in question_ids]
+
+        before = run(legacy_create_submission, n_submissions, user_id, exam_id, answers)
+        after = run(create_submission, n_submissions, user_id, exam_id, answers)
+
+        print(f'{n_submissions} submissions x {n_answers} answers on {db.engine.url.drivername}')
+        print(f'  per-answer ingest: {before:8.1f} submissions/s')
+        print(f'  bulk ingest:       {after:8.1f} submissions/s  ({after / before:.1f}x)')
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()